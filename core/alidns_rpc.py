@@ -0,0 +1,78 @@
+import base64
+import hashlib
+import hmac
+import json
+import uuid
+from datetime import datetime, timezone
+from urllib.parse import quote
+
+ALIDNS_API_VERSION = "2015-01-09"
+DEFAULT_ENDPOINT = "https://alidns.aliyuncs.com"
+
+
+class AlidnsError(Exception):
+    """阿里云接口返回的错误，字符串格式与 SDK 的 ServerException 保持一致"""
+
+    def __init__(self, code, message, http_status=None, request_id=None):
+        self.code = code
+        self.message = message
+        self.http_status = http_status
+        self.request_id = request_id
+        super().__init__(
+            f"HTTP Status: {http_status} Error:{code} {message} RequestID: {request_id}"
+        )
+
+
+def percent_encode(value):
+    """按阿里云 RPC 签名规范进行 URL 编码"""
+    return quote(str(value), safe='~')
+
+
+def sign_rpc_params(params, access_key_secret, method="GET"):
+    """计算 RPC 风格接口的签名（HMAC-SHA1, SignatureVersion 1.0）"""
+    canonicalized = "&".join(
+        f"{percent_encode(key)}={percent_encode(params[key])}"
+        for key in sorted(params)
+    )
+    string_to_sign = f"{method}&{percent_encode('/')}&{percent_encode(canonicalized)}"
+    digest = hmac.new(
+        f"{access_key_secret}&".encode("utf-8"),
+        string_to_sign.encode("utf-8"),
+        hashlib.sha1
+    ).digest()
+    return base64.b64encode(digest).decode("utf-8")
+
+
+def build_rpc_params(action, params, access_key_id, access_key_secret, method="GET"):
+    """组装公共参数并附加签名，返回最终的请求参数字典"""
+    signed = {
+        "Format": "JSON",
+        "Version": ALIDNS_API_VERSION,
+        "AccessKeyId": access_key_id,
+        "SignatureMethod": "HMAC-SHA1",
+        "SignatureVersion": "1.0",
+        "SignatureNonce": uuid.uuid4().hex,
+        "Timestamp": datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ"),
+        "Action": action,
+    }
+    for key, value in params.items():
+        if value is not None:
+            signed[key] = str(value)
+    signed["Signature"] = sign_rpc_params(signed, access_key_secret, method)
+    return signed
+
+
+def parse_rpc_response(http_status, body):
+    """解析接口响应，出错时抛出 AlidnsError"""
+    try:
+        result = json.loads(body) if body else {}
+    except ValueError:
+        raise AlidnsError("SDK.InvalidResponse", body[:200], http_status)
+    if http_status >= 400:
+        raise AlidnsError(
+            result.get("Code", "SDK.UnknownServerError"),
+            result.get("Message", ""),
+            http_status,
+            result.get("RequestId")
+        )
+    return result
@@ -0,0 +1,148 @@
+import asyncio
+from .alidns_rpc import DEFAULT_ENDPOINT, build_rpc_params, parse_rpc_response
+from .retry import RetryPolicy, classify_error, get_retry_after, FATAL
+
+
+class AsyncAlidnsClient:
+    """基于 asyncio 的阿里云DNS RPC 客户端（可选组件，需要安装 aiohttp）
+
+    自行实现 RPC 签名，不依赖 aliyunsdkcore；所有请求共享同一个 HTTP 连接池，
+    只封装 DescribeDomains、DescribeDomainRecords（含分页）和 UpdateDomainRecord 三个接口，均为协程。
+    临时错误与限流按 RetryPolicy 退避重试。记录同步逻辑（当前值比较、重复记录处理、
+    按账号的限速与熔断、接入地址选择）只在 DNSUpdater 中实现，这里不重复。
+    """
+
+    def __init__(self, access_key_id, access_key_secret, endpoint=DEFAULT_ENDPOINT,
+                 max_connections=64, max_concurrency=256, timeout=10, retry_policy=None):
+        self.access_key_id = access_key_id
+        self.access_key_secret = access_key_secret
+        if "://" not in endpoint:
+            # 配置中的 alidns_endpoint 只保存主机名
+            endpoint = f"https://{endpoint}"
+        self.endpoint = endpoint.rstrip("/")
+        self.max_connections = max_connections
+        self.max_concurrency = max_concurrency
+        self.timeout = timeout
+        self.retry_policy = retry_policy or RetryPolicy()
+        self._session = None
+        self._semaphore = None
+
+    @classmethod
+    def from_config(cls, config, **kwargs):
+        """根据配置字典创建客户端"""
+        return cls(
+            config.get("access_key_id"),
+            config.get("access_key_secret"),
+            endpoint=config.get("alidns_endpoint") or DEFAULT_ENDPOINT,
+            retry_policy=RetryPolicy.from_config(config),
+            **kwargs
+        )
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+
+    def _get_session(self):
+        """创建（或复用）共享的 aiohttp 会话"""
+        if self._session is None:
+            try:
+                import aiohttp
+            except ImportError:
+                raise Exception("异步客户端需要安装 aiohttp: pip install aiohttp")
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=self.max_connections),
+                timeout=aiohttp.ClientTimeout(total=self.timeout)
+            )
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        return self._session
+
+    async def close(self):
+        """关闭连接池"""
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    async def call(self, action, **params):
+        """签名并调用一个 RPC 接口，返回解析后的 JSON"""
+        if not self.access_key_id or not self.access_key_secret:
+            raise Exception("未配置阿里云账号")
+
+        session = self._get_session()
+        policy = self.retry_policy
+        for attempt in range(1, policy.max_attempts + 1):
+            # 每次尝试重新签名（时间戳与随机数不能复用）
+            query = build_rpc_params(action, params, self.access_key_id, self.access_key_secret)
+            try:
+                async with self._semaphore:
+                    async with session.get(self.endpoint + "/", params=query) as response:
+                        body = await response.text()
+                        return parse_rpc_response(response.status, body)
+            except Exception as e:
+                category = classify_error(e)
+                if category == FATAL or attempt >= policy.max_attempts:
+                    raise
+                await asyncio.sleep(policy.get_delay(attempt, category, get_retry_after(e)))
+
+    async def get_domains(self):
+        """获取所有域名（支持分页，接口默认每页只返回20个）"""
+        all_domains = []
+        page_number = 1
+        page_size = 100  # 接口允许的最大值
+
+        while True:
+            try:
+                result = await self.call("DescribeDomains", PageNumber=page_number, PageSize=page_size)
+            except Exception as e:
+                raise Exception(f"获取域名列表失败: {str(e)}") from e
+
+            domains = result.get("Domains", {}).get("Domain", [])
+            all_domains.extend(domains)
+            # 不返回 TotalCount 时按单页处理
+            if not domains or len(all_domains) >= result.get("TotalCount", len(all_domains)):
+                break
+            page_number += 1
+
+        return all_domains
+
+    async def get_domain_records(self, domain_name):
+        """获取指定域名的所有解析记录（支持分页）"""
+        all_records = []
+        page_number = 1
+        page_size = 100  # 每页获取100条记录
+
+        while True:
+            try:
+                result = await self.call(
+                    "DescribeDomainRecords",
+                    DomainName=domain_name,
+                    PageNumber=page_number,
+                    PageSize=page_size
+                )
+            except Exception as e:
+                raise Exception(f"获取域名 {domain_name} 的记录失败: {str(e)}") from e
+
+            records = result.get("DomainRecords", {}).get("Record", [])
+            all_records.extend(records)
+
+            # 判断是否获取完所有记录
+            if not records or len(all_records) >= result.get("TotalCount", 0):
+                break
+            page_number += 1
+
+        return all_records
+
+    async def update_record(self, record_id, rr, record_type, value, ttl=600, line="default"):
+        """调用 UpdateDomainRecord 修改一条记录，返回接口的响应
+        不查询当前值也不处理 DomainRecordDuplicate 等错误，由调用方决定如何处理
+        """
+        return await self.call(
+            "UpdateDomainRecord",
+            RecordId=record_id,
+            RR=rr,
+            Type=record_type,
+            Value=value,
+            TTL=ttl,
+            Line=line
+        )
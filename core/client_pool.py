@@ -0,0 +1,192 @@
+import hashlib
+import threading
+import time
+from .metrics import ALIDNS_LATENCY, ALIDNS_REQUESTS, ALIDNS_RETRIES
+from .rate_limiter import RateLimiter
+from .retry import CircuitBreaker, call_with_retry, classify_error, RETRYABLE, DEFAULT_FAILURE_THRESHOLD
+
+DEFAULT_PROFILE = "default"
+
+
+def credential_key(access_key_id, access_key_secret):
+    """凭证的哈希，用作客户端缓存的键（不在内存中以明文作键）"""
+    return hashlib.sha256(f"{access_key_id}\0{access_key_secret}".encode()).hexdigest()
+
+
+def get_profiles(config):
+    """读取配置中的所有账号，返回 {账号名: (AccessKey ID, AccessKey Secret)}
+    顶层的 access_key_id/access_key_secret 作为 default 账号，profiles 中的同名账号会覆盖它
+    """
+    profiles = {}
+    if config.get("access_key_id") and config.get("access_key_secret"):
+        profiles[DEFAULT_PROFILE] = (config["access_key_id"], config["access_key_secret"])
+    for profile in config.get("profiles", []):
+        name = profile.get("name") or DEFAULT_PROFILE
+        if profile.get("access_key_id") and profile.get("access_key_secret"):
+            profiles[name] = (profile["access_key_id"], profile["access_key_secret"])
+    return profiles
+
+
+class AccountClient:
+    """一个阿里云账号的客户端，以及按账号计算的熔断器和限速器
+    AcsClient 在首次调用接口时才导入 SDK 并创建；限速、熔断、连接池和超时设置在创建时确定
+    """
+
+    def __init__(self, name, access_key_id, access_key_secret, config, transport):
+        self.name = name
+        self.key = credential_key(access_key_id, access_key_secret)
+        self._access_key_id = access_key_id
+        self._access_key_secret = access_key_secret
+        self._config = config
+        self._transport = transport
+        self._client = None
+        self._lock = threading.Lock()
+        self.breaker = CircuitBreaker.from_config(f"阿里云DNS接口[{name}]", config)
+        self.rate_limiter = RateLimiter.from_config(config)
+        self._settings = (self._settings_from_config(config), transport.settings)
+
+    @staticmethod
+    def _settings_from_config(config):
+        return (
+            config.get("rate_limit_total", 20),
+            config.get("rate_limit_read", 15),
+            config.get("rate_limit_write", 10),
+            config.get("rate_limit_write_reserve", 2),
+            config.get("circuit_failure_threshold", DEFAULT_FAILURE_THRESHOLD),
+            config.get("circuit_reset_timeout", 60),
+            config.get("sync_workers", 8),
+        )
+
+    def matches_config(self, config):
+        """配置中的限速、熔断、并发数以及传输层设置是否与创建时一致"""
+        return self._settings == (self._settings_from_config(config), self._transport.settings)
+
+    @property
+    def session_name(self):
+        return "alidns" if self.name == DEFAULT_PROFILE else f"alidns:{self.name}"
+
+    @property
+    def client(self):
+        if self._client is None:
+            with self._lock:
+                if self._client is None:
+                    self._client = self._create_client()
+        return self._client
+
+    @client.setter
+    def client(self, value):
+        self._client = value
+
+    def _create_client(self):
+        """创建阿里云客户端"""
+        try:
+            from aliyunsdkcore.client import AcsClient
+
+            client = AcsClient(
+                self._access_key_id,
+                self._access_key_secret,
+                'cn-hangzhou',
+                auto_retry=False,  # 重试统一由 do_action 的重试策略处理
+                connect_timeout=self._transport.connect_timeout,
+                timeout=self._transport.read_timeout
+            )
+            # 记录会在多个线程中并发同步，连接池大小不小于工作线程数
+            self._transport.attach_acs_client(
+                client,
+                pool_maxsize=int(self._config.get("sync_workers", 8)),
+                name=self.session_name
+            )
+            print(f"阿里云客户端初始化成功: {self.name}")  # 调试信息
+            return client
+        except Exception as e:
+            print(f"初始化阿里云客户端失败: {str(e)}")  # 调试信息
+            raise Exception(f"初始化阿里云客户端失败: {str(e)}")
+
+    def do_action(self, request, retry_policy, cancel_event=None, endpoint_selector=None, on_attempt=None):
+        """经过限速器、熔断器并按重试策略调用接口，返回原始响应
+        endpoint_selector: 可选，每次尝试使用其当前选择的接入地址，网络或服务端错误时让其切换
+        on_attempt: 可选，每次尝试前调用，用于统计实际发出的请求数
+        """
+        client = self.client
+        action_name = request.get_action_name()
+        attempts = 0
+
+        def attempt():
+            nonlocal attempts
+            attempts += 1
+            if attempts > 1:
+                ALIDNS_RETRIES.inc(action=action_name, profile=self.name)
+            if on_attempt is not None:
+                on_attempt()
+            host = None
+            if endpoint_selector is not None:
+                host = endpoint_selector.get()
+                request.set_endpoint(host)
+            self.rate_limiter.acquire(action_name, cancel_event)
+            start = time.perf_counter()
+            try:
+                response = client.do_action_with_exception(request)
+            except Exception as e:
+                category = classify_error(e)
+                self._record_metrics(action_name, category, time.perf_counter() - start)
+                if host is not None and category == RETRYABLE:
+                    endpoint_selector.report_failure(host, e)
+                raise
+            elapsed = time.perf_counter() - start
+            self._record_metrics(action_name, "success", elapsed)
+            if host is not None:
+                endpoint_selector.record_call(host, elapsed)
+            return response
+
+        return call_with_retry(
+            attempt,
+            retry_policy,
+            self.breaker,
+            cancel_event,
+            description=action_name if self.name == DEFAULT_PROFILE else f"{action_name}[{self.name}]"
+        )
+
+    def _record_metrics(self, action_name, outcome, elapsed):
+        ALIDNS_REQUESTS.inc(action=action_name, profile=self.name, outcome=outcome)
+        ALIDNS_LATENCY.observe(elapsed, action=action_name, outcome=outcome)
+
+
+class ClientPool:
+    """按凭证缓存各账号的客户端
+
+    重新加载配置时，凭证和相关设置都未变化的账号沿用原有的 AcsClient（及其连接池、熔断和限速状态），
+    只为新增、凭证修改过或限速、熔断、并发数、传输层设置变化的账号重新创建客户端。
+    """
+
+    def __init__(self, transport):
+        self.transport = transport
+        self._accounts = {}  # 账号名 -> AccountClient
+        self._lock = threading.Lock()
+
+    def configure(self, config):
+        """按配置更新账号列表，传输层需已按同一配置更新"""
+        with self._lock:
+            cached = {account.key: account for account in self._accounts.values()}
+            accounts = {}
+            for name, (access_key_id, access_key_secret) in get_profiles(config).items():
+                account = cached.get(credential_key(access_key_id, access_key_secret))
+                if account is None or account.name != name or not account.matches_config(config):
+                    account = AccountClient(name, access_key_id, access_key_secret, config, self.transport)
+                else:
+                    print(f"阿里云账号 {name} 凭证和设置未变化，沿用已有客户端")  # 调试信息
+                accounts[name] = account
+            for name, account in self._accounts.items():
+                if accounts.get(name) is not account:
+                    self.transport.detach_session(account.session_name)
+            self._accounts = accounts
+        if not accounts:
+            print("未配置阿里云账号")  # 调试信息
+
+    def get(self, profile=None):
+        """按账号名获取客户端，未配置时返回 None"""
+        with self._lock:
+            return self._accounts.get(profile or DEFAULT_PROFILE)
+
+    def accounts(self):
+        with self._lock:
+            return list(self._accounts.values())
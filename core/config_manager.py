@@ -1,35 +1,389 @@
+import copy
+import hashlib
 import json
 import os
-from typing import Dict, Any
+import shutil
+import threading
+from typing import Dict, Any, Optional
+from .records import migrate_sync_records, RecordIndex
+from .retry import DEFAULT_FAILURE_THRESHOLD
+
+# 启用 SQLite 状态存储时，这些同步状态不再保存在配置文件中
+STATE_KEYS = ("sync_records", "applied_values", "last_ip")
 
 class ConfigManager:
-    def __init__(self):
-        self.config_file = "config.json"
+    """配置文件管理
+
+    保存时只有内容发生变化才写盘；先写临时文件并 fsync，再原子替换，替换前把上一份
+    完好的配置保留为 .bak。加载时配置文件损坏则从 .bak 恢复，不会静默丢失账号和记录。
+    """
+
+    def __init__(self, config_file="config.json"):
+        self.config_file = config_file
+        self.backup_file = f"{config_file}.bak"
+        self._saved_hash: Optional[str] = None
+        self._save_timer = None
+        self._save_lock = threading.Lock()
+        # 同步线程和界面线程修改 self.config 以及保存时拍快照都要持有此锁
+        self._config_lock = threading.RLock()
+        self.state_store = None
+        self.config = self.load_config()
+        self._open_state_store()
+
+    def reload_config(self):
+        """从文件重新加载配置（文件已被外部修改，尚未写盘的延迟保存作废）"""
+        self.cancel_pending_save()
         self.config = self.load_config()
+        self._open_state_store()
+
+    def _read_file(self, path) -> Dict[str, Any]:
+        with open(path, 'r') as f:
+            config = json.load(f)
+        if not isinstance(config, dict):
+            raise ValueError("配置文件内容不是 JSON 对象")
+        return config
 
     def load_config(self) -> Dict[str, Any]:
-        if os.path.exists(self.config_file):
+        for path in (self.config_file, self.backup_file):
+            if not os.path.exists(path):
+                continue
             try:
-                with open(self.config_file, 'r') as f:
-                    return json.load(f)
-            except:
-                return self.get_default_config()
+                config = self._read_file(path)
+            except Exception as e:
+                print(f"读取配置文件 {path} 失败: {str(e)}")
+                continue
+            if path == self.backup_file:
+                print(f"配置文件损坏，已从备份 {path} 恢复")
+                # 下次保存时重写配置文件
+                self._saved_hash = None
+            else:
+                self._saved_hash = self._hash(self._serialize(config))
+            self._migrate(config)
+            return config
+        self._saved_hash = None
         return self.get_default_config()
 
+    def _migrate(self, config):
+        """升级旧版本的配置格式，变化会在下次保存时写入"""
+        records = config.get("sync_records")
+        if records:
+            migrated, changed = migrate_sync_records(records)
+            if changed:
+                print(f"同步记录已转换为精简格式: {len(migrated)} 条")
+                config["sync_records"] = migrated
+        # 旧版本把连续跳过接口调用的轮数写在配置文件中，现在只保存在内存中
+        config.pop("cycles_since_full_sync", None)
+
     def get_default_config(self) -> Dict[str, Any]:
         return {
             "access_key_id": "",
             "access_key_secret": "",
+            # 其他阿里云账号: [{"name": ..., "access_key_id": ..., "access_key_secret": ...}]
+            # 同步记录以 "Profile" 指定所属账号，未指定的属于上面的 default 账号
+            "profiles": [],
             "domain_records": [],
             "check_interval": 300,  # 5分钟检查一次
-            "last_ip": "",
+            "max_backoff_interval": 3600,  # 连续失败时指数退避的最长间隔（秒）
+            "fast_recheck_interval": 30,  # IP 变化后的快速复查间隔（秒）
+            "fast_recheck_count": 3,  # IP 变化后快速复查的轮数
+            "schedule_jitter": 0.1,  # 间隔随机抖动比例
+            "ip_providers": {  # 公网IP查询服务，同一地址族的服务并发查询
+                "ipv4": ["http://4.ipw.cn", "https://api.ipify.org", "https://ipv4.icanhazip.com"],
+                "ipv6": ["http://6.ipw.cn", "https://api6.ipify.org", "https://ipv6.icanhazip.com"],
+            },
+            "ip_detect_mode": "http",  # http: 查询公网IP服务; local: 优先读取本机网卡地址，找不到时回退为 http
+            "local_ip_filter": {
+                "interfaces": [],  # 只使用这些网卡，留空表示不限
+                "exclude_interfaces": [],
+                "scope": "global",
+                "ipv4_prefix": "",  # 例如 "100.64.0.0/10"，留空表示不限
+                "ipv6_prefix": "",  # 例如 "2408::/16"，留空表示不限
+                "include_temporary": False,  # 是否使用IPv6临时（隐私）地址
+                "include_deprecated": False,
+                "require_global": True,  # 只接受公网地址
+            },
+            "ip_quorum": 1,  # 需要多少个服务返回相同IP才采用，1 表示取最先返回的结果
+            "ip_timeout": 5,
+            "ip_watch": True,  # Linux 下监听网卡地址变化并立即同步
+            "ip_watch_debounce": 2,  # 地址变化事件的去抖时间（秒）
+            "watch_fallback_interval": 3600,  # 开启地址监听后的兜底轮询间隔（秒）
+            "http_pool_connections": 4,  # 每个会话缓存的连接池（主机）数量
+            "http_pool_maxsize": 16,  # 每个主机保持的长连接数
+            "http_connect_timeout": 3,
+            "http_read_timeout": 5,
+            "http_prewarm": True,  # 启动时预先建立连接
+            "retry_max_attempts": 3,  # 阿里云接口临时错误的最大尝试次数
+            "retry_base_delay": 1,  # 重试退避的基础等待（秒），每次翻倍
+            "retry_max_delay": 30,  # 单次重试等待上限（秒）
+            "retry_throttle_delay": 5,  # 被限流时的基础等待（秒）
+            "circuit_failure_threshold": DEFAULT_FAILURE_THRESHOLD,  # 连续失败多少次后熔断
+            "circuit_reset_timeout": 60,  # 阿里云接口熔断时长（秒）
+            "ip_circuit_reset_timeout": 300,  # 公网IP服务熔断时长（秒）
+            "rate_limit_total": 20,  # 阿里云接口每秒调用上限（账号级，0 为不限制）
+            "rate_limit_read": 15,  # 查询类接口每秒调用上限
+            "rate_limit_write": 10,  # 修改类接口每秒调用上限
+            "rate_limit_write_reserve": 2,  # 总预算中为修改类接口保留的令牌数
+            "alidns_endpoint": "",  # 当前使用的阿里云DNS接入地址（自动探测选择，留空使用中心地址）
+            "alidns_endpoints": [],  # 候选接入地址，留空使用内置列表
+            "endpoint_probe_interval": 3600,  # 重新探测接入地址的间隔（秒），0 为不探测
+            "sync_workers": 8,  # 并发同步记录的线程数
+            "sync_mode": "snapshot",  # snapshot: 每个域名每轮拉取一次记录; per_record: 逐条查询
+            "last_ip": {},  # 上次完整同步时的 IPv4/IPv6 指纹
+            "applied_values": {},  # RecordId -> 上次成功应用的记录值
+            "full_sync_every": 12,  # IP 未变化时每隔多少轮强制与阿里云核对一次，1 表示每轮都核对
+            "config_save_delay": 5,  # 同步状态变化后延迟多少秒写盘，期间的多次变化合并为一次
+            "state_store": "json",  # json: 同步状态保存在配置文件中; sqlite: 保存在 state_db 数据库中
+            "state_db": "",  # SQLite 数据库路径，留空为配置文件同目录下的 ddns_state.db
+            "state_history_limit": 1000,  # 数据库中保留的同步轮次数，0 为不清理
+            "history_file": "sync_history.jsonl",  # 同步历史日志（相对配置文件所在目录），留空为不记录
+            "history_max_bytes": 5 * 1024 * 1024,  # 历史日志超过此大小时轮转
+            "history_rotate_days": 7,  # 历史日志超过此天数时轮转，0 为只按大小轮转
+            "history_backups": 5,  # 保留的已压缩历史日志个数
+            "history_buffer_cycles": 50,  # 内存中保留最近多少轮，供界面显示
+            "metrics_port": 0,  # Prometheus 监控指标端口（/metrics），0 为不开启
+            "metrics_host": "127.0.0.1",  # 监控指标监听地址，需要远程抓取时改为 0.0.0.0
+            "stage_timing": True,  # 统计每轮各阶段耗时并显示在日志和状态栏
         }
 
-    def save_config(self):
-        with open(self.config_file, 'w') as f:
-            json.dump(self.config, f, indent=4)
+    @staticmethod
+    def _serialize(config) -> str:
+        return json.dumps(config, indent=4)
+
+    def snapshot(self) -> Dict[str, Any]:
+        """当前配置的深拷贝，序列化时不受其他线程修改的影响"""
+        with self._config_lock:
+            return copy.deepcopy(self.config)
+
+    def set_values(self, values):
+        """在锁内修改配置项，供同步线程和界面线程使用"""
+        with self._config_lock:
+            self.config.update(values)
+
+    @staticmethod
+    def _hash(text) -> str:
+        return hashlib.sha256(text.encode()).hexdigest()
+
+    def save_config(self) -> bool:
+        """立即保存配置，内容与上次保存的一致时不写盘；返回是否写了文件"""
+        with self._save_lock:
+            self._cancel_timer()
+            text = self._serialize(self.snapshot())
+            digest = self._hash(text)
+            if digest == self._saved_hash:
+                return False
+            self._write_atomic(text)
+            self._saved_hash = digest
+            return True
+
+    def _write_atomic(self, text):
+        """写临时文件并 fsync 后原子替换配置文件，替换前把当前配置保留为 .bak"""
+        temp_file = f"{self.config_file}.tmp"
+        if os.path.exists(temp_file):
+            os.remove(temp_file)
+        # 配置中有 AccessKey Secret：新文件只允许所有者读写，已有文件沿用原来的权限
+        fd = os.open(temp_file, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        if os.path.exists(self.config_file):
+            shutil.copymode(self.config_file, temp_file)
+        with os.fdopen(fd, 'w') as f:
+            f.write(text)
+            f.flush()
+            os.fsync(f.fileno())
+
+        # 只有当前文件是上一次成功加载或写入的完好配置时才作为备份
+        if self._saved_hash is not None and os.path.exists(self.config_file):
+            backup_temp = f"{self.backup_file}.tmp"
+            try:
+                if os.path.exists(backup_temp):
+                    os.remove(backup_temp)
+                # 优先使用硬链接，不额外写入数据
+                os.link(self.config_file, backup_temp)
+            except OSError:
+                shutil.copyfile(self.config_file, backup_temp)
+            os.replace(backup_temp, self.backup_file)
+
+        os.replace(temp_file, self.config_file)
+        self._fsync_dir()
+
+    def _fsync_dir(self):
+        """确保重命名本身落盘（仅 POSIX 支持对目录 fsync）"""
+        if os.name != "posix":
+            return
+        directory = os.path.dirname(os.path.abspath(self.config_file))
+        try:
+            fd = os.open(directory, os.O_RDONLY)
+        except OSError:
+            return
+        try:
+            os.fsync(fd)
+        except OSError:
+            pass
+        finally:
+            os.close(fd)
+
+    def schedule_save(self, delay=None):
+        """延迟保存：delay 秒内的多次修改合并为一次写盘"""
+        if delay is None:
+            delay = self.config.get("config_save_delay", 5)
+        if delay <= 0:
+            self.save_config()
+            return
+        with self._save_lock:
+            if self._save_timer is not None:
+                return
+            self._save_timer = threading.Timer(delay, self._save_from_timer)
+            self._save_timer.daemon = True
+            self._save_timer.start()
+
+    def _save_from_timer(self):
+        with self._save_lock:
+            self._save_timer = None
+        try:
+            self.save_config()
+        except Exception as e:
+            print(f"保存配置失败: {str(e)}")
+
+    def _cancel_timer(self):
+        if self._save_timer is not None:
+            self._save_timer.cancel()
+            self._save_timer = None
+
+    def cancel_pending_save(self):
+        """放弃尚未执行的延迟保存"""
+        with self._save_lock:
+            self._cancel_timer()
+
+    # 同步状态
+
+    def _state_db_path(self):
+        return self.config.get("state_db") or os.path.join(
+            os.path.dirname(os.path.abspath(self.config_file)), "ddns_state.db"
+        )
+
+    def _open_state_store(self):
+        """按配置打开或关闭 SQLite 状态存储
+        首次启用时把配置文件中的同步状态导入数据库；改回 json 时从数据库导回配置文件
+        """
+        path = self._state_db_path()
+        if self.config.get("state_store", "json") != "sqlite":
+            self.close_state_store()
+            if "sync_records" not in self.config and os.path.exists(path):
+                self._export_state(path)
+            return
+
+        from .state_store import StateStore
+
+        if self.state_store is None or self.state_store.path != path:
+            self.close_state_store()
+            self.state_store = StateStore(path, self.config.get("state_history_limit", 1000))
+        self.state_store.history_limit = self.config.get("state_history_limit", 1000)
+
+        state = {key: self.config.pop(key) for key in STATE_KEYS if key in self.config}
+        if state.get("sync_records") and self.state_store.count_sync_records() == 0:
+            self.state_store.replace_sync_records(RecordIndex.from_dicts(state["sync_records"]))
+            self.state_store.update_applied_values(state.get("applied_values", {}))
+            if state.get("last_ip"):
+                self.state_store.set_meta("last_ip", state["last_ip"])
+            print(f"同步状态已导入数据库 {path}: {len(state['sync_records'])} 条记录")
+        elif state.get("sync_records"):
+            print(f"数据库 {path} 中已有同步记录，忽略配置文件中的 sync_records")
+
+    def _export_state(self, path):
+        """从 SQLite 数据库导回同步状态到配置文件（下次保存时写入）"""
+        from .state_store import StateStore
+
+        try:
+            store = StateStore(path)
+        except Exception as e:
+            print(f"读取数据库 {path} 失败: {str(e)}")
+            return
+        try:
+            records = store.load_sync_records()
+            if records:
+                self.config["sync_records"] = [record.to_dict() for record in records]
+                self.config["applied_values"] = store.get_applied_values()
+                self.config["last_ip"] = store.get_meta("last_ip", {})
+                print(f"同步状态已从数据库 {path} 导回配置文件: {len(records)} 条记录")
+        finally:
+            store.close()
+
+    def close_state_store(self):
+        if self.state_store is not None:
+            self.state_store.close()
+            self.state_store = None
+
+    def _store_write(self, method, *args):
+        """写入状态数据库；失败只打印错误，下一轮会重新进行完整同步"""
+        try:
+            return method(*args)
+        except Exception as e:
+            print(f"写入状态数据库失败: {str(e)}")
+            return None
+
+    def get_sync_records(self):
+        """选中的同步记录（配置文件中的精简字典格式）"""
+        if self.state_store is not None:
+            return [record.to_dict() for record in self.state_store.load_sync_records()]
+        return self.config.get("sync_records", [])
+
+    def set_sync_records(self, records):
+        """替换选中的同步记录（字典列表），同时清理不再同步的记录的已应用值"""
+        index = RecordIndex.from_dicts(records)
+        if self.state_store is not None:
+            self.state_store.replace_sync_records(index)
+            return
+        with self._config_lock:
+            self.config["sync_records"] = index.to_dicts()
+            applied_values = self.config.get("applied_values", {})
+            for record_id in list(applied_values):
+                if record_id not in index:
+                    del applied_values[record_id]
+
+    def get_applied_values(self):
+        """RecordId -> 上次成功应用的记录值"""
+        if self.state_store is not None:
+            return self.state_store.get_applied_values()
+        return dict(self.config.get("applied_values", {}))
+
+    def update_applied_values(self, changes):
+        """批量更新已应用的值，changes: {RecordId: 值}，值为 None 表示删除"""
+        if not changes:
+            return
+        if self.state_store is not None:
+            self._store_write(self.state_store.update_applied_values, changes)
+            return
+        with self._config_lock:
+            applied_values = self.config.setdefault("applied_values", {})
+            for record_id, value in changes.items():
+                if value is None:
+                    applied_values.pop(record_id, None)
+                else:
+                    applied_values[record_id] = value
+
+    def get_last_ip(self):
+        """上次完整同步时的 IPv4/IPv6 指纹"""
+        if self.state_store is not None:
+            return self.state_store.get_meta("last_ip", {})
+        return self.config.get("last_ip", {})
+
+    def set_last_ip(self, fingerprint):
+        if self.state_store is not None:
+            self._store_write(self.state_store.set_meta, "last_ip", fingerprint)
+            return
+        self.set_values({"last_ip": fingerprint})
+
+    def save_catalog(self, profile, domain_name, records):
+        """保存域名的记录快照（仅在启用状态数据库时）"""
+        if self.state_store is not None:
+            self._store_write(self.state_store.save_catalog, profile, domain_name, records)
+
+    def record_cycle(self, started_at, fingerprint, results, record_ids=None):
+        """记录一轮同步的结果（仅在启用状态数据库时）"""
+        if self.state_store is not None:
+            self._store_write(self.state_store.record_cycle, started_at, fingerprint, results, record_ids)
 
     def update_credentials(self, access_key_id: str, access_key_secret: str):
-        self.config["access_key_id"] = access_key_id
-        self.config["access_key_secret"] = access_key_secret
+        self.set_values({
+            "access_key_id": access_key_id,
+            "access_key_secret": access_key_secret
+        })
         self.save_config()
\ No newline at end of file
@@ -0,0 +1,201 @@
+import os
+import signal
+import socket
+import threading
+from datetime import datetime
+from .config_manager import ConfigManager
+from .dns_updater import DNSUpdater
+from .ip_watcher import AddressChangeWatcher
+from .scheduler import SyncScheduler
+
+
+def sd_notify(state):
+    """向 systemd 发送状态通知（未在 systemd 下运行时忽略）"""
+    address = os.environ.get("NOTIFY_SOCKET")
+    if not address:
+        return False
+    if address.startswith("@"):
+        # 抽象命名空间 socket
+        address = "\0" + address[1:]
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM) as sock:
+            sock.connect(address)
+            sock.sendall(state.encode())
+        return True
+    except OSError as e:
+        print(f"发送 systemd 通知失败: {str(e)}")
+        return False
+
+
+class DDNSDaemon:
+    """无界面守护进程：不依赖 PyQt5，直接驱动 ConfigManager 和 DNSUpdater
+
+    SIGHUP 重新加载配置，SIGTERM/SIGINT 取消进行中的同步并退出；在 systemd 下运行时发送
+    READY/RELOADING/STOPPING 通知，并由后台线程按 WATCHDOG_USEC 发送看门狗心跳，
+    同步耗时较长时也不会被 systemd 判定为无响应。
+    """
+
+    def __init__(self, config_manager, dns_updater=None):
+        self.config = config_manager
+        self.dns_updater = dns_updater or DNSUpdater(config_manager)
+        self.address_watcher = None
+        self.scheduler = None
+        self._wakeup = threading.Event()
+        self._stopping = False
+        self._reload_requested = False
+        self._sync_requested = True
+        # 进行中的同步的取消标志，没有同步时为 None
+        self._cycle_cancel = None
+        self._watchdog_stop = threading.Event()
+        watchdog_usec = int(os.environ.get("WATCHDOG_USEC", "0") or 0)
+        self._watchdog_interval = watchdog_usec / 2e6 if watchdog_usec else None
+
+    def install_signal_handlers(self):
+        """注册信号处理，处理函数只设置标志，实际工作在主循环中完成"""
+        signal.signal(signal.SIGTERM, self._handle_stop)
+        signal.signal(signal.SIGINT, self._handle_stop)
+        if hasattr(signal, "SIGHUP"):
+            signal.signal(signal.SIGHUP, self._handle_reload)
+
+    def _handle_stop(self, signum, frame):
+        self.stop()
+
+    def _handle_reload(self, signum, frame):
+        self._reload_requested = True
+        self._wakeup.set()
+
+    def stop(self):
+        """请求退出主循环，进行中的同步不再处理尚未开始的记录"""
+        self._stopping = True
+        cancel_event = self._cycle_cancel
+        if cancel_event is not None:
+            cancel_event.set()
+        self._wakeup.set()
+
+    def start_watchdog(self):
+        """在后台线程中发送看门狗心跳，systemd 未开启看门狗时不启动"""
+        if not self._watchdog_interval:
+            return None
+        thread = threading.Thread(target=self._watchdog_loop, name="sd-watchdog", daemon=True)
+        thread.start()
+        return thread
+
+    def _watchdog_loop(self):
+        while True:
+            sd_notify("WATCHDOG=1")
+            if self._watchdog_stop.wait(self._watchdog_interval):
+                return
+
+    def trigger_sync(self):
+        """请求立即执行一次同步（可在任意线程调用）"""
+        self._sync_requested = True
+        self._wakeup.set()
+
+    def start_address_watcher(self):
+        """开启网卡地址变更监听，成功返回 True"""
+        if not self.config.config.get("ip_watch", True) or not AddressChangeWatcher.is_supported():
+            return False
+        self.address_watcher = AddressChangeWatcher(
+            self.trigger_sync,
+            debounce=self.config.config.get("ip_watch_debounce", 2)
+        )
+        return self.address_watcher.start()
+
+    def create_scheduler(self):
+        """按当前配置创建调度器，开启地址监听时轮询间隔改为兜底间隔"""
+        interval = None
+        if self.address_watcher:
+            interval = self.config.config.get("watch_fallback_interval", 3600)
+        self.scheduler = SyncScheduler.from_config(self.config.config, interval)
+
+    def reload(self):
+        """重新加载配置文件并更新 DNS 更新器"""
+        sd_notify("RELOADING=1")
+        print("重新加载配置...")
+        try:
+            self.config.reload_config()
+            self.dns_updater.update_config(self.config)
+            self.create_scheduler()
+        except Exception as e:
+            print(f"重新加载配置失败: {str(e)}")
+        sd_notify("READY=1")
+        self._sync_requested = True
+
+    def run_cycle(self):
+        """执行一次同步，输出结果统计，并按结果安排下一轮"""
+        if not self.config.get_sync_records():
+            print("没有需要同步的记录")
+            self.scheduler.schedule(self.scheduler.interval)
+            return
+        self._cycle_cancel = threading.Event()
+        if self._stopping:
+            self._cycle_cancel.set()
+        try:
+            # 各阶段耗时在本轮结束时输出到日志
+            with self.dns_updater.measure_cycle():
+                current_ips = self.dns_updater.get_current_ips()
+                results = self.dns_updater.sync_records(current_ips, cancel_event=self._cycle_cancel)
+        except Exception as e:
+            print(f"更新失败: {str(e)}")
+            sd_notify(f"STATUS=更新失败: {str(e)}")
+            self.scheduler.on_failure()
+            return
+        finally:
+            self._cycle_cancel = None
+
+        counts = {"success": 0, "error": 0, "skipped": 0}
+        for result in results:
+            counts[result["status"]] = counts.get(result["status"], 0) + 1
+            if result["status"] != "skipped":
+                print(f"{result['rr']}.{result['domain']} ({result['type']}) "
+                      f"{result['status']}: {result['message']}")
+        status = (f"{datetime.now().strftime('%Y-%m-%d %H:%M:%S')} 更新完成 "
+                  f"(成功: {counts['success']} 失败: {counts['error']} 跳过: {counts['skipped']})")
+        print(status)
+        sd_notify(f"STATUS={status}")
+
+        # 只有整体故障才退避，单条记录的错误已在上面输出
+        failure = self.dns_updater.cycle_failure(results)
+        if failure:
+            print(f"本轮同步异常，推迟下一轮: {failure}")
+            self.scheduler.on_failure()
+        else:
+            self.scheduler.on_success(current_ips)
+
+    def run(self):
+        """主循环，收到退出信号后返回"""
+        self.install_signal_handlers()
+        self.start_address_watcher()
+        self.create_scheduler()
+        sd_notify("READY=1")
+        self.start_watchdog()
+        print("守护进程已启动")
+
+        try:
+            while not self._stopping:
+                if self._reload_requested:
+                    self._reload_requested = False
+                    self.reload()
+
+                if self._sync_requested or self.scheduler.seconds_until_next() == 0:
+                    self._sync_requested = False
+                    self.run_cycle()
+
+                self._wakeup.wait(self.scheduler.seconds_until_next())
+                self._wakeup.clear()
+        finally:
+            self._watchdog_stop.set()
+            sd_notify("STOPPING=1")
+            if self.address_watcher:
+                self.address_watcher.stop()
+            self.config.save_config()
+            self.config.close_state_store()
+            self.dns_updater.shutdown()
+            print("守护进程已退出")
+        return 0
+
+
+def run_daemon(config_file="config.json"):
+    """无界面模式入口"""
+    config_manager = ConfigManager(config_file)
+    return DDNSDaemon(config_manager).run()
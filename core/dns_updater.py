@@ -1,71 +1,231 @@
-from aliyunsdkcore.client import AcsClient
-from aliyunsdkalidns.request.v20150109.DescribeDomainsRequest import DescribeDomainsRequest
-from aliyunsdkalidns.request.v20150109.DescribeDomainRecordsRequest import DescribeDomainRecordsRequest
-from aliyunsdkalidns.request.v20150109.UpdateDomainRecordRequest import UpdateDomainRecordRequest
+# 阿里云 SDK 较重，统一在首次调用接口时再导入
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager, nullcontext
+from functools import partial
 import json
-import requests
-import re
+import os
+import threading
+import time
+from .ip_detector import IPDetector
+from .transport import Transport
+from .ip_utils import is_valid_record_ip
+from .client_pool import ClientPool, DEFAULT_PROFILE
+from .records import RecordIndex, SyncRecord
+from .endpoint_selector import EndpointSelector
+from .retry import (RetryPolicy, get_error_code, classify_error, CircuitOpenError,
+                    RETRYABLE, THROTTLED, CIRCUIT_OPEN)
+from .history import SyncHistory
+from . import metrics
+from .profiling import CycleProfiler, StageTimer, format_stages
 
 class DNSUpdater:
     def __init__(self, config_manager):
         self.config = config_manager
-        self.client = None
+        # 当前线程所在同步轮次的取消请求，由 _cancellable 在各工作线程中设置
+        self._cancel = threading.local()
+        # 当前线程同步单条记录期间实际发出的接口请求数
+        self._attempts = threading.local()
+        # 连续跳过接口调用的轮数只保存在内存中，避免空闲时每轮都写配置文件
+        self.cycles_since_full_sync = 0
+        self.retry_policy = RetryPolicy.from_config(self.config.config)
+        self.transport = Transport.from_config(self.config.config)
+        self.client_pool = ClientPool(self.transport)
+        self.endpoint_selector = EndpointSelector.from_config(
+            self.config.config, self.transport, on_change=self._on_endpoint_change
+        )
+        self.ip_detector = IPDetector.from_config(self.config.config, self.transport)
+        # 正在获取IP的线程数；期间IP检测设置变化时，等获取结束后再替换检测器
+        self._ip_detect_lock = threading.Lock()
+        self._ip_detect_active = 0
+        self._ip_detector_stale = False
+        self.history = SyncHistory.from_config(self.config.config, self._base_dir())
+        self.metrics_server = None
+        self._start_metrics_server()
+        # 各阶段耗时统计；关闭时计时点不产生开销
+        self.stage_timer = StageTimer(self.config.config.get("stage_timing", True))
+        self.last_cycle_stages = {}
+        self.last_cycle_time = None
+        # 本轮拉取记录快照失败的域名，由 cycle_failure 判断是否退避
+        self.catalog_failures = []
+        # 上一次 get_all_domain_records 未能获取的账号和域名
+        self.catalog_gaps = set()
+        # DDNS_PROFILE_CYCLES 环境变量（或 --profile-cycles 参数）开启时采集接下来若干轮的 cProfile
+        self.profiler = CycleProfiler.from_env()
         self.init_client()
+        if self.config.config.get("http_prewarm", True):
+            self.prewarm()
 
     def update_config(self, config):
         """更新配置并重新初始化客户端"""
         if isinstance(config, dict):
             # 如果传入的是字典，更新特定的配置项
-            self.config.config.update(config)
+            self.config.set_values(config)
         else:
             # 如果传入的是配置管理器，更新整个配置
             self.config = config
         
-        # 重新初始化客户端
+        # 重新初始化客户端，凭证和设置未变化的账号沿用已有客户端
+        self.transport.configure(self.config.config)
+        self.retry_policy = RetryPolicy.from_config(self.config.config)
+        # 接入地址设置未变化时保留已有的探测结果
+        if not self.endpoint_selector.matches_config(self.config.config):
+            self.endpoint_selector = EndpointSelector.from_config(
+                self.config.config, self.transport, on_change=self._on_endpoint_change
+            )
+        # IP检测设置未变化时保留已有的检测器（各服务的统计与熔断状态）
+        if not self.ip_detector.matches_config(self.config.config):
+            with self._ip_detect_lock:
+                self._ip_detector_stale = True
+                if not self._ip_detect_active:
+                    self._replace_ip_detector()
+        if self.history is None or not self.history.matches_config(self.config.config, self._base_dir()):
+            if self.history is not None:
+                self.history.close()
+            self.history = SyncHistory.from_config(self.config.config, self._base_dir())
+        if self.metrics_server is None or not self.metrics_server.matches_config(self.config.config):
+            self._start_metrics_server()
+        self.stage_timer.enabled = self.config.config.get("stage_timing", True)
         self.init_client()
 
-    def init_client(self):
-        """初始化阿里云客户端"""
+    def _replace_ip_detector(self):
+        """按当前配置重建IP检测器，调用方需持有 _ip_detect_lock 且没有线程正在获取IP"""
+        self.ip_detector.shutdown()
+        self.ip_detector = IPDetector.from_config(self.config.config, self.transport)
+        self._ip_detector_stale = False
+
+    def _base_dir(self):
+        """配置文件所在目录，历史日志等相对路径以此为准"""
+        return os.path.dirname(os.path.abspath(self.config.config_file))
+
+    def _start_metrics_server(self):
+        """按配置（重新）开启监控指标服务，metrics_port 为 0 时不开启"""
+        if self.metrics_server is not None:
+            self.metrics_server.stop()
+        self.metrics_server = metrics.MetricsServer.from_config(self.config.config)
+        if self.metrics_server is None:
+            return
         try:
-            access_key_id = self.config.config.get("access_key_id")
-            access_key_secret = self.config.config.get("access_key_secret")
-            
-            if access_key_id and access_key_secret:
-                self.client = AcsClient(
-                    access_key_id,
-                    access_key_secret,
-                    'cn-hangzhou'
-                )
-                print("阿里云客户端初始化成功")  # 调试信息
-            else:
-                self.client = None
-                print("未配置阿里云账号")  # 调试信息
-                
-        except Exception as e:
-            self.client = None
-            print(f"初始化阿里云客户端失败: {str(e)}")  # 调试信息
-            raise Exception(f"初始化阿里云客户端失败: {str(e)}")
+            self.metrics_server.start()
+        except OSError as e:
+            print(f"开启监控指标服务失败: {str(e)}")
+            self.metrics_server = None
+
+    def shutdown(self):
+        """退出前写完尚未写盘的同步历史，关闭监控指标服务"""
+        if self.history is not None:
+            self.history.close()
+        if self.metrics_server is not None:
+            self.metrics_server.stop()
 
-    def get_domains(self):
-        """获取所有域名"""
-        if not self.client:
+    @property
+    def client(self):
+        """default 账号的阿里云客户端，首次调用接口时才导入 SDK 并创建"""
+        account = self.client_pool.get(DEFAULT_PROFILE)
+        return account.client if account else None
+
+    @client.setter
+    def client(self, value):
+        account = self.client_pool.get(DEFAULT_PROFILE)
+        if account is None:
             raise Exception("未配置阿里云账号")
+        account.client = value
+
+    def init_client(self):
+        """按配置初始化各账号的客户端（实际创建延迟到首次使用）"""
+        self.client_pool.configure(self.config.config)
+
+    def has_accounts(self):
+        """是否配置了至少一个阿里云账号"""
+        return bool(self.client_pool.accounts())
+
+    def get_account(self, profile=None):
+        """获取账号的客户端，未配置时抛出异常"""
+        account = self.client_pool.get(profile)
+        if account is None:
+            if (profile or DEFAULT_PROFILE) == DEFAULT_PROFILE:
+                raise Exception("未配置阿里云账号")
+            raise Exception(f"未配置阿里云账号: {profile}")
+        return account
+
+    def _do_action(self, request, profile=None):
+        """所有阿里云接口调用的统一入口：按重试策略重试并经过所属账号的熔断器，返回解析后的 JSON
+        每次尝试前先经过该账号的限速器；限速与重试的等待期间都响应本轮同步的取消请求
+        """
+        account = self.get_account(profile)
+        response = account.do_action(
+            request, self.retry_policy, getattr(self._cancel, "event", None), self.endpoint_selector,
+            on_attempt=self._count_attempt
+        )
+        return json.loads(response)
+
+    @contextmanager
+    def _cancellable(self, cancel_event):
+        """在当前线程内让接口调用的限速与重试等待响应 cancel_event"""
+        previous = getattr(self._cancel, "event", None)
+        self._cancel.event = cancel_event
+        try:
+            yield
+        finally:
+            self._cancel.event = previous
+
+    def _count_attempt(self):
+        self._attempts.count = getattr(self._attempts, "count", 0) + 1
+
+    def _on_endpoint_change(self, endpoint):
+        """接入地址变化时写回配置，随下一次保存持久化"""
+        self.config.set_values({"alidns_endpoint": endpoint})
+
+    def get_endpoint_stats(self):
+        """获取当前接入地址、各候选地址的探测延迟与实际调用耗时"""
+        return self.endpoint_selector.get_stats()
+
+    def get_rate_limit_stats(self):
+        """获取各账号阿里云接口限速的调用次数与等待时间"""
+        return {account.name: account.rate_limiter.get_stats() for account in self.client_pool.accounts()}
+
+    def get_retry_stats(self):
+        """获取各账号阿里云接口与各公网IP服务的熔断状态"""
+        return {
+            "alidns": {account.name: account.breaker.get_stats() for account in self.client_pool.accounts()},
+            "ip_providers": self.ip_detector.get_circuit_stats(),
+        }
+
+    def get_domains(self, profile=None):
+        """获取账号下的所有域名（支持分页，接口默认每页只返回20个）"""
+        self.get_account(profile)
             
-        request = DescribeDomainsRequest()
-        request.set_accept_format('json')
+        from aliyunsdkalidns.request.v20150109.DescribeDomainsRequest import DescribeDomainsRequest
         
-        try:
-            response = self.client.do_action_with_exception(request)
-            result = json.loads(response)
-            return result.get("Domains", {}).get("Domain", [])
-        except Exception as e:
-            raise Exception(f"获取域名列表失败: {str(e)}")
+        all_domains = []
+        page_number = 1
+        page_size = 100  # 接口允许的最大值
+        
+        while True:
+            request = DescribeDomainsRequest()
+            request.set_accept_format('json')
+            request.set_PageNumber(page_number)
+            request.set_PageSize(page_size)
             
-    def get_domain_records(self, domain_name):
+            try:
+                result = self._do_action(request, profile)
+            except Exception as e:
+                raise Exception(f"获取域名列表失败: {str(e)}") from e
+                
+            domains = result.get("Domains", {}).get("Domain", [])
+            all_domains.extend(domains)
+            # 不返回 TotalCount 时按单页处理
+            if not domains or len(all_domains) >= result.get("TotalCount", len(all_domains)):
+                break
+            page_number += 1
+            
+        return all_domains
+            
+    def get_domain_records(self, domain_name, profile=None):
         """获取指定域名的所有解析记录（支持分页）"""
-        if not self.client:
-            raise Exception("未配置阿里云账号")
+        self.get_account(profile)
             
+        from aliyunsdkalidns.request.v20150109.DescribeDomainRecordsRequest import DescribeDomainRecordsRequest
+        
         all_records = []
         page_number = 1
         page_size = 100  # 每页获取100条记录
@@ -78,84 +238,145 @@ class DNSUpdater:
             request.set_PageSize(page_size)
             
             try:
-                response = self.client.do_action_with_exception(request)
-                result = json.loads(response)
+                result = self._do_action(request, profile)
                 
                 records = result.get("DomainRecords", {}).get("Record", [])
                 total_count = result.get("TotalCount", 0)
                 
                 all_records.extend(records)
                 
-                # 判断是否获取完所有记录
-                if len(all_records) >= total_count:
+                # 判断是否获取完所有记录（分页期间有记录被删除时可能提前返回空页）
+                if len(all_records) >= total_count or not records:
                     break
                     
                 page_number += 1
                 
             except Exception as e:
-                raise Exception(f"获取域名 {domain_name} 的记录失败: {str(e)}")
+                raise Exception(f"获取域名 {domain_name} 的记录失败: {str(e)}") from e
                 
         return all_records
 
     def get_all_domain_records(self):
-        """获取所有域名的所有记录"""
+        """获取所有账号下所有域名的所有记录，各账号并发获取
+        每条记录以 Profile 标明所属账号
+        获取失败的部分记在 catalog_gaps 中：(账号名, None) 表示该账号的域名列表获取失败，
+        (账号名, 域名) 表示该域名的记录获取失败
+        """
+        accounts = self.client_pool.accounts()
+        if not accounts:
+            raise Exception("未配置阿里云账号")
+        self.catalog_gaps = set()
+            
+        # 单独计时，不与同时进行的同步混在一起
+        timer = StageTimer(self.stage_timer.enabled)
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=len(accounts)) as executor:
+            results = list(executor.map(
+                self._get_account_records, [account.name for account in accounts], [timer] * len(accounts)
+            ))
+            
+        all_records = [record for records in results for record in records]
+        print(f"总共获取到 {len(all_records)} 条记录")  # 调试信息
+        stages = timer.collect()
+        if stages:
+            print(f"获取全部记录各阶段耗时: {format_stages(stages, time.perf_counter() - start)}")
+        return all_records
+
+    def _get_account_records(self, profile, timer=None):
+        """获取一个账号下所有域名的所有记录"""
+        timer = timer or self.stage_timer
         all_records = []
-        domains = self.get_domains()
-        
+        try:
+            with timer.span("list_domains"):
+                domains = self.get_domains(profile)
+        except Exception as e:
+            # 只有一个账号时保持原来的行为，把错误交给调用方
+            if len(self.client_pool.accounts()) == 1:
+                raise
+            print(f"获取账号 {profile} 的域名列表失败: {str(e)}")
+            self.catalog_gaps.add((profile, None))
+            return all_records
+            
         for domain in domains:
             try:
                 domain_name = domain["DomainName"]
                 print(f"正在获取域名 {domain_name} 的记录...")  # 调试信息
-                records = self.get_domain_records(domain_name)
+                with timer.span("list_records"):
+                    records = self.get_domain_records(domain_name, profile)
                 print(f"域名 {domain_name} 获取到 {len(records)} 条记录")  # 调试信息
+                for record in records:
+                    record["Profile"] = profile
+                self.config.save_catalog(profile, domain_name, records)
                 all_records.extend(records)
             except Exception as e:
                 print(f"获取域名 {domain_name} 的记录失败: {str(e)}")
+                self.catalog_gaps.add((profile, domain_name))
                 continue
                 
-        print(f"总共获取到 {len(all_records)} 条记录")  # 调试信息
         return all_records
 
     def get_current_ips(self):
-        """同时获取当前的IPv4和IPv6地址"""
-        ips = {"ipv4": None, "ipv6": None}
-        
-        try:
-            # 获取IPv4
-            response = requests.get('http://4.ipw.cn', timeout=5, headers={
-                'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
-            })
-            response.raise_for_status()
-            ipv4 = response.text.strip()
-            
-            # 验证IPv4格式
-            if re.match(r'^(\d{1,3}\.){3}\d{1,3}$', ipv4):
-                parts = [int(part) for part in ipv4.split('.')]
-                if all(0 <= part <= 255 for part in parts):
-                    ips["ipv4"] = ipv4
-                    print(f"成功获取IPv4: {ipv4}")
-        except Exception as e:
-            print(f"获取IPv4失败: {str(e)}")
-            
+        """同时获取当前的IPv4和IPv6地址（多个服务并发查询，取最先返回的合法结果）"""
+        with self._ip_detect_lock:
+            if self._ip_detector_stale and not self._ip_detect_active:
+                self._replace_ip_detector()
+            self._ip_detect_active += 1
+            detector = self.ip_detector
         try:
-            # 获取IPv6
-            response = requests.get('http://6.ipw.cn', timeout=5, headers={
-                'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
-            })
-            response.raise_for_status()
-            ipv6 = response.text.strip()
-            
-            # 验证IPv6格式
-            if re.match(r'^([0-9a-fA-F]{1,4}:){7}[0-9a-fA-F]{1,4}$', ipv6):
-                ips["ipv6"] = ipv6
-                print(f"成功获取IPv6: {ipv6}")
-        except Exception as e:
-            print(f"获取IPv6失败: {str(e)}")
-            
-        return ips
+            with self.stage_timer.span("ip_detect"):
+                return detector.detect()
+        finally:
+            with self._ip_detect_lock:
+                self._ip_detect_active -= 1
+                if self._ip_detector_stale and not self._ip_detect_active:
+                    self._replace_ip_detector()
+
+    @contextmanager
+    def measure_cycle(self):
+        """包住一轮同步（获取IP 与 sync_records）：统计各阶段耗时，开启性能采样时采集 cProfile
+        结束后结果保存在 last_cycle_stages / last_cycle_time 并输出到日志
+        """
+        self.stage_timer.reset()
+        start = time.perf_counter()
+        with self.profiler.cycle() if self.profiler is not None else nullcontext():
+            try:
+                yield
+            finally:
+                self.last_cycle_time = time.perf_counter() - start
+                self.last_cycle_stages = self.stage_timer.collect()
+                if self.last_cycle_stages:
+                    print(f"本轮各阶段耗时: {format_stages(self.last_cycle_stages, self.last_cycle_time)}")
+
+    def prewarm(self):
+        """启动时在后台预先建立到IP服务和阿里云接口的长连接，SDK 的导入也随之移出启动路径
+        同时探测各接入地址的延迟，预热选中的地址
+        """
+        def warm():
+            try:
+                urls = [url for family_urls in self.ip_detector.providers.values() for url in family_urls]
+                self.transport.prewarm(urls)
+                if self.client_pool.accounts() and self.endpoint_selector.probe_interval:
+                    self.endpoint_selector.probe()
+                endpoint = self.endpoint_selector.get()
+                for account in self.client_pool.accounts():
+                    self.transport.prewarm([f"http://{endpoint}/"], account.client.session)
+            except Exception as e:
+                print(f"预热连接失败: {str(e)}")  # 调试信息
+                
+        threading.Thread(target=warm, name="prewarm", daemon=True).start()
+
+    def get_transport_stats(self):
+        """获取各 HTTP 会话的连接复用计数"""
+        return self.transport.get_stats()
+
+    def get_ip_provider_stats(self):
+        """获取各公网IP服务的耗时与失败统计"""
+        return self.ip_detector.get_stats()
 
-    def get_record_value(self, domain_name, rr, record_type="A"):
+    def get_record_value(self, domain_name, rr, record_type="A", profile=None):
         """获取指定记录的当前值"""
+        from aliyunsdkalidns.request.v20150109.DescribeDomainRecordsRequest import DescribeDomainRecordsRequest
+        
         request = DescribeDomainRecordsRequest()
         request.set_accept_format('json')
         request.set_DomainName(domain_name)
@@ -163,8 +384,7 @@ class DNSUpdater:
         request.set_Type(record_type)
         
         try:
-            response = self.client.do_action_with_exception(request)
-            result = json.loads(response)
+            result = self._do_action(request, profile)
             records = result.get("DomainRecords", {}).get("Record", [])
             
             for record in records:
@@ -175,16 +395,64 @@ class DNSUpdater:
             print(f"获取记录值失败: {str(e)}")
             return None
 
-    def update_record(self, record_id, rr, record_type, value, domain_name):
-        """更新域名记录"""
-        if not self.client:
-            raise Exception("未配置阿里云账号")
+    def build_record_snapshot(self, domain_keys, executor=None, failures=None, cancel_event=None):
+        """按域名批量获取记录，建立 (RR, Type) -> 记录 的内存索引
+        domain_keys: (账号名, 域名) 的集合，不同账号下的同名域名分别拉取
+        每个域名只分页拉取一次，拉取失败的域名对应 None，查询时回退为逐条查询
+        executor: 可选的线程池，传入时各域名并发拉取
+        failures: 可选的字典，传入时记录拉取失败的 (账号名, 域名) 及其错误分类
+        cancel_event: 可选的 threading.Event，置位后中断接口重试前的等待
+        """
+        domain_keys = sorted(domain_keys)
+        build = partial(self._build_domain_index, failures=failures, cancel_event=cancel_event)
+        if executor is not None:
+            indexes = executor.map(build, domain_keys)
+        else:
+            indexes = map(build, domain_keys)
+        return dict(zip(domain_keys, indexes))
+
+    def _build_domain_index(self, domain_key, failures=None, cancel_event=None):
+        """拉取单个域名的全部记录并建立 (RR, Type) 索引，失败返回 None"""
+        profile, domain_name = domain_key
+        try:
+            index = {}
+            with self._cancellable(cancel_event):
+                records = self.get_domain_records(domain_name, profile)
+            for record in records:
+                # 同一 (RR, Type) 存在多条时与 get_record_value 一致，取第一条
+                index.setdefault((record["RR"], record["Type"]), record)
+            self.config.save_catalog(profile, domain_name, records)
+            print(f"域名 {domain_name} 记录快照: {len(index)} 条")  # 调试信息
+            return index
+        except Exception as e:
+            print(f"获取域名 {domain_name} 的记录快照失败: {str(e)}")
+            if failures is not None:
+                failures[domain_key] = self._error_class(e)
+            return None
+
+    def lookup_record_value(self, snapshot, domain_name, rr, record_type="A", profile=None):
+        """优先从记录快照中获取记录的当前值，快照不可用时回退为单条查询"""
+        domain_key = (profile or DEFAULT_PROFILE, domain_name)
+        if snapshot is not None and snapshot.get(domain_key) is not None:
+            record = snapshot[domain_key].get((rr, record_type))
+            return record["Value"] if record else None
+        with self.stage_timer.span("lookup"):
+            return self.get_record_value(domain_name, rr, record_type, profile)
+
+    def update_record(self, record_id, rr, record_type, value, domain_name, skip_lookup=False,
+                      profile=None):
+        """更新域名记录
+        skip_lookup: 调用方已确认当前值与目标值不同时，跳过更新前的查询
+        profile: 记录所属的账号名，默认为 default 账号
+        """
+        self.get_account(profile)
             
         # 先查询当前实际记录值
-        current_value = self.get_record_value(domain_name, rr, record_type)
-        if current_value == value:
-            print(f"记录 {rr}.{domain_name} ({record_type}) 的当前值已经是 {value}，无需更新")
-            return True
+        if not skip_lookup:
+            current_value = self.get_record_value(domain_name, rr, record_type, profile)
+            if current_value == value:
+                print(f"记录 {rr}.{domain_name} ({record_type}) 的当前值已经是 {value}，无需更新")
+                return True
             
         # 处理主机记录格式
         rr = rr.strip()
@@ -197,14 +465,11 @@ class DNSUpdater:
             raise Exception(f"不支持的记录类型: {record_type}")
             
         # 验证IP地址格式
-        if record_type == 'A':
-            ip_pattern = r'^(\d{1,3}\.){3}\d{1,3}$'
-        else:  # AAAA
-            ip_pattern = r'^([0-9a-fA-F]{1,4}:){7}[0-9a-fA-F]{1,4}$'
-            
-        if not re.match(ip_pattern, value.strip()):
+        if not is_valid_record_ip(value.strip(), record_type):
             raise Exception(f"无效的IP地址格式: {value}")
             
+        from aliyunsdkalidns.request.v20150109.UpdateDomainRecordRequest import UpdateDomainRecordRequest
+        
         request = UpdateDomainRecordRequest()
         request.set_accept_format('json')
         request.set_RecordId(record_id)
@@ -214,40 +479,208 @@ class DNSUpdater:
         request.set_TTL(600)
         request.set_Line("default")
         
-        # 添加重试机制
-        max_retries = 3
-        retry_delay = 2  # 秒
-        
-        for attempt in range(max_retries):
-            try:
-                print(f"更新记录参数: RecordId={record_id}, RR={rr}, Type={record_type}, Value={value}")
-                response = self.client.do_action_with_exception(request)
-                result = json.loads(response)
-                print(f"更新成功，尝试次数: {attempt + 1}")
-                return True
-            except Exception as e:
-                error_msg = str(e)
-                print(f"更新失败 (尝试 {attempt + 1}/{max_retries}): {error_msg}")
+        # 网络错误、限流等临时错误由 _do_action 按重试策略退避重试
+        try:
+            print(f"更新记录参数: RecordId={record_id}, RR={rr}, Type={record_type}, Value={value}")
+            self._do_action(request, profile)
+            print("更新成功")
+            return True
+        except Exception as e:
+            error_msg = str(e)
+            print(f"更新失败: {error_msg}")
+            
+            if get_error_code(e) == "DomainRecordDuplicate":
+                # 如果是重复记录错误，检查实际值是否已更新
+                actual_value = self.get_record_value(domain_name, rr, record_type, profile)
+                if actual_value == value:
+                    print(f"记录已经更新为目标值: {value}")
+                    return True
+                    
+            raise Exception(f"更新记录失败: {error_msg}") from e
+
+    def can_skip_sync(self, sync_records, fingerprint, applied_values=None):
+        """判断本轮是否可以跳过所有阿里云接口调用
+        条件: IP 与上次完整同步时一致、未到强制全量核对周期、每条 A/AAAA 记录都已应用当前 IP
+        """
+        full_sync_every = self.config.config.get("full_sync_every", 12)
+        if full_sync_every <= 1:
+            return False
+        if self.config.get_last_ip() != fingerprint:
+            return False
+        if self.cycles_since_full_sync + 1 >= full_sync_every:
+            return False
+            
+        if applied_values is None:
+            applied_values = self.config.get_applied_values()
+        for record in sync_records:
+            if record.type not in ["A", "AAAA"]:
+                continue
+            current_ip = fingerprint["ipv4"] if record.type == "A" else fingerprint["ipv6"]
+            # 该地址族没有获取到 IP 的记录本轮本来就会被跳过
+            if current_ip and applied_values.get(record.record_id) != current_ip:
+                return False
+        return True
+
+    def sync_record(self, record, current_ips, snapshot=None):
+        """同步单条记录（SyncRecord 或配置中的记录字典），返回结果字典
+        结果中的 elapsed_ms 与 attempts 为处理该记录的耗时和发出的接口请求数
+        可在工作线程中调用：AcsClient 在各线程间共享，请求对象每次调用单独创建
+        """
+        if isinstance(record, dict):
+            record = SyncRecord.from_dict(record)
+        self._attempts.count = 0
+        start = time.perf_counter()
+        result = self._sync_record(record, current_ips, snapshot)
+        result["elapsed_ms"] = round((time.perf_counter() - start) * 1000, 1)
+        result["attempts"] = self._attempts.count
+        return result
+
+    def _sync_record(self, record, current_ips, snapshot):
+        try:
+            if record.type not in ["A", "AAAA"]:
+                return {
+                    "domain": record.domain_name,
+                    "rr": record.rr,
+                    "type": record.type,
+                    "status": "skipped",
+                    "message": f"不支持的记录类型: {record.type}"
+                }
                 
-                if "DomainRecordDuplicate" in error_msg:
-                    # 如果是重复记录错误，检查实际值是否已更新
-                    actual_value = self.get_record_value(domain_name, rr, record_type)
-                    if actual_value == value:
-                        print(f"记录已经更新为目标值: {value}")
-                        return True
+            # 根据记录类型选择对应的IP
+            current_ip = current_ips["ipv4"] if record.type == "A" else current_ips["ipv6"]
+            
+            # 没有获取到对应地址族的IP，则跳过
+            if not current_ip:
+                return {
+                    "domain": record.domain_name,
+                    "rr": record.rr,
+                    "type": record.type,
+                    "status": "skipped",
+                    "message": "未能获取IPv4地址" if record.type == "A" else "未能获取IPv6地址"
+                }
                 
-                if attempt < max_retries - 1:
-                    import time
-                    time.sleep(retry_delay)
-                    continue
-                    
-                raise Exception(f"更新记录失败: {error_msg}")
+            # 检查当前实际记录值
+            actual_value = self.lookup_record_value(
+                snapshot, record.domain_name, record.rr, record.type, record.profile
+            )
+            if actual_value == current_ip:
+                return {
+                    "domain": record.domain_name,
+                    "rr": record.rr,
+                    "type": record.type,
+                    "old_ip": actual_value,
+                    "new_ip": current_ip,
+                    "status": "skipped",
+                    "message": f"IP未变化，无需更新: {current_ip}"
+                }
+                
+            print(f"需要更新{record.type}记录: {record.rr}.{record.domain_name} 从 {actual_value} 到 {current_ip}")
+            with self.stage_timer.span("update"):
+                self.update_record(
+                    record.record_id,
+                    record.rr,
+                    record.type,
+                    current_ip,
+                    record.domain_name,
+                    skip_lookup=True,
+                    profile=record.profile
+                )
+            return {
+                "domain": record.domain_name,
+                "rr": record.rr,
+                "type": record.type,
+                "old_ip": actual_value,
+                "new_ip": current_ip,
+                "status": "success",
+                "message": f"更新成功: {record.rr}.{record.domain_name} -> {current_ip}"
+            }
+        except Exception as e:
+            print(f"更新记录失败: {str(e)}")
+            return {
+                "domain": record.domain_name,
+                "rr": record.rr,
+                "type": record.type,
+                "status": "error",
+                "error_class": self._error_class(e),
+                "message": f"更新失败: {str(e)}"
+            }
+
+    @staticmethod
+    def _error_class(error):
+        """单条记录失败的原因分类，包装过的异常按原始异常分类"""
+        while error.__cause__ is not None:
+            error = error.__cause__
+        if isinstance(error, CircuitOpenError):
+            return CIRCUIT_OPEN
+        return classify_error(error)
 
-    def sync_records(self, current_ips=None):
+    def cycle_failure(self, results):
+        """判断一轮同步是否属于整体故障，需要调度器退避；返回原因，正常时返回 None
+        只有域名记录拉取失败、熔断和限流算作整体故障；单条记录的参数、权限等错误
+        （例如记录已在控制台删除）只在结果中报告，不拖慢其他记录的同步
+        （获取IP失败和所有账号都在熔断时 sync_records 直接抛出异常，由调用方退避）
+        """
+        if self.catalog_failures:
+            return f"获取域名记录失败: {', '.join(self.catalog_failures)}"
+        for result in results:
+            if result.get("error_class") in (THROTTLED, CIRCUIT_OPEN):
+                return result["message"]
+        return None
+
+    def _record_cycle(self, started_at, fingerprint, results, record_ids=None):
+        """把一轮同步的结果写入状态数据库与同步历史
+        record_ids 为 None（IP 未变化而跳过接口调用的轮次）时只记录汇总
+        """
+        self.config.record_cycle(started_at, fingerprint, results, record_ids)
+        if self.history is not None:
+            self.history.record_cycle(started_at, fingerprint, results, record_ids)
+
+        finished_at = time.time()
+        failed = False
+        for result in results:
+            metrics.SYNC_RECORDS.inc(status=result["status"])
+            failed = failed or result["status"] == "error"
+        metrics.SYNC_CYCLES.inc(outcome="error" if failed else "success")
+        metrics.SYNC_CYCLE_DURATION.observe(
+            finished_at - started_at, mode="full" if record_ids is not None else "short_circuit"
+        )
+        if not failed:
+            metrics.record_sync_success(finished_at)
+
+    def get_recent_cycles(self, count=None):
+        """最近的同步轮次（内存中保留的部分），新的在前"""
+        return self.history.recent(count) if self.history is not None else []
+
+    def sync_records(self, current_ips=None, progress_callback=None, cancel_event=None):
         """同步所有选中的记录
         current_ips: 可选的当前IP字典，包含ipv4和ipv6
+        progress_callback: 可选，每条记录完成时以 (序号, 结果) 调用，可能在工作线程中调用
+        cancel_event: 可选的 threading.Event，置位后尚未开始的记录不再处理
+        各账号的记录在同一个线程池中并发同步，每个账号有独立的限速和熔断
         """
-        if not self.client:
+        try:
+            return self._sync_records(current_ips, progress_callback, cancel_event)
+        except Exception:
+            # 未能完成的一轮（取IP失败、账号全部熔断等）
+            metrics.SYNC_CYCLES.inc(outcome="failed")
+            raise
+        finally:
+            self.export_component_stats()
+
+    def export_component_stats(self):
+        """把限速、熔断、连接复用和接入地址的统计写入监控指标"""
+        try:
+            metrics.record_component_stats(
+                self.get_rate_limit_stats(),
+                self.get_retry_stats(),
+                self.get_transport_stats(),
+                self.get_endpoint_stats(),
+            )
+        except Exception as e:
+            print(f"导出组件统计失败: {str(e)}")  # 调试信息
+
+    def _sync_records(self, current_ips=None, progress_callback=None, cancel_event=None):
+        if not self.has_accounts():
             raise Exception("未配置阿里云账号")
             
         try:
@@ -262,94 +695,118 @@ class DNSUpdater:
                 raise Exception("无法获取任何IP地址")
                 
         except Exception as e:
-            raise Exception(f"获取IP失败: {str(e)}")
+            raise Exception(f"获取IP失败: {str(e)}") from e
             
-        sync_records = self.config.config.get("sync_records", [])
+        started_at = time.time()
+        self.catalog_failures = []
+        sync_records = list(RecordIndex.from_dicts(self.config.get_sync_records()))
         if not sync_records:
             return []
             
         print(f"需要同步的记录数: {len(sync_records)}")
         
-        results = []
-        for record in sync_records:
-            try:
-                if record["Type"] in ["A", "AAAA"]:
-                    # 根据记录类型选择对应的IP
-                    current_ip = current_ipv4 if record["Type"] == "A" else current_ipv6
-                    
-                    # 如果是IPv6记录但没有获取到IPv6地址，则跳过
-                    if record["Type"] == "AAAA" and not current_ipv6:
-                        results.append({
-                            "domain": record["DomainName"],
-                            "rr": record["RR"],
-                            "type": "AAAA",
-                            "status": "skipped",
-                            "message": "未能获取IPv6地址"
-                        })
-                        continue
-                        
-                    # 如果是IPv4记录但没有获取到IPv4地址，则跳过
-                    if record["Type"] == "A" and not current_ipv4:
-                        results.append({
-                            "domain": record["DomainName"],
-                            "rr": record["RR"],
-                            "type": "A",
-                            "status": "skipped",
-                            "message": "未能获取IPv4地址"
-                        })
-                        continue
-                        
-                    # 检查当前实际记录值
-                    actual_value = self.get_record_value(record["DomainName"], record["RR"], record["Type"])
-                    if actual_value == current_ip:
-                        results.append({
-                            "domain": record["DomainName"],
-                            "rr": record["RR"],
-                            "type": record["Type"],
-                            "old_ip": actual_value,
-                            "new_ip": current_ip,
-                            "status": "skipped",
-                            "message": f"IP未变化，无需更新: {current_ip}"
-                        })
-                        continue
-                        
-                    print(f"需要更新{record['Type']}记录: {record['RR']}.{record['DomainName']} 从 {actual_value} 到 {current_ip}")
-                    if self.update_record(
-                        record["RecordId"],
-                        record["RR"],
-                        record["Type"],
-                        current_ip,
-                        record["DomainName"]
-                    ):
-                        record["Value"] = current_ip
-                        results.append({
-                            "domain": record["DomainName"],
-                            "rr": record["RR"],
-                            "type": record["Type"],
-                            "old_ip": actual_value,
-                            "new_ip": current_ip,
-                            "status": "success",
-                            "message": f"更新成功: {record['RR']}.{record['DomainName']} -> {current_ip}"
-                        })
-                else:
-                    results.append({
-                        "domain": record["DomainName"],
-                        "rr": record["RR"],
-                        "type": record["Type"],
-                        "status": "skipped",
-                        "message": f"不支持的记录类型: {record['Type']}"
-                    })
-            except Exception as e:
-                print(f"更新记录失败: {str(e)}")
-                results.append({
-                    "domain": record["DomainName"],
-                    "rr": record["RR"],
-                    "type": record["Type"],
-                    "status": "error",
-                    "message": f"更新失败: {str(e)}"
-                })
+        # IP 与上次成功应用的一致且各记录均已应用过该值时，本轮不调用任何阿里云接口
+        fingerprint = {"ipv4": current_ipv4, "ipv6": current_ipv6}
+        applied_values = self.config.get_applied_values()
+        if self.can_skip_sync(sync_records, fingerprint, applied_values):
+            self.cycles_since_full_sync += 1
+            print("IP未变化，跳过本轮阿里云接口调用")  # 调试信息
+            results = [
+                {
+                    "domain": record.domain_name,
+                    "rr": record.rr,
+                    "type": record.type,
+                    "old_ip": applied_values.get(record.record_id),
+                    "new_ip": applied_values.get(record.record_id),
+                    "status": "skipped",
+                    "message": f"IP未变化，无需更新: {applied_values.get(record.record_id)}"
+                    if record.type in ["A", "AAAA"] else f"不支持的记录类型: {record.type}"
+                }
+                for record in sync_records
+            ]
+            if progress_callback:
+                for index, result in enumerate(results):
+                    progress_callback(index, result)
+            self._record_cycle(started_at, fingerprint, results)
+            return results
+            
+        # 定期在后台重新探测接入地址，本轮使用当前选择（跳过接口调用的轮次不探测）
+        self.endpoint_selector.probe_if_due()
         
-        self.config.config["sync_records"] = sync_records
-        self.config.save_config()
+        # 涉及的账号全部在熔断期间时不发出请求，直接判定本轮失败，由调度器退避
+        accounts = [self.client_pool.get(profile) for profile in {r.profile for r in sync_records}]
+        open_accounts = [account for account in accounts if account is not None and account.breaker.is_open()]
+        if open_accounts and len(open_accounts) == len(accounts):
+            breaker = open_accounts[0].breaker
+            raise Exception(
+                f"阿里云接口暂时不可用（熔断中，{breaker.remaining():.0f} 秒后重试）: {breaker.last_error}"
+            )
+        
+        def sync_one(item):
+            index, record = item
+            if cancel_event is not None and cancel_event.is_set():
+                result = {
+                    "domain": record.domain_name,
+                    "rr": record.rr,
+                    "type": record.type,
+                    "status": "skipped",
+                    "message": "同步已取消"
+                }
+            else:
+                # 本轮的取消请求同时用于中断接口重试前的等待
+                with self._cancellable(cancel_event):
+                    result = self.sync_record(record, current_ips, snapshot)
+            if progress_callback:
+                progress_callback(index, result)
+            return result
+        
+        max_workers = max(1, int(self.config.config.get("sync_workers", 8)))
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            # 快照模式：每个域名每轮只拉取一次记录，所有当前值查询都走内存索引
+            snapshot = None
+            if self.config.config.get("sync_mode", "snapshot") == "snapshot":
+                failures = {}
+                with self.stage_timer.span("snapshot"):
+                    snapshot = self.build_record_snapshot({
+                        (record.profile, record.domain_name) for record in sync_records
+                        if record.type in ["A", "AAAA"]
+                    }, executor, failures, cancel_event)
+                # 只有临时性的拉取失败算作整体故障；域名不存在、账号未配置等
+                # 永久错误退避也不会恢复，由各条记录的同步结果报告
+                self.catalog_failures = sorted(
+                    domain_name for (_, domain_name), error_class in failures.items()
+                    if error_class in (RETRYABLE, THROTTLED, CIRCUIT_OPEN)
+                )
+                
+            # 并发处理各条记录，executor.map 保证结果顺序与 sync_records 一致
+            results = list(executor.map(sync_one, enumerate(sync_records)))
+            
+        # 只提交有变化的已应用值
+        changes = {}
+        for record, result in zip(sync_records, results):
+            if result["status"] == "error":
+                if record.record_id in applied_values:
+                    changes[record.record_id] = None
+            elif result["status"] == "success" or \
+                    (result.get("new_ip") and result.get("old_ip") == result["new_ip"]):
+                if applied_values.get(record.record_id) != result["new_ip"]:
+                    changes[record.record_id] = result["new_ip"]
+        
+        # 记录本轮完整同步的指纹，清理已取消同步的记录
+        record_ids = {record.record_id for record in sync_records}
+        for record_id in applied_values:
+            if record_id not in record_ids:
+                changes[record_id] = None
+        with self.stage_timer.span("save"):
+            self.config.update_applied_values(changes)
+            if self.config.get_last_ip() != fingerprint:
+                self.config.set_last_ip(fingerprint)
+            self._record_cycle(
+                started_at, fingerprint, results, [record.record_id for record in sync_records]
+            )
+            self.cycles_since_full_sync = 0
+            
+            # 只有内容变化时才写盘，短时间内的多次变化合并为一次
+            self.config.schedule_save()
         
         return results 
\ No newline at end of file
@@ -0,0 +1,185 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# 阿里云DNS接口的候选接入地址，中心地址之外是各地域的接入点
+DEFAULT_ENDPOINTS = [
+    "alidns.aliyuncs.com",
+    "alidns.cn-hangzhou.aliyuncs.com",
+    "alidns.cn-shanghai.aliyuncs.com",
+    "alidns.cn-beijing.aliyuncs.com",
+    "alidns.cn-shenzhen.aliyuncs.com",
+    "alidns.cn-hongkong.aliyuncs.com",
+    "alidns.ap-southeast-1.aliyuncs.com",
+]
+
+
+class EndpointSelector:
+    """探测各候选接入地址的延迟，选择最快的可用地址，出错时自动切换
+
+    启动时和之后每隔 probe_interval 秒在后台探测一次；接口调用遇到网络或服务端错误时，
+    当前地址在下次探测前被视为不可用，切换到次优地址。on_change 在选择变化时被调用，
+    用于把结果写回配置。
+    """
+
+    def __init__(self, candidates=None, transport=None, current=None, probe_interval=3600,
+                 on_change=None):
+        self.candidates = list(candidates or DEFAULT_ENDPOINTS)
+        # 配置中的候选列表（不含下面补入的手工指定地址），用于判断配置是否变化
+        self._configured_candidates = list(self.candidates)
+        self.transport = transport
+        self.probe_interval = probe_interval
+        self.on_change = on_change
+        self.current = current if current in self.candidates else None
+        if current and self.current is None:
+            # 配置中手工指定的地址也参与探测
+            self.candidates.insert(0, current)
+            self.current = current
+        self._results = {}
+        self._failed = set()
+        self._calls = {}
+        self._last_probe = None
+        self._probing = False
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls, config, transport=None, on_change=None):
+        """根据配置字典创建选择器"""
+        return cls(
+            candidates=config.get("alidns_endpoints") or DEFAULT_ENDPOINTS,
+            transport=transport,
+            current=config.get("alidns_endpoint") or None,
+            probe_interval=config.get("endpoint_probe_interval", 3600),
+            on_change=on_change
+        )
+
+    def matches_config(self, config):
+        """配置中的接入地址设置是否与当前选择器一致"""
+        candidates = list(config.get("alidns_endpoints") or DEFAULT_ENDPOINTS)
+        current = config.get("alidns_endpoint") or None
+        with self._lock:
+            return (
+                candidates == self._configured_candidates
+                and current in (None, self.current)
+                and config.get("endpoint_probe_interval", 3600) == self.probe_interval
+            )
+
+    def get(self):
+        """当前使用的接入地址"""
+        with self._lock:
+            return self.current or self.candidates[0]
+
+    def _probe_one(self, host):
+        """测量单个地址的往返延迟：先建立连接，再取复用连接的一次请求耗时"""
+        url = f"http://{host}/"
+        try:
+            latencies = []
+            for _ in range(2):
+                start = time.perf_counter()
+                # 不带参数的请求会得到 4xx 错误响应，能收到响应即说明地址可用
+                self.transport.session.head(
+                    url, timeout=(self.transport.connect_timeout, self.transport.read_timeout),
+                    allow_redirects=False
+                )
+                latencies.append(time.perf_counter() - start)
+            return {"healthy": True, "latency_ms": round(min(latencies) * 1000, 1), "error": None}
+        except Exception as e:
+            return {"healthy": False, "latency_ms": None, "error": str(e)}
+
+    def probe(self):
+        """并发探测所有候选地址，选出延迟最低的可用地址并返回"""
+        with ThreadPoolExecutor(max_workers=len(self.candidates)) as executor:
+            results = dict(zip(self.candidates, executor.map(self._probe_one, self.candidates)))
+
+        with self._lock:
+            self._results = results
+            self._failed = set()
+            self._last_probe = time.monotonic()
+        for host, result in results.items():
+            if result["healthy"]:
+                print(f"接入地址 {host}: {result['latency_ms']}ms")  # 调试信息
+            else:
+                print(f"接入地址 {host} 不可用: {result['error']}")  # 调试信息
+        return self._select()
+
+    def _ranked(self):
+        """按探测延迟排列可用地址；尚未探测的地址按候选顺序排在最后"""
+        def key(host):
+            result = self._results.get(host)
+            if result is None:
+                return (1, self.candidates.index(host))
+            return (0, result["latency_ms"])
+
+        return sorted(
+            (host for host in self.candidates
+             if host not in self._failed and self._results.get(host, {}).get("healthy", True)),
+            key=key
+        )
+
+    def _select(self):
+        with self._lock:
+            ranked = self._ranked()
+            previous = self.current or self.candidates[0]
+            if ranked:
+                self.current = ranked[0]
+            selected = self.current or self.candidates[0]
+        if selected != previous:
+            print(f"切换阿里云DNS接入地址: {previous} -> {selected}")  # 调试信息
+            if self.on_change:
+                self.on_change(selected)
+        return selected
+
+    def probe_if_due(self):
+        """距离上次探测超过 probe_interval 时在后台重新探测，probe_interval 为 0 时不探测"""
+        if not self.probe_interval or self.transport is None:
+            return False
+        with self._lock:
+            if self._probing:
+                return False
+            if self._last_probe is not None and time.monotonic() - self._last_probe < self.probe_interval:
+                return False
+            self._probing = True
+
+        def run():
+            try:
+                self.probe()
+            except Exception as e:
+                print(f"探测接入地址失败: {str(e)}")  # 调试信息
+            finally:
+                with self._lock:
+                    self._probing = False
+
+        threading.Thread(target=run, name="endpoint-probe", daemon=True).start()
+        return True
+
+    def report_failure(self, host, error=None):
+        """接口调用在 host 上遇到网络或服务端错误，切换到次优地址"""
+        with self._lock:
+            if host != (self.current or self.candidates[0]) or len(self.candidates) < 2:
+                return
+            self._failed.add(host)
+        print(f"接入地址 {host} 出错，尝试切换: {str(error)}")  # 调试信息
+        self._select()
+
+    def record_call(self, host, elapsed):
+        """记录一次接口调用在 host 上的耗时"""
+        with self._lock:
+            stat = self._calls.setdefault(host, {"calls": 0, "total_latency": 0.0})
+            stat["calls"] += 1
+            stat["total_latency"] += elapsed
+
+    def get_stats(self):
+        """返回当前地址、各地址的探测结果与实际调用的平均耗时（毫秒）"""
+        with self._lock:
+            return {
+                "current": self.current or self.candidates[0],
+                "probes": {host: dict(result) for host, result in self._results.items()},
+                "failed": sorted(self._failed),
+                "calls": {
+                    host: {
+                        "calls": stat["calls"],
+                        "avg_latency_ms": round(stat["total_latency"] / stat["calls"] * 1000, 1),
+                    }
+                    for host, stat in self._calls.items()
+                },
+            }
@@ -0,0 +1,212 @@
+import gzip
+import json
+import os
+import queue
+import shutil
+import threading
+import time
+from collections import deque
+from datetime import datetime
+
+# 写入线程的停止标记
+_STOP = object()
+
+
+class SyncHistory:
+    """同步历史：每轮同步的逐条结果以 JSON Lines 追加写入日志文件，最近若干轮保留在内存中
+
+    record_cycle 只把数据放入队列，由后台线程批量写盘，不阻塞同步线程。日志文件超过
+    max_bytes 或距创建超过 max_age 秒时轮转，旧文件在后台压缩为 .gz，只保留最近 backups 个。
+    """
+
+    def __init__(self, path, max_bytes=5 * 1024 * 1024, max_age=7 * 86400, backups=5, buffer_size=50):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.backups = backups
+        self._recent = deque(maxlen=max(1, buffer_size))
+        self._recent_lock = threading.Lock()
+        self._queue = queue.Queue()
+        self._file = None
+        self._opened_at = None
+        self._thread = None
+        self._thread_lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls, config, base_dir="."):
+        """根据配置字典创建，history_file 为空时返回 None（不记录历史）"""
+        path = config.get("history_file", "sync_history.jsonl")
+        if not path:
+            return None
+        return cls(
+            os.path.join(base_dir, path),
+            max_bytes=int(config.get("history_max_bytes", 5 * 1024 * 1024)),
+            max_age=float(config.get("history_rotate_days", 7)) * 86400,
+            backups=int(config.get("history_backups", 5)),
+            buffer_size=int(config.get("history_buffer_cycles", 50))
+        )
+
+    def matches_config(self, config, base_dir="."):
+        """配置中的历史设置是否与当前实例一致"""
+        other = SyncHistory.from_config(config, base_dir)
+        return other is not None and (
+            (other.path, other.max_bytes, other.max_age, other.backups, other._recent.maxlen)
+            == (self.path, self.max_bytes, self.max_age, self.backups, self._recent.maxlen)
+        )
+
+    def record_cycle(self, started_at, fingerprint, results, record_ids=None):
+        """记录一轮同步，返回写入的数据；只在内存中排队，实际写盘在后台线程进行
+        record_ids: 与 results 对应的 RecordId 列表，为 None 时只记录汇总
+        """
+        counts = {"success": 0, "error": 0, "skipped": 0}
+        for result in results:
+            counts[result["status"]] = counts.get(result["status"], 0) + 1
+        cycle = {
+            "time": datetime.fromtimestamp(started_at).isoformat(timespec="seconds"),
+            "duration_ms": round((time.time() - started_at) * 1000, 1),
+            "ipv4": fingerprint.get("ipv4"),
+            "ipv6": fingerprint.get("ipv6"),
+            "counts": counts,
+            "records": [
+                {
+                    "record_id": record_id,
+                    "domain": result["domain"],
+                    "rr": result["rr"],
+                    "type": result["type"],
+                    "status": result["status"],
+                    "old_ip": result.get("old_ip"),
+                    "new_ip": result.get("new_ip"),
+                    "elapsed_ms": result.get("elapsed_ms"),
+                    "attempts": result.get("attempts"),
+                    "message": result.get("message"),
+                }
+                for record_id, result in zip(record_ids or [], results)
+            ],
+        }
+        with self._recent_lock:
+            self._recent.append(cycle)
+        self._ensure_thread()
+        self._queue.put(cycle)
+        return cycle
+
+    def recent(self, count=None):
+        """最近的同步轮次，新的在前"""
+        with self._recent_lock:
+            cycles = list(self._recent)
+        cycles.reverse()
+        return cycles[:count] if count else cycles
+
+    def _ensure_thread(self):
+        with self._thread_lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="sync-history", daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        """后台写入：取出队列中已有的全部数据一次写入并 flush"""
+        while True:
+            item = self._queue.get()
+            batch = [item]
+            while True:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            stop = False
+            events = []
+            lines = []
+            for item in batch:
+                if item is _STOP:
+                    stop = True
+                elif isinstance(item, threading.Event):
+                    events.append(item)
+                else:
+                    lines.append(json.dumps(item, ensure_ascii=False))
+            if lines:
+                try:
+                    self._write(lines)
+                except Exception as e:
+                    print(f"写入同步历史失败: {str(e)}")  # 调试信息
+            for event in events:
+                event.set()
+            if stop:
+                self._close_file()
+                return
+
+    def _open(self):
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, exist_ok=True)
+        self._file = open(self.path, "a", encoding="utf-8")
+        # 已有文件按其修改时间计算轮转周期，重启后不会立即轮转
+        self._opened_at = os.path.getmtime(self.path) if self._file.tell() else time.time()
+
+    def _close_file(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def _write(self, lines):
+        if self._file is None:
+            self._open()
+        if self._should_rotate():
+            self._rotate()
+        self._file.write("\n".join(lines) + "\n")
+        self._file.flush()
+
+    def _should_rotate(self):
+        size = self._file.tell()
+        if not size:
+            return False
+        if self.max_bytes and size >= self.max_bytes:
+            return True
+        return bool(self.max_age) and time.time() - self._opened_at >= self.max_age
+
+    def _rotate(self):
+        """把当前日志改名后压缩为 .gz，并清理超出数量的旧文件"""
+        self._close_file()
+        stamp = datetime.now().strftime("%Y%m%d-%H%M%S")
+        base, ext = os.path.splitext(self.path)
+        rotated = f"{base}-{stamp}{ext}"
+        suffix = 1
+        while os.path.exists(f"{rotated}.gz"):
+            # 同一秒内多次轮转
+            rotated = f"{base}-{stamp}.{suffix}{ext}"
+            suffix += 1
+        os.replace(self.path, rotated)
+        self._open()
+        try:
+            with open(rotated, "rb") as src, gzip.open(f"{rotated}.gz", "wb") as dst:
+                shutil.copyfileobj(src, dst)
+            os.remove(rotated)
+        except Exception as e:
+            print(f"压缩同步历史 {rotated} 失败: {str(e)}")  # 调试信息
+        self._remove_old_backups(base, ext)
+
+    def _remove_old_backups(self, base, ext):
+        directory = os.path.dirname(os.path.abspath(self.path))
+        prefix = os.path.basename(base) + "-"
+        backups = sorted(
+            name for name in os.listdir(directory)
+            if name.startswith(prefix) and name.endswith(f"{ext}.gz")
+        )
+        for name in backups[:max(0, len(backups) - self.backups)]:
+            try:
+                os.remove(os.path.join(directory, name))
+            except OSError:
+                pass
+
+    def flush(self, timeout=5):
+        """等待已排队的数据写盘；返回是否在 timeout 秒内完成"""
+        if self._thread is None or not self._thread.is_alive():
+            return True
+        done = threading.Event()
+        self._queue.put(done)
+        return done.wait(timeout)
+
+    def close(self, timeout=5):
+        """写完已排队的数据后停止后台线程"""
+        if self._thread is None or not self._thread.is_alive():
+            self._close_file()
+            return
+        self._queue.put(_STOP)
+        self._thread.join(timeout)
@@ -0,0 +1,220 @@
+import copy
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from .transport import USER_AGENT
+from .ip_utils import is_valid_ipv4, is_valid_ipv6
+from .local_ips import select_local_ips
+from .retry import CircuitBreaker, DEFAULT_FAILURE_THRESHOLD, get_retry_after
+from .metrics import IP_PROVIDER_LATENCY, IP_PROVIDER_REQUESTS
+
+DEFAULT_IP_PROVIDERS = {
+    "ipv4": ["http://4.ipw.cn", "https://api.ipify.org", "https://ipv4.icanhazip.com"],
+    "ipv6": ["http://6.ipw.cn", "https://api6.ipify.org", "https://ipv6.icanhazip.com"],
+}
+
+
+class IPDetector:
+    """并发查询多个公网IP服务，IPv4 与 IPv6 同时进行
+
+    每个地址族取最先返回的合法结果（或 quorum 个服务一致的结果），不再等待其余请求；
+    各服务的耗时与失败次数记录在 stats 中，便于调整服务列表。
+    多个服务竞速本身即是重试：每个服务有独立的熔断器，连续失败或被限流的服务暂时不再查询。
+    """
+
+    def __init__(self, providers=None, timeout=5, quorum=1, mode="http", local_filter=None,
+                 transport=None, failure_threshold=DEFAULT_FAILURE_THRESHOLD, reset_timeout=300):
+        self.providers = providers or DEFAULT_IP_PROVIDERS
+        self.transport = transport
+        self.mode = mode
+        self.local_filter = local_filter or {}
+        self.timeout = timeout
+        self.quorum = max(1, quorum)
+        self._stats = {}
+        self._stats_lock = threading.Lock()
+        self._breakers = {
+            url: CircuitBreaker(url, failure_threshold, reset_timeout)
+            for urls in self.providers.values() for url in urls
+        }
+        # 上一轮未等待的慢请求最多占用 ip_timeout 秒线程，线程数留出一倍余量，不阻塞下一轮查询
+        max_workers = 2 * sum(len(urls) for urls in self.providers.values()) or 1
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="ip-detect")
+        # 由 from_config 创建时记录所用的配置，用于判断配置是否变化
+        self._settings = None
+
+    @staticmethod
+    def _settings_from_config(config):
+        return (
+            config.get("ip_providers") or DEFAULT_IP_PROVIDERS,
+            config.get("ip_timeout", 5),
+            config.get("ip_quorum", 1),
+            config.get("ip_detect_mode", "http"),
+            config.get("local_ip_filter"),
+            config.get("circuit_failure_threshold", DEFAULT_FAILURE_THRESHOLD),
+            config.get("ip_circuit_reset_timeout", 300),
+        )
+
+    @classmethod
+    def from_config(cls, config, transport=None):
+        """根据配置字典创建检测器"""
+        detector = cls(
+            providers=config.get("ip_providers") or DEFAULT_IP_PROVIDERS,
+            timeout=config.get("ip_timeout", 5),
+            quorum=config.get("ip_quorum", 1),
+            mode=config.get("ip_detect_mode", "http"),
+            local_filter=config.get("local_ip_filter"),
+            transport=transport,
+            failure_threshold=config.get("circuit_failure_threshold", DEFAULT_FAILURE_THRESHOLD),
+            reset_timeout=config.get("ip_circuit_reset_timeout", 300)
+        )
+        detector._settings = copy.deepcopy(cls._settings_from_config(config))
+        return detector
+
+    def matches_config(self, config):
+        """配置中的IP检测设置是否与当前检测器一致"""
+        return self._settings is not None and self._settings == self._settings_from_config(config)
+
+    def fetch(self, url):
+        """请求单个IP服务，返回去除空白后的响应文本
+        有传输层时复用其长连接会话，避免每轮重新建立连接
+        连接和读取超时均为 ip_timeout，这也是 detect_family 不再等待的请求占用线程的时长上限
+        """
+        if self.transport is not None:
+            response = self.transport.get(url, timeout=self.timeout)
+        else:
+            import requests
+            response = requests.get(url, timeout=self.timeout, headers={'User-Agent': USER_AGENT})
+        response.raise_for_status()
+        return response.text.strip()
+
+    def _query_provider(self, family, url):
+        """查询单个服务并记录统计信息，返回合法IP或 None"""
+        start = time.perf_counter()
+        error = None
+        ip = None
+        try:
+            text = self.fetch(url)
+            valid = is_valid_ipv4(text) if family == "ipv4" else is_valid_ipv6(text)
+            if valid:
+                ip = text
+            else:
+                error = f"无效的IP地址格式: {text[:64]}"
+        except Exception as e:
+            error = str(e)
+            # 服务端给出 Retry-After（如 429 限流）时按建议的时间暂停该服务
+            self._breakers[url].record_failure(e, open_for=get_retry_after(e))
+        else:
+            if ip:
+                self._breakers[url].record_success()
+            else:
+                self._breakers[url].record_failure(error)
+        elapsed = time.perf_counter() - start
+        self._record_stat(url, elapsed, error)
+        IP_PROVIDER_REQUESTS.inc(provider=url, outcome="error" if error else "success")
+        IP_PROVIDER_LATENCY.observe(elapsed, provider=url)
+        return ip
+
+    def _record_stat(self, url, elapsed, error):
+        with self._stats_lock:
+            stat = self._stats.setdefault(url, {
+                "requests": 0,
+                "failures": 0,
+                "total_latency": 0.0,
+                "last_latency": None,
+                "last_error": None,
+            })
+            stat["requests"] += 1
+            stat["total_latency"] += elapsed
+            stat["last_latency"] = elapsed
+            if error:
+                stat["failures"] += 1
+                stat["last_error"] = error
+
+    def detect_family(self, family):
+        """并发查询一个地址族的所有服务，返回第一个（或达到 quorum 的）合法IP
+        得到结果或超过 ip_timeout 后立即返回；已经发出的请求不会被中断，在后台按各自的超时结束
+        """
+        urls = self.providers.get(family, [])
+        if not urls:
+            return None
+        # 跳过熔断中的服务；全部熔断时仍然全部查询，避免完全拿不到IP
+        available = [url for url in urls if not self._breakers[url].is_open()]
+        urls = available or urls
+
+        quorum = min(self.quorum, len(urls))
+        pending = {self._executor.submit(self._query_provider, family, url) for url in urls}
+        votes = Counter()
+        deadline = time.monotonic() + self.timeout
+        try:
+            while pending:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                done, pending = wait(pending, timeout=remaining, return_when=FIRST_COMPLETED)
+                for future in done:
+                    ip = future.result()
+                    if ip:
+                        votes[ip] += 1
+                        if votes[ip] >= quorum:
+                            return ip
+        finally:
+            # 已得到结果或超时：尚未开始的查询不再发出，已经发出的请求不再等待
+            for future in pending:
+                future.cancel()
+        return None
+
+    def detect(self):
+        """同时获取IPv4和IPv6地址
+        local 模式下优先读取本机网卡地址，只有找不到合适地址的地址族才查询 HTTP 服务
+        """
+        ips = {"ipv4": None, "ipv6": None}
+        if self.mode == "local":
+            ips.update(select_local_ips(self.local_filter))
+            for family in ("ipv4", "ipv6"):
+                if ips[family]:
+                    print(f"从本机网卡获取{'IPv4' if family == 'ipv4' else 'IPv6'}: {ips[family]}")
+                    
+        families = [family for family in ("ipv4", "ipv6") if not ips[family]]
+        threads = [
+            threading.Thread(
+                target=lambda f=family: ips.__setitem__(f, self.detect_family(f)),
+                daemon=True
+            )
+            for family in families[1:]
+        ]
+        for thread in threads:
+            thread.start()
+        if families:
+            ips[families[0]] = self.detect_family(families[0])
+        for thread in threads:
+            thread.join()
+        
+        for family in families:
+            if ips[family]:
+                print(f"成功获取{'IPv4' if family == 'ipv4' else 'IPv6'}: {ips[family]}")
+            else:
+                print(f"获取{'IPv4' if family == 'ipv4' else 'IPv6'}失败")
+        return ips
+
+    def get_stats(self):
+        """返回各服务的统计信息（耗时单位为毫秒）"""
+        with self._stats_lock:
+            return {
+                url: {
+                    "requests": stat["requests"],
+                    "failures": stat["failures"],
+                    "avg_latency_ms": round(stat["total_latency"] / stat["requests"] * 1000, 1),
+                    "last_latency_ms": round(stat["last_latency"] * 1000, 1),
+                    "last_error": stat["last_error"],
+                }
+                for url, stat in self._stats.items()
+            }
+
+    def get_circuit_stats(self):
+        """返回各服务熔断器的状态"""
+        return {url: breaker.get_stats() for url, breaker in self._breakers.items()}
+
+    def shutdown(self):
+        """关闭线程池"""
+        self._executor.shutdown(wait=False, cancel_futures=True)
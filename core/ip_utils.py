@@ -0,0 +1,33 @@
+import ipaddress
+import re
+
+IPV4_PATTERN = re.compile(r'^(\d{1,3}\.){3}\d{1,3}$')
+IPV6_PATTERN = re.compile(r'^([0-9a-fA-F]{1,4}:){7}[0-9a-fA-F]{1,4}$')
+
+
+def is_valid_ipv4(value):
+    """校验IPv4地址格式"""
+    if not value or not IPV4_PATTERN.match(value):
+        return False
+    return all(0 <= int(part) <= 255 for part in value.split('.'))
+
+
+def is_valid_ipv6(value):
+    """校验IPv6地址格式，支持完整格式和 :: 压缩格式"""
+    if not value:
+        return False
+    if IPV6_PATTERN.match(value):
+        return True
+    try:
+        ipaddress.IPv6Address(value)
+    except ValueError:
+        return False
+    # 带接口后缀（fe80::1%eth0）的地址不能用于解析记录
+    return '%' not in value
+
+
+def is_valid_record_ip(value, record_type):
+    """按记录类型校验IP地址格式，A 记录对应IPv4，AAAA 记录对应IPv6"""
+    if record_type == 'A':
+        return is_valid_ipv4(value)
+    return is_valid_ipv6(value)
@@ -0,0 +1,118 @@
+import select
+import socket
+import struct
+import threading
+
+# linux/rtnetlink.h
+RTM_NEWADDR = 20
+RTM_DELADDR = 21
+RTMGRP_IPV4_IFADDR = 0x10
+RTMGRP_IPV6_IFADDR = 0x100
+RT_SCOPE_UNIVERSE = 0
+
+NLMSG_HEADER = struct.Struct("=LHHLL")  # nlmsg_len, nlmsg_type, nlmsg_flags, nlmsg_seq, nlmsg_pid
+IFADDRMSG = struct.Struct("=BBBBL")  # ifa_family, ifa_prefixlen, ifa_flags, ifa_scope, ifa_index
+
+
+class AddressChangeWatcher:
+    """监听内核地址变更通知（netlink RTM_NEWADDR/RTM_DELADDR），去抖后触发回调
+
+    仅支持 Linux；一段时间内的连续事件（如 PPPoE 重拨）只触发一次回调。
+    """
+
+    def __init__(self, callback, debounce=2.0):
+        self.callback = callback
+        self.debounce = debounce
+        self._sock = None
+        self._thread = None
+        self._timer = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+
+    @staticmethod
+    def is_supported():
+        """当前平台是否支持 netlink"""
+        return hasattr(socket, "AF_NETLINK")
+
+    def start(self):
+        """开始监听，平台不支持或创建 socket 失败时返回 False"""
+        if not self.is_supported():
+            return False
+        try:
+            self._sock = socket.socket(socket.AF_NETLINK, socket.SOCK_RAW, socket.NETLINK_ROUTE)
+            self._sock.bind((0, RTMGRP_IPV4_IFADDR | RTMGRP_IPV6_IFADDR))
+        except OSError as e:
+            print(f"创建 netlink 监听失败: {str(e)}")
+            self._sock = None
+            return False
+
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="ip-watcher", daemon=True)
+        self._thread.start()
+        print("已开启网卡地址变更监听")  # 调试信息
+        return True
+
+    def stop(self):
+        """停止监听"""
+        self._stop.set()
+        with self._lock:
+            if self._timer:
+                self._timer.cancel()
+                self._timer = None
+        if self._thread:
+            self._thread.join(timeout=2)
+            self._thread = None
+        if self._sock:
+            self._sock.close()
+            self._sock = None
+
+    def _run(self):
+        while not self._stop.is_set():
+            # 使用超时轮询，便于 stop() 及时退出
+            readable, _, _ = select.select([self._sock], [], [], 1.0)
+            if not readable:
+                continue
+            try:
+                data = self._sock.recv(65536)
+            except OSError:
+                break
+            if self._has_relevant_change(data):
+                self._schedule()
+
+    @staticmethod
+    def _has_relevant_change(data):
+        """解析 netlink 消息，判断是否包含全局地址的增删"""
+        offset = 0
+        while offset + NLMSG_HEADER.size <= len(data):
+            length, msg_type, _, _, _ = NLMSG_HEADER.unpack_from(data, offset)
+            if length < NLMSG_HEADER.size:
+                break
+            if msg_type in (RTM_NEWADDR, RTM_DELADDR) and \
+                    offset + NLMSG_HEADER.size + IFADDRMSG.size <= len(data):
+                _, _, _, scope, _ = IFADDRMSG.unpack_from(data, offset + NLMSG_HEADER.size)
+                # 忽略链路本地、主机范围地址的变化
+                if scope == RT_SCOPE_UNIVERSE:
+                    return True
+            # 消息按 4 字节对齐
+            offset += (length + 3) & ~3
+        return False
+
+    def _schedule(self):
+        """去抖：在最后一个事件之后 debounce 秒再触发回调"""
+        with self._lock:
+            if self._timer:
+                self._timer.cancel()
+            self._timer = threading.Timer(self.debounce, self._fire)
+            self._timer.daemon = True
+            self._timer.start()
+
+    def _fire(self):
+        with self._lock:
+            self._timer = None
+        if self._stop.is_set():
+            return
+        print("检测到网卡地址变化，触发同步")  # 调试信息
+        try:
+            self.callback()
+        except Exception as e:
+            print(f"地址变化回调执行失败: {str(e)}")
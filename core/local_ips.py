@@ -0,0 +1,146 @@
+import ipaddress
+import os
+import socket
+import struct
+import sys
+
+# /proc/net/if_inet6 中的地址标志位
+IFA_F_TEMPORARY = 0x01
+IFA_F_DADFAILED = 0x08
+IFA_F_DEPRECATED = 0x20
+IFA_F_TENTATIVE = 0x40
+
+SIOCGIFADDR = 0x8915
+SIOCGIFNETMASK = 0x891b
+
+# scope 取值与 /proc/net/if_inet6 一致
+SCOPE_NAMES = {0x00: "global", 0x10: "host", 0x20: "link", 0x40: "site"}
+
+PROC_IF_INET6 = "/proc/net/if_inet6"
+
+
+def _linux_ipv6_addresses():
+    """从 /proc/net/if_inet6 读取IPv6地址及其标志"""
+    addresses = []
+    with open(PROC_IF_INET6) as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) < 6:
+                continue
+            raw, _, prefixlen, scope, flags, name = parts[:6]
+            address = ipaddress.IPv6Address(bytes.fromhex(raw))
+            flags = int(flags, 16)
+            addresses.append({
+                "interface": name,
+                "family": "ipv6",
+                "address": str(address),
+                "prefixlen": int(prefixlen, 16),
+                "scope": SCOPE_NAMES.get(int(scope, 16), "global"),
+                "temporary": bool(flags & IFA_F_TEMPORARY),
+                "deprecated": bool(flags & (IFA_F_DEPRECATED | IFA_F_TENTATIVE | IFA_F_DADFAILED)),
+            })
+    return addresses
+
+
+def _linux_ipv4_addresses():
+    """通过 ioctl 读取各网卡的主IPv4地址"""
+    import fcntl
+
+    addresses = []
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    try:
+        for _, name in socket.if_nameindex():
+            request = struct.pack('256s', name.encode()[:15])
+            try:
+                address = socket.inet_ntoa(fcntl.ioctl(sock.fileno(), SIOCGIFADDR, request)[20:24])
+                netmask = socket.inet_ntoa(fcntl.ioctl(sock.fileno(), SIOCGIFNETMASK, request)[20:24])
+            except OSError:
+                # 该网卡没有配置IPv4地址
+                continue
+            ip = ipaddress.IPv4Address(address)
+            addresses.append({
+                "interface": name,
+                "family": "ipv4",
+                "address": address,
+                "prefixlen": ipaddress.IPv4Network(f"0.0.0.0/{netmask}").prefixlen,
+                "scope": "host" if ip.is_loopback else ("link" if ip.is_link_local else "global"),
+                "temporary": False,
+                "deprecated": False,
+            })
+    finally:
+        sock.close()
+    return addresses
+
+
+def _psutil_addresses(psutil):
+    """通过 psutil 读取网卡地址（跨平台，但拿不到临时/弃用标志）"""
+    addresses = []
+    for name, entries in psutil.net_if_addrs().items():
+        for entry in entries:
+            if entry.family not in (socket.AF_INET, socket.AF_INET6):
+                continue
+            try:
+                ip = ipaddress.ip_address(entry.address.split('%')[0])
+                prefixlen = ipaddress.ip_network(f"{ip}/{entry.netmask}", strict=False).prefixlen \
+                    if entry.netmask else ip.max_prefixlen
+            except ValueError:
+                continue
+            addresses.append({
+                "interface": name,
+                "family": "ipv4" if ip.version == 4 else "ipv6",
+                "address": str(ip),
+                "prefixlen": prefixlen,
+                "scope": "host" if ip.is_loopback else ("link" if ip.is_link_local else "global"),
+                "temporary": False,
+                "deprecated": False,
+            })
+    return addresses
+
+
+def get_local_addresses():
+    """枚举本机网卡上的所有地址，无法枚举时返回空列表"""
+    try:
+        if sys.platform.startswith("linux") and os.path.exists(PROC_IF_INET6):
+            return _linux_ipv4_addresses() + _linux_ipv6_addresses()
+        try:
+            import psutil
+        except ImportError:
+            return []
+        return _psutil_addresses(psutil)
+    except Exception as e:
+        print(f"枚举本机网卡地址失败: {str(e)}")
+        return []
+
+
+def _match(entry, options):
+    """判断地址是否满足过滤条件"""
+    interfaces = options.get("interfaces") or []
+    if interfaces and entry["interface"] not in interfaces:
+        return False
+    if entry["interface"] in (options.get("exclude_interfaces") or []):
+        return False
+    if entry["scope"] != options.get("scope", "global"):
+        return False
+    if entry["temporary"] and not options.get("include_temporary", False):
+        return False
+    if entry["deprecated"] and not options.get("include_deprecated", False):
+        return False
+
+    ip = ipaddress.ip_address(entry["address"])
+    # 默认只接受公网地址，内网/保留地址需要走 HTTP 服务获取出口IP
+    if options.get("require_global", True) and not ip.is_global:
+        return False
+    prefix = options.get(f"{entry['family']}_prefix")
+    if prefix and ip not in ipaddress.ip_network(prefix, strict=False):
+        return False
+    return True
+
+
+def select_local_ips(options=None):
+    """按过滤条件从本机网卡选择IPv4/IPv6地址，找不到的地址族为 None"""
+    options = options or {}
+    ips = {"ipv4": None, "ipv6": None}
+    for entry in get_local_addresses():
+        if ips[entry["family"]] is None and _match(entry, options):
+            ips[entry["family"]] = entry["address"]
+    return ips
@@ -0,0 +1,314 @@
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# 接口与网络请求耗时的直方图分桶（秒）
+LATENCY_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+# 一轮同步耗时的直方图分桶（秒）
+CYCLE_BUCKETS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels):
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            items = sorted(self._values.items())
+        lines.extend(self._render_samples(items))
+        return lines
+
+    def _render_samples(self, items):
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+                for key, value in items]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(_Metric):
+    """数值型指标；传入 func 时在每次抓取时调用 func 得到当前值"""
+
+    kind = "gauge"
+
+    def __init__(self, name, documentation, labelnames=(), func=None):
+        super().__init__(name, documentation, labelnames)
+        self.func = func
+
+    def set(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def set_samples(self, samples):
+        """用 [(标签字典, 值), ...] 替换全部取值，不再出现的标签组合随之移除"""
+        values = {self._key(labels): value for labels, value in samples}
+        with self._lock:
+            self._values = values
+
+    def render(self):
+        if self.func is not None:
+            value = self.func()
+            with self._lock:
+                self._values = {} if value is None else {(): value}
+        return super().render()
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets) + (float("inf"),)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = {"counts": [0] * len(self.buckets), "sum": 0.0, "count": 0}
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state["counts"][index] += 1
+                    break
+            state["sum"] += value
+            state["count"] += 1
+
+    def _render_samples(self, items):
+        lines = []
+        for key, state in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets, state["counts"]):
+                cumulative += count
+                labels = _format_labels(self.labelnames, key, [("le", _format_value(bound))])
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(state['sum'])}")
+            lines.append(f"{self.name}_count{labels} {state['count']}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+        self._lock = threading.Lock()
+
+    def register(self, metric):
+        with self._lock:
+            self._metrics.append(metric)
+        return metric
+
+    def render(self):
+        """Prometheus 文本格式"""
+        with self._lock:
+            metrics = list(self._metrics)
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+ALIDNS_REQUESTS = REGISTRY.register(Counter(
+    "ddns_alidns_requests_total", "阿里云DNS接口请求次数（每次尝试计一次）", ("action", "profile", "outcome")
+))
+ALIDNS_LATENCY = REGISTRY.register(Histogram(
+    "ddns_alidns_request_duration_seconds", "阿里云DNS接口请求耗时", ("action", "outcome")
+))
+ALIDNS_RETRIES = REGISTRY.register(Counter(
+    "ddns_alidns_retries_total", "阿里云DNS接口重试次数", ("action", "profile")
+))
+IP_PROVIDER_REQUESTS = REGISTRY.register(Counter(
+    "ddns_ip_provider_requests_total", "公网IP服务请求次数", ("provider", "outcome")
+))
+IP_PROVIDER_LATENCY = REGISTRY.register(Histogram(
+    "ddns_ip_provider_duration_seconds", "公网IP服务请求耗时", ("provider",)
+))
+SYNC_CYCLES = REGISTRY.register(Counter(
+    "ddns_sync_cycles_total", "同步轮数", ("outcome",)
+))
+SYNC_CYCLE_DURATION = REGISTRY.register(Histogram(
+    "ddns_sync_cycle_duration_seconds", "一轮同步的耗时", ("mode",), buckets=CYCLE_BUCKETS
+))
+SYNC_RECORDS = REGISTRY.register(Counter(
+    "ddns_sync_records_total", "各轮同步中记录的处理结果", ("status",)
+))
+LAST_SUCCESS = REGISTRY.register(Gauge(
+    "ddns_last_success_timestamp_seconds", "上次没有失败记录的同步完成时间（Unix 时间戳）"
+))
+
+RATE_LIMIT_CALLS = REGISTRY.register(Gauge(
+    "ddns_alidns_rate_limit_calls", "经过各账号限速器的阿里云DNS接口调用次数（账号客户端重建后重新计数）",
+    ("profile", "kind")
+))
+RATE_LIMIT_WAITED_CALLS = REGISTRY.register(Gauge(
+    "ddns_alidns_rate_limit_waited_calls", "因限速而排队等待的调用次数", ("profile", "kind")
+))
+RATE_LIMIT_WAIT = REGISTRY.register(Gauge(
+    "ddns_alidns_rate_limit_wait_seconds", "因限速而排队等待的累计秒数", ("profile", "kind")
+))
+CIRCUIT_STATE = REGISTRY.register(Gauge(
+    "ddns_circuit_state", "熔断器状态：0 关闭，1 半开，2 打开", ("target", "name")
+))
+CIRCUIT_FAILURES = REGISTRY.register(Gauge(
+    "ddns_circuit_failures", "熔断器当前的连续失败次数", ("target", "name")
+))
+HTTP_SESSION_REQUESTS = REGISTRY.register(Gauge(
+    "ddns_http_session_requests", "各 HTTP 会话发出的请求数", ("session",)
+))
+HTTP_SESSION_CONNECTIONS = REGISTRY.register(Gauge(
+    "ddns_http_session_connections", "各 HTTP 会话新建的连接数（与请求数之差为复用次数）", ("session",)
+))
+ENDPOINT_CURRENT = REGISTRY.register(Gauge(
+    "ddns_alidns_endpoint_current", "当前使用的阿里云DNS接入地址为 1", ("endpoint",)
+))
+ENDPOINT_CALLS = REGISTRY.register(Gauge(
+    "ddns_alidns_endpoint_calls", "各接入地址的实际调用次数", ("endpoint",)
+))
+ENDPOINT_LATENCY = REGISTRY.register(Gauge(
+    "ddns_alidns_endpoint_latency_seconds", "各接入地址实际调用的平均耗时", ("endpoint",)
+))
+
+CIRCUIT_STATES = {"closed": 0, "half_open": 1, "open": 2}
+
+_last_success = None
+
+
+def record_sync_success(timestamp):
+    global _last_success
+    _last_success = timestamp
+    LAST_SUCCESS.set(timestamp)
+
+
+def record_component_stats(rate_limits, breakers, transport, endpoints):
+    """把限速器、熔断器、HTTP 会话和接入地址的统计（DNSUpdater.get_*_stats 的返回值）写入指标
+    每轮同步结束时调用，指标反映最近一轮结束时的状态
+    """
+    RATE_LIMIT_CALLS.set_samples(
+        ({"profile": profile, "kind": kind}, stat["calls"])
+        for profile, kinds in rate_limits.items() for kind, stat in kinds.items()
+    )
+    RATE_LIMIT_WAITED_CALLS.set_samples(
+        ({"profile": profile, "kind": kind}, stat["waited_calls"])
+        for profile, kinds in rate_limits.items() for kind, stat in kinds.items()
+    )
+    RATE_LIMIT_WAIT.set_samples(
+        ({"profile": profile, "kind": kind}, stat["total_wait_ms"] / 1000)
+        for profile, kinds in rate_limits.items() for kind, stat in kinds.items()
+    )
+    circuits = [
+        ({"target": target, "name": name}, stat)
+        for target, named in breakers.items() for name, stat in named.items()
+    ]
+    CIRCUIT_STATE.set_samples((labels, CIRCUIT_STATES.get(stat["state"], 0)) for labels, stat in circuits)
+    CIRCUIT_FAILURES.set_samples((labels, stat["failures"]) for labels, stat in circuits)
+    HTTP_SESSION_REQUESTS.set_samples(({"session": name}, stat["requests"]) for name, stat in transport.items())
+    HTTP_SESSION_CONNECTIONS.set_samples(
+        ({"session": name}, stat["connections"]) for name, stat in transport.items()
+    )
+    ENDPOINT_CURRENT.set_samples(
+        ({"endpoint": host}, 1 if host == endpoints["current"] else 0)
+        for host in set(endpoints["probes"]) | set(endpoints["calls"]) | {endpoints["current"]}
+    )
+    ENDPOINT_CALLS.set_samples(({"endpoint": host}, stat["calls"]) for host, stat in endpoints["calls"].items())
+    ENDPOINT_LATENCY.set_samples(
+        ({"endpoint": host}, stat["avg_latency_ms"] / 1000) for host, stat in endpoints["calls"].items()
+    )
+
+
+def _seconds_since_last_success():
+    return None if _last_success is None else time.time() - _last_success
+
+
+REGISTRY.register(Gauge(
+    "ddns_seconds_since_last_success", "距上次没有失败记录的同步完成经过的秒数",
+    func=_seconds_since_last_success
+))
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] not in ("/", "/metrics"):
+            self.send_error(404)
+            return
+        body = REGISTRY.render().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        # 不在控制台输出每次抓取的访问日志
+        pass
+
+
+class MetricsServer:
+    """在后台线程中提供 Prometheus 格式的 /metrics"""
+
+    def __init__(self, host="127.0.0.1", port=9464):
+        self.host = host
+        self.port = port
+        self._server = None
+        self._thread = None
+
+    @classmethod
+    def from_config(cls, config):
+        """metrics_port 为 0 时返回 None（不开启）"""
+        port = int(config.get("metrics_port", 0) or 0)
+        if not port:
+            return None
+        return cls(config.get("metrics_host", "127.0.0.1"), port)
+
+    def matches_config(self, config):
+        return (config.get("metrics_host", "127.0.0.1"), int(config.get("metrics_port", 0) or 0)) == \
+            (self.host, self.port)
+
+    def start(self):
+        self._server = ThreadingHTTPServer((self.host, self.port), _MetricsHandler)
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, name="metrics", daemon=True)
+        self._thread.start()
+        print(f"监控指标已开启: http://{self.host}:{self.port}/metrics")  # 调试信息
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
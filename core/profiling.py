@@ -0,0 +1,157 @@
+import os
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+
+# 各阶段在日志和界面中显示的名称
+STAGE_LABELS = {
+    "ip_detect": "获取IP",
+    "snapshot": "拉取记录快照",
+    "lookup": "单条查询",
+    "update": "更新记录",
+    "save": "保存状态",
+    "list_domains": "获取域名列表",
+    "list_records": "获取域名记录",
+}
+
+# 关闭计时时所有阶段共用的空上下文，不产生任何开销
+_NULL_SPAN = nullcontext()
+
+
+class _Span:
+    __slots__ = ("timer", "name", "start")
+
+    def __init__(self, timer, name):
+        self.timer = timer
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.timer.add(self.name, time.perf_counter() - self.start)
+        return False
+
+
+class StageTimer:
+    """按阶段累计耗时和次数；并发执行的阶段累计的是各线程耗时之和"""
+
+    def __init__(self, enabled=True):
+        self.enabled = enabled
+        self._stages = {}
+        self._lock = threading.Lock()
+
+    def span(self, name):
+        """with timer.span("update"): ... 统计一段代码的耗时"""
+        if not self.enabled:
+            return _NULL_SPAN
+        return _Span(self, name)
+
+    def add(self, name, seconds, count=1):
+        with self._lock:
+            stage = self._stages.get(name)
+            if stage is None:
+                self._stages[name] = [seconds, count]
+            else:
+                stage[0] += seconds
+                stage[1] += count
+
+    def reset(self):
+        with self._lock:
+            self._stages = {}
+
+    def collect(self):
+        """返回 {阶段: {"seconds": 累计秒数, "count": 次数}} 并清零"""
+        with self._lock:
+            stages, self._stages = self._stages, {}
+        return {name: {"seconds": seconds, "count": count} for name, (seconds, count) in stages.items()}
+
+
+def format_stages(stages, total=None):
+    """把阶段耗时格式化为一行文字，例如 "总计 820ms | 获取IP 120ms | 更新记录 640ms ×12" """
+    parts = [] if total is None else [f"总计 {total * 1000:.0f}ms"]
+    for name, stage in sorted(stages.items(), key=lambda item: -item[1]["seconds"]):
+        text = f"{STAGE_LABELS.get(name, name)} {stage['seconds'] * 1000:.0f}ms"
+        if stage["count"] > 1:
+            text += f" ×{stage['count']}"
+        parts.append(text)
+    return " | ".join(parts)
+
+
+class CycleProfiler:
+    """用 cProfile 采集接下来 cycles 轮同步（包括线程池中的工作线程），结果合并写入 output
+
+    由环境变量 DDNS_PROFILE_CYCLES（轮数）和 DDNS_PROFILE_OUTPUT（文件路径）开启，
+    每轮结束后都会重写文件，可以用 python -m pstats 或 snakeviz 查看。
+    """
+
+    def __init__(self, cycles, output="ddns_profile.prof"):
+        self.remaining = cycles
+        self.output = output
+        self._stats = None
+        self._profiles = []
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls, environ=None):
+        """环境变量未设置或为 0 时返回 None"""
+        environ = os.environ if environ is None else environ
+        try:
+            cycles = int(environ.get("DDNS_PROFILE_CYCLES", "0") or 0)
+        except ValueError:
+            print(f"DDNS_PROFILE_CYCLES 不是整数: {environ.get('DDNS_PROFILE_CYCLES')}")
+            return None
+        if cycles <= 0:
+            return None
+        return cls(cycles, environ.get("DDNS_PROFILE_OUTPUT") or "ddns_profile.prof")
+
+    def _start_thread(self, frame, event, arg):
+        """threading.setprofile 的钩子：在每个新线程中启动一个 cProfile"""
+        import cProfile
+
+        profile = cProfile.Profile()
+        with self._lock:
+            self._profiles.append(profile)
+        profile.enable()
+
+    @contextmanager
+    def cycle(self):
+        """包住一轮同步；已采集满 cycles 轮后不再采集"""
+        if self.remaining <= 0:
+            yield
+            return
+        # cProfile/pstats 只在开启采样时才导入，不增加启动时间
+        import cProfile
+
+        main = cProfile.Profile()
+        with self._lock:
+            self._profiles = []
+        threading.setprofile(self._start_thread)
+        main.enable()
+        try:
+            yield
+        finally:
+            main.disable()
+            threading.setprofile(None)
+            self.remaining -= 1
+            self._dump(main)
+
+    def _dump(self, main):
+        import pstats
+
+        with self._lock:
+            profiles, self._profiles = self._profiles, []
+        stats = pstats.Stats(main)
+        for profile in profiles:
+            try:
+                stats.add(profile)
+            except TypeError:
+                # 线程在本轮中没有执行任何被采集的调用
+                pass
+        if self._stats is None:
+            self._stats = stats
+        else:
+            self._stats.add(stats)
+        self._stats.dump_stats(self.output)
+        print(f"性能采样已写入 {os.path.abspath(self.output)}（剩余 {self.remaining} 轮）")
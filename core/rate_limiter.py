@@ -0,0 +1,140 @@
+import threading
+import time
+from .retry import RetryCancelled, wait_or_cancel
+
+READ = "read"
+WRITE = "write"
+
+# 查询类接口的前缀，其余接口按写操作计
+READ_ACTION_PREFIXES = ("Describe", "Get", "List", "Query")
+
+
+def action_kind(action_name):
+    """按接口名区分读（Describe* 等）与写（Update* 等）"""
+    return READ if action_name.startswith(READ_ACTION_PREFIXES) else WRITE
+
+
+class TokenBucket:
+    """令牌桶：每秒补充 rate 个令牌，最多积累 capacity 个（允许的突发量）"""
+
+    def __init__(self, rate, capacity=None):
+        self.rate = float(rate)
+        self.capacity = float(capacity or max(1.0, self.rate))
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    def refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def time_until(self, amount):
+        """令牌数达到 amount 还需等待的秒数"""
+        if self.tokens >= amount:
+            return 0.0
+        return (amount - self.tokens) / self.rate
+
+
+class RateLimiter:
+    """阿里云接口的客户端限速，所有接口调用共享
+
+    读、写各有独立的每秒预算，另有一个账号级的总预算；总预算中保留 write_reserve
+    个令牌只供写操作使用，并且有写操作在排队时读操作让行，保证 IP 变化后的更新不被
+    大量查询挤占。速率设为 0 表示不限制对应的预算。
+    """
+
+    def __init__(self, total_rate=20, read_rate=15, write_rate=10, write_reserve=2):
+        self._total = TokenBucket(total_rate) if total_rate > 0 else None
+        self._buckets = {
+            READ: TokenBucket(read_rate) if read_rate > 0 else None,
+            WRITE: TokenBucket(write_rate) if write_rate > 0 else None,
+        }
+        if self._total is not None:
+            # 预留量不能占满总预算，否则读操作永远拿不到令牌
+            self.write_reserve = min(max(0, write_reserve), self._total.capacity - 1)
+        else:
+            self.write_reserve = 0
+        self._waiting_writes = 0
+        self._lock = threading.Lock()
+        self._stats = {
+            kind: {"calls": 0, "waited_calls": 0, "total_wait": 0.0, "max_wait": 0.0}
+            for kind in (READ, WRITE)
+        }
+
+    @classmethod
+    def from_config(cls, config):
+        """根据配置字典创建限速器"""
+        return cls(
+            total_rate=config.get("rate_limit_total", 20),
+            read_rate=config.get("rate_limit_read", 15),
+            write_rate=config.get("rate_limit_write", 10),
+            write_reserve=config.get("rate_limit_write_reserve", 2)
+        )
+
+    def _time_until_ready(self, kind):
+        """在持有锁时计算本次调用还需等待的秒数（0 表示可以立即放行）"""
+        now = time.monotonic()
+        wait = 0.0
+        bucket = self._buckets[kind]
+        if bucket is not None:
+            bucket.refill(now)
+            wait = bucket.time_until(1)
+        if self._total is not None:
+            self._total.refill(now)
+            if kind == READ:
+                wait = max(wait, self._total.time_until(1 + self.write_reserve))
+                if self._waiting_writes:
+                    # 有写操作排队时读操作让行
+                    wait = max(wait, 1 / self._total.rate)
+            else:
+                wait = max(wait, self._total.time_until(1))
+        return wait
+
+    def acquire(self, action_name, cancel_event=None):
+        """等待到允许发出一次 action_name 调用为止，返回等待的秒数"""
+        kind = action_kind(action_name)
+        start = time.monotonic()
+        registered = False
+        delayed = False
+        try:
+            while True:
+                with self._lock:
+                    wait = self._time_until_ready(kind)
+                    if wait <= 0:
+                        if self._buckets[kind] is not None:
+                            self._buckets[kind].tokens -= 1
+                        if self._total is not None:
+                            self._total.tokens -= 1
+                        break
+                    if kind == WRITE and not registered:
+                        self._waiting_writes += 1
+                        registered = True
+                delayed = True
+                if not wait_or_cancel(wait, cancel_event):
+                    raise RetryCancelled(f"{action_name} 已取消")
+        finally:
+            if registered:
+                with self._lock:
+                    self._waiting_writes -= 1
+
+        waited = time.monotonic() - start if delayed else 0.0
+        with self._lock:
+            stat = self._stats[kind]
+            stat["calls"] += 1
+            if delayed:
+                stat["waited_calls"] += 1
+                stat["total_wait"] += waited
+                stat["max_wait"] = max(stat["max_wait"], waited)
+        return waited
+
+    def get_stats(self):
+        """返回读、写调用次数与排队等待时间（毫秒）"""
+        with self._lock:
+            return {
+                kind: {
+                    "calls": stat["calls"],
+                    "waited_calls": stat["waited_calls"],
+                    "total_wait_ms": round(stat["total_wait"] * 1000, 1),
+                    "max_wait_ms": round(stat["max_wait"] * 1000, 1),
+                }
+                for kind, stat in self._stats.items()
+            }
@@ -0,0 +1,77 @@
+def _domain_keys(name):
+    """完整域名及其每一级后缀，例如 www.example.com -> www.example.com, example.com, com"""
+    keys = [name]
+    start = name.find(".")
+    while start != -1:
+        keys.append(name[start + 1:])
+        start = name.find(".", start + 1)
+    return keys
+
+
+class RecordSearchIndex:
+    """域名记录的内存搜索索引，支持前缀和子串匹配
+
+    rows 中每一行是 (完整域名, 其他字段...) 组成的元组，例如 (完整域名, 主机记录, 记录类型, 记录值)。
+    建索引时把每行的字段（小写）和完整域名的每一级后缀用 "\\0" 连接成一个字符串，
+    子串匹配即在其中查找关键字，前缀匹配即查找 "\\0" + 关键字，都由 str 的 C 实现完成。
+    输入时新的关键字包含上一次的关键字，只需要在上一次匹配到的行中继续过滤。
+    """
+
+    def __init__(self, rows):
+        haystacks = []
+        # 记录类型、记录值等字段大量重复，相同的组合只拼接一次
+        tails = {}
+        for name, *fields in rows:
+            fields = tuple(fields)
+            tail = tails.get(fields)
+            if tail is None:
+                tail = tails[fields] = "".join("\0" + field.lower() for field in fields if field)
+            haystacks.append("\0" + "\0".join(_domain_keys(name.lower())) + tail)
+        self._haystacks = haystacks
+        self.size = len(self._haystacks)
+        # 最近一次查询的 {关键字: 匹配到的行号}
+        self._last_matches = {}
+
+    def _candidates(self, term):
+        """可能匹配 term 的行：包含 term 的上一次关键字匹配到的行中最少的一组"""
+        candidates = None
+        for previous, rows in self._last_matches.items():
+            if previous in term and (candidates is None or len(rows) < len(candidates)):
+                candidates = rows
+        return range(self.size) if candidates is None else candidates
+
+    def search(self, query):
+        """返回匹配 query 的行号列表，查询为空时返回 None 表示不过滤
+
+        query 按空白拆分为多个关键字，每个关键字都要出现在该行某个字段中（不区分大小写）。
+        所有关键字都是某个字段或域名某一级的前缀的行排在前面，其余按原有顺序排列。
+        """
+        terms = query.lower().split()
+        if not terms:
+            self._last_matches = {}
+            return None
+
+        haystacks = self._haystacks
+        matches = {}
+        for term in terms:
+            if term not in matches:
+                matches[term] = [row for row in self._candidates(term) if term in haystacks[row]]
+        self._last_matches = matches
+
+        # 从匹配最少的关键字开始求交集，结果保持原有顺序
+        term_rows = sorted(matches.values(), key=len)
+        rows = term_rows[0]
+        for other in term_rows[1:]:
+            other = set(other)
+            rows = [row for row in rows if row in other]
+
+        prefixes = ["\0" + term for term in matches]
+        if len(prefixes) == 1:
+            prefix = prefixes[0]
+            prefix_rows = [row for row in rows if prefix in haystacks[row]]
+        else:
+            prefix_rows = [row for row in rows if all(prefix in haystacks[row] for prefix in prefixes)]
+        if len(prefix_rows) == len(rows):
+            return rows
+        prefix_set = set(prefix_rows)
+        return prefix_rows + [row for row in rows if row not in prefix_set]
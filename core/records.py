@@ -0,0 +1,97 @@
+from .client_pool import DEFAULT_PROFILE
+
+# 配置文件中每条同步记录只保存这些字段；Profile 仅在不是 default 账号时保存
+SYNC_RECORD_KEYS = ("RecordId", "DomainName", "RR", "Type", "Profile")
+
+
+class SyncRecord:
+    """一条需要同步的解析记录，只保留同步所需的字段"""
+
+    __slots__ = ("record_id", "domain_name", "rr", "type", "profile")
+
+    def __init__(self, record_id, domain_name, rr, type, profile=DEFAULT_PROFILE):
+        self.record_id = record_id
+        self.domain_name = domain_name
+        self.rr = rr
+        self.type = type
+        self.profile = profile or DEFAULT_PROFILE
+
+    @classmethod
+    def from_dict(cls, record):
+        """从配置中的记录或阿里云接口返回的完整记录创建"""
+        return cls(
+            record["RecordId"],
+            record["DomainName"],
+            record["RR"],
+            record["Type"],
+            record.get("Profile") or DEFAULT_PROFILE
+        )
+
+    def to_dict(self):
+        """转换为配置文件中保存的精简格式"""
+        record = {
+            "RecordId": self.record_id,
+            "DomainName": self.domain_name,
+            "RR": self.rr,
+            "Type": self.type,
+        }
+        if self.profile != DEFAULT_PROFILE:
+            record["Profile"] = self.profile
+        return record
+
+    @property
+    def full_name(self):
+        return self.domain_name if self.rr == "@" else f"{self.rr}.{self.domain_name}"
+
+    def __repr__(self):
+        return f"SyncRecord({self.record_id!r}, {self.full_name!r}, {self.type!r})"
+
+
+class RecordIndex:
+    """按 RecordId 索引的同步记录集合，保持加入顺序"""
+
+    def __init__(self, records=()):
+        self._records = {}
+        for record in records:
+            self.add(record)
+
+    @classmethod
+    def from_dicts(cls, records):
+        return cls(SyncRecord.from_dict(record) for record in records)
+
+    def add(self, record):
+        self._records[record.record_id] = record
+
+    def remove(self, record_id):
+        self._records.pop(record_id, None)
+
+    def get(self, record_id):
+        return self._records.get(record_id)
+
+    def __contains__(self, record_id):
+        return record_id in self._records
+
+    def __iter__(self):
+        return iter(self._records.values())
+
+    def __len__(self):
+        return len(self._records)
+
+    def record_ids(self):
+        return set(self._records)
+
+    def to_dicts(self):
+        """转换为配置文件中保存的列表"""
+        return [record.to_dict() for record in self._records.values()]
+
+
+def migrate_sync_records(records):
+    """把旧格式（保存了完整阿里云记录）的 sync_records 转换为精简格式
+    返回 (新列表, 是否有变化)；重复的 RecordId 只保留第一条
+    """
+    compact = RecordIndex()
+    for record in records:
+        if record["RecordId"] not in compact:
+            compact.add(SyncRecord.from_dict(record))
+    migrated = compact.to_dicts()
+    return migrated, migrated != records
@@ -0,0 +1,265 @@
+import random
+import threading
+import time
+
+# 错误分类
+RETRYABLE = "retryable"  # 网络错误、服务端临时故障，退避后重试
+THROTTLED = "throttled"  # 被限流，等待更长时间后重试
+FATAL = "fatal"  # 参数、权限等错误，重试也不会成功
+CIRCUIT_OPEN = "circuit_open"  # 熔断中，请求未发出（只用于同步结果的分类）
+
+# 阿里云错误码分类（按前缀匹配，如 Throttling.User 归入 Throttling）
+THROTTLED_CODES = ("Throttling", "LastOperationNotFinished")
+RETRYABLE_CODES = (
+    "InternalError", "ServiceUnavailable", "UnknownError",
+    "SDK.HttpError", "SDK.ServerUnreachable", "SDK.UnknownServerError",
+)
+# 凭证错误：本轮剩余请求也都会失败，直接熔断
+CREDENTIAL_CODES = (
+    "InvalidAccessKeyId", "SignatureDoesNotMatch", "IncompleteSignature",
+    "InvalidAccessKeySecret", "Forbidden.AccessKeyDisabled", "SDK.InvalidCredential",
+)
+
+
+# 连续失败多少次后熔断（阿里云接口与公网IP服务共用，对应配置 circuit_failure_threshold）
+DEFAULT_FAILURE_THRESHOLD = 5
+
+
+class CircuitOpenError(Exception):
+    """熔断器处于打开状态，请求未发出"""
+
+
+class RetryCancelled(Exception):
+    """等待重试期间收到取消请求"""
+
+
+def get_error_code(error):
+    """取出异常携带的错误码（SDK 的 ServerException/ClientException 或 AlidnsError）"""
+    code = getattr(error, "error_code", None) or getattr(error, "code", None)
+    return code if isinstance(code, str) else None
+
+
+def get_http_status(error):
+    """取出异常对应的 HTTP 状态码"""
+    status = getattr(error, "http_status", None)
+    if status is None:
+        response = getattr(error, "response", None)
+        status = getattr(response, "status_code", None)
+    try:
+        return int(status) if status is not None else None
+    except (TypeError, ValueError):
+        return None
+
+
+def get_retry_after(error):
+    """读取服务端建议的等待秒数（异常的 retry_after 属性或响应的 Retry-After 头）"""
+    retry_after = getattr(error, "retry_after", None)
+    if retry_after is None:
+        response = getattr(error, "response", None)
+        headers = getattr(response, "headers", None) or {}
+        retry_after = headers.get("Retry-After")
+    try:
+        return max(0.0, float(retry_after)) if retry_after is not None else None
+    except (TypeError, ValueError):
+        return None
+
+
+def _match_code(code, codes):
+    return any(code == prefix or code.startswith(prefix + ".") for prefix in codes)
+
+
+def is_credential_error(error):
+    """是否为凭证错误"""
+    code = get_error_code(error)
+    return bool(code) and _match_code(code, CREDENTIAL_CODES)
+
+
+def classify_error(error):
+    """把异常归类为 RETRYABLE / THROTTLED / FATAL"""
+    code = get_error_code(error)
+    if code:
+        if _match_code(code, THROTTLED_CODES):
+            return THROTTLED
+        if _match_code(code, RETRYABLE_CODES):
+            return RETRYABLE
+
+    status = get_http_status(error)
+    if status is not None:
+        if status == 429:
+            return THROTTLED
+        if status >= 500:
+            return RETRYABLE
+        return FATAL
+
+    if code:
+        return FATAL
+    # 没有错误码和状态码的异常：连接失败、超时等视为临时错误
+    if isinstance(error, (OSError, TimeoutError)):
+        return RETRYABLE
+    name = type(error).__name__
+    if "Timeout" in name or "Connection" in name:
+        return RETRYABLE
+    return FATAL
+
+
+class RetryPolicy:
+    """指数退避重试策略，带随机抖动；限流错误使用更长的基础等待时间"""
+
+    def __init__(self, max_attempts=3, base_delay=1, max_delay=30, throttle_delay=5, jitter=0.5):
+        self.max_attempts = max(1, int(max_attempts))
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.throttle_delay = throttle_delay
+        self.jitter = jitter
+
+    @classmethod
+    def from_config(cls, config):
+        """根据配置字典创建重试策略"""
+        return cls(
+            max_attempts=config.get("retry_max_attempts", 3),
+            base_delay=config.get("retry_base_delay", 1),
+            max_delay=config.get("retry_max_delay", 30),
+            throttle_delay=config.get("retry_throttle_delay", 5)
+        )
+
+    def get_delay(self, attempt, category, retry_after=None):
+        """第 attempt 次（从 1 开始）失败后，下一次尝试前的等待秒数"""
+        if retry_after is not None:
+            return min(retry_after, self.max_delay)
+        base = self.throttle_delay if category == THROTTLED else self.base_delay
+        delay = min(base * 2 ** (attempt - 1), self.max_delay)
+        if self.jitter:
+            delay *= random.uniform(1 - self.jitter, 1)
+        return delay
+
+
+class CircuitBreaker:
+    """熔断器：连续失败达到阈值后在 reset_timeout 秒内拒绝请求，之后放行一个探测请求
+
+    探测成功则恢复，失败则重新打开。凭证错误会立即打开熔断器。
+    """
+
+    def __init__(self, name, failure_threshold=DEFAULT_FAILURE_THRESHOLD, reset_timeout=60):
+        self.name = name
+        self.failure_threshold = max(1, int(failure_threshold))
+        self.reset_timeout = reset_timeout
+        self.state = "closed"
+        self.failures = 0
+        self.last_error = None
+        self._opened_until = 0.0
+        self._probing = False
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls, name, config):
+        """根据配置字典创建熔断器"""
+        return cls(
+            name,
+            failure_threshold=config.get("circuit_failure_threshold", DEFAULT_FAILURE_THRESHOLD),
+            reset_timeout=config.get("circuit_reset_timeout", 60)
+        )
+
+    def allow(self):
+        """是否允许发出请求；打开状态超时后转为半开并只放行一个探测请求"""
+        with self._lock:
+            if self.state == "open":
+                if time.monotonic() < self._opened_until:
+                    return False
+                self.state = "half_open"
+                self._probing = False
+            if self.state == "half_open":
+                if self._probing:
+                    return False
+                self._probing = True
+            return True
+
+    def is_open(self):
+        """熔断器是否处于打开状态（不改变状态）"""
+        with self._lock:
+            return self.state == "open" and time.monotonic() < self._opened_until
+
+    def remaining(self):
+        """距离允许探测的剩余秒数"""
+        with self._lock:
+            return max(0.0, self._opened_until - time.monotonic())
+
+    def release(self):
+        """放行的请求未发出（如等待限速时被取消），交还半开状态下的探测名额"""
+        with self._lock:
+            self._probing = False
+
+    def record_success(self):
+        with self._lock:
+            self.state = "closed"
+            self.failures = 0
+            self._probing = False
+
+    def record_failure(self, error=None, open_for=None):
+        """记录一次失败；open_for 指定时立即打开该秒数（如凭证错误、Retry-After）"""
+        with self._lock:
+            self.failures += 1
+            self.last_error = str(error) if error is not None else None
+            self._probing = False
+            if open_for is not None or self.state == "half_open" \
+                    or self.failures >= self.failure_threshold:
+                duration = self.reset_timeout if open_for is None else open_for
+                if self.state != "open":
+                    print(f"{self.name} 连续失败，熔断 {duration:.0f} 秒")  # 调试信息
+                self.state = "open"
+                self._opened_until = time.monotonic() + duration
+
+    def get_stats(self):
+        with self._lock:
+            return {
+                "state": self.state,
+                "failures": self.failures,
+                "retry_in": round(max(0.0, self._opened_until - time.monotonic()), 1)
+                if self.state == "open" else 0,
+                "last_error": self.last_error,
+            }
+
+
+def wait_or_cancel(delay, cancel_event=None):
+    """等待 delay 秒；收到取消请求时立即返回 False"""
+    if cancel_event is None:
+        cancel_event = threading.Event()
+    return not cancel_event.wait(delay)
+
+
+def call_with_retry(func, policy, breaker=None, cancel_event=None, description="请求"):
+    """按重试策略调用 func，经过熔断器；致命错误和重试耗尽时抛出最后一次的异常"""
+    for attempt in range(1, policy.max_attempts + 1):
+        if breaker is not None and not breaker.allow():
+            raise CircuitOpenError(
+                f"{breaker.name} 暂时不可用（熔断中，{breaker.remaining():.0f} 秒后重试）: {breaker.last_error}"
+            )
+        try:
+            result = func()
+        except RetryCancelled:
+            if breaker is not None:
+                breaker.release()
+            raise
+        except Exception as e:
+            category = classify_error(e)
+            retry_after = get_retry_after(e)
+            if breaker is not None:
+                if is_credential_error(e):
+                    breaker.record_failure(e, open_for=breaker.reset_timeout)
+                elif category == FATAL:
+                    # 参数类错误说明服务本身可用
+                    breaker.record_success()
+                else:
+                    breaker.record_failure(e, open_for=retry_after)
+
+            if category == FATAL or attempt >= policy.max_attempts:
+                raise
+            delay = policy.get_delay(attempt, category, retry_after)
+            print(f"{description} 失败 ({category}, 尝试 {attempt}/{policy.max_attempts})，"
+                  f"{delay:.1f} 秒后重试: {str(e)}")  # 调试信息
+            if not wait_or_cancel(delay, cancel_event):
+                raise RetryCancelled(f"{description} 已取消")
+            continue
+
+        if breaker is not None:
+            breaker.record_success()
+        return result
@@ -0,0 +1,74 @@
+import random
+from datetime import datetime, timedelta
+
+
+class SyncScheduler:
+    """根据上一轮结果计算下一轮同步的时间
+
+    - 正常情况下按配置的 check_interval 轮询
+    - 阿里云接口或IP服务连续失败时从 retry_interval（即 check_interval）开始指数退避（带随机抖动），
+      最长 max_backoff_interval；开启地址监听后 interval 为很长的兜底间隔，失败重试仍按 check_interval
+    - IP 刚发生变化后，在接下来 fast_recheck_count 轮改用 fast_recheck_interval 快速复查，
+      以便及时跟上频繁重拨的线路
+    """
+
+    def __init__(self, interval=300, max_backoff=3600, fast_recheck_interval=30,
+                 fast_recheck_count=3, jitter=0.1, retry_interval=None):
+        self.interval = interval
+        self.retry_interval = min(retry_interval or interval, interval)
+        self.max_backoff = max(max_backoff, interval)
+        self.fast_recheck_interval = min(fast_recheck_interval, interval)
+        self.fast_recheck_count = fast_recheck_count
+        self.jitter = jitter
+        self.failures = 0
+        self.fast_rechecks_left = 0
+        self.last_ips = None
+        self.next_run_at = None
+
+    @classmethod
+    def from_config(cls, config, interval=None):
+        """根据配置字典创建调度器，interval 用于覆盖 check_interval（如开启地址监听后的兜底间隔）"""
+        return cls(
+            interval=interval or config.get("check_interval", 300),
+            retry_interval=config.get("check_interval", 300),
+            max_backoff=config.get("max_backoff_interval", 3600),
+            fast_recheck_interval=config.get("fast_recheck_interval", 30),
+            fast_recheck_count=config.get("fast_recheck_count", 3),
+            jitter=config.get("schedule_jitter", 0.1)
+        )
+
+    def _jittered(self, delay):
+        if not self.jitter:
+            return delay
+        return delay * random.uniform(1 - self.jitter, 1 + self.jitter)
+
+    def schedule(self, delay):
+        """设置下一轮的运行时间，返回延迟秒数"""
+        self.next_run_at = datetime.now() + timedelta(seconds=delay)
+        return delay
+
+    def on_success(self, current_ips=None):
+        """一轮同步成功，返回距下一轮的秒数"""
+        self.failures = 0
+        if current_ips is not None:
+            if self.last_ips is not None and current_ips != self.last_ips:
+                print("IP发生变化，进入快速复查")  # 调试信息
+                self.fast_rechecks_left = self.fast_recheck_count
+            self.last_ips = dict(current_ips)
+
+        if self.fast_rechecks_left > 0:
+            self.fast_rechecks_left -= 1
+            return self.schedule(self.fast_recheck_interval)
+        return self.schedule(self._jittered(self.interval))
+
+    def on_failure(self):
+        """一轮同步失败，按连续失败次数指数退避，返回距下一轮的秒数"""
+        self.failures += 1
+        delay = min(self.retry_interval * 2 ** (self.failures - 1), self.max_backoff)
+        return self.schedule(self._jittered(delay))
+
+    def seconds_until_next(self):
+        """距下一轮的剩余秒数，尚未安排时返回 None"""
+        if self.next_run_at is None:
+            return None
+        return max(0.0, (self.next_run_at - datetime.now()).total_seconds())
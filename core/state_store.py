@@ -0,0 +1,205 @@
+import json
+import sqlite3
+import threading
+import time
+from .records import SyncRecord
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+CREATE TABLE IF NOT EXISTS sync_records (
+    record_id TEXT PRIMARY KEY,
+    domain_name TEXT NOT NULL,
+    rr TEXT NOT NULL,
+    type TEXT NOT NULL,
+    profile TEXT NOT NULL,
+    position INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_sync_records_name ON sync_records (domain_name, rr, type);
+CREATE TABLE IF NOT EXISTS applied_values (
+    record_id TEXT PRIMARY KEY,
+    value TEXT NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS catalog (
+    profile TEXT NOT NULL,
+    record_id TEXT NOT NULL,
+    domain_name TEXT NOT NULL,
+    rr TEXT NOT NULL,
+    type TEXT NOT NULL,
+    value TEXT,
+    fetched_at REAL NOT NULL,
+    PRIMARY KEY (profile, record_id)
+);
+CREATE INDEX IF NOT EXISTS idx_catalog_name ON catalog (domain_name, rr, type);
+CREATE TABLE IF NOT EXISTS sync_cycles (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    started_at REAL NOT NULL,
+    finished_at REAL NOT NULL,
+    ipv4 TEXT,
+    ipv6 TEXT,
+    success INTEGER NOT NULL,
+    error INTEGER NOT NULL,
+    skipped INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS sync_results (
+    cycle_id INTEGER NOT NULL REFERENCES sync_cycles (id) ON DELETE CASCADE,
+    record_id TEXT NOT NULL,
+    domain_name TEXT NOT NULL,
+    rr TEXT NOT NULL,
+    type TEXT NOT NULL,
+    status TEXT NOT NULL,
+    old_value TEXT,
+    new_value TEXT,
+    message TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_sync_results_record ON sync_results (record_id, cycle_id);
+CREATE INDEX IF NOT EXISTS idx_sync_results_cycle ON sync_results (cycle_id);
+"""
+
+
+class StateStore:
+    """基于 SQLite 的同步状态存储（可选，config 中 state_store 设为 sqlite 时启用）
+
+    保存选中的同步记录、各记录上次成功应用的值、按域名拉取的记录快照和每轮同步结果。
+    使用 WAL 模式，写操作按批在一个事务中提交；记录按 RecordId 和 (域名, 主机记录, 类型)
+    建立索引，单条更新不需要加载全部数据。快照与同步结果只由本程序写入，可用 sqlite3 等工具直接查询。
+    """
+
+    def __init__(self, path, history_limit=1000):
+        self.path = path
+        self.history_limit = history_limit
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("PRAGMA foreign_keys=ON")
+        with self._conn:
+            self._conn.executescript(SCHEMA)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    # 元数据
+
+    def get_meta(self, key, default=None):
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return json.loads(row[0]) if row else default
+
+    def set_meta(self, key, value):
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT INTO meta (key, value) VALUES (?, ?) "
+                "ON CONFLICT (key) DO UPDATE SET value = excluded.value",
+                (key, json.dumps(value))
+            )
+
+    # 同步记录
+
+    def count_sync_records(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM sync_records").fetchone()[0]
+
+    def load_sync_records(self):
+        """按保存时的顺序返回全部同步记录（SyncRecord 列表）"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT record_id, domain_name, rr, type, profile FROM sync_records ORDER BY position"
+            ).fetchall()
+        return [SyncRecord(*row) for row in rows]
+
+    def replace_sync_records(self, records):
+        """用新的选择替换全部同步记录，并清理不再同步的记录的已应用值"""
+        rows = [
+            (record.record_id, record.domain_name, record.rr, record.type, record.profile, position)
+            for position, record in enumerate(records)
+        ]
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM sync_records")
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO sync_records "
+                "(record_id, domain_name, rr, type, profile, position) VALUES (?, ?, ?, ?, ?, ?)",
+                rows
+            )
+            self._conn.execute(
+                "DELETE FROM applied_values WHERE record_id NOT IN (SELECT record_id FROM sync_records)"
+            )
+
+    # 已应用的值
+
+    def get_applied_values(self):
+        with self._lock:
+            return dict(self._conn.execute("SELECT record_id, value FROM applied_values"))
+
+    def update_applied_values(self, changes):
+        """批量更新已应用的值，changes: {RecordId: 值}，值为 None 表示删除"""
+        now = time.time()
+        upserts = [(record_id, value, now) for record_id, value in changes.items() if value is not None]
+        deletes = [(record_id,) for record_id, value in changes.items() if value is None]
+        with self._lock, self._conn:
+            if upserts:
+                self._conn.executemany(
+                    "INSERT INTO applied_values (record_id, value, updated_at) VALUES (?, ?, ?) "
+                    "ON CONFLICT (record_id) DO UPDATE SET value = excluded.value, "
+                    "updated_at = excluded.updated_at",
+                    upserts
+                )
+            if deletes:
+                self._conn.executemany("DELETE FROM applied_values WHERE record_id = ?", deletes)
+
+    # 记录快照
+
+    def save_catalog(self, profile, domain_name, records):
+        """保存一个域名的全部记录快照（替换该域名之前的快照）"""
+        now = time.time()
+        rows = [
+            (profile, record["RecordId"], record["DomainName"], record["RR"], record["Type"],
+             record.get("Value"), now)
+            for record in records
+        ]
+        with self._lock, self._conn:
+            self._conn.execute(
+                "DELETE FROM catalog WHERE profile = ? AND domain_name = ?", (profile, domain_name)
+            )
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO catalog "
+                "(profile, record_id, domain_name, rr, type, value, fetched_at) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                rows
+            )
+
+    # 同步历史
+
+    def record_cycle(self, started_at, fingerprint, results, record_ids=None):
+        """在一个事务中写入一轮同步的汇总和逐条结果
+        record_ids: 与 results 对应的 RecordId 列表，为 None 时只写汇总
+        """
+        counts = {"success": 0, "error": 0, "skipped": 0}
+        for result in results:
+            counts[result["status"]] = counts.get(result["status"], 0) + 1
+        with self._lock, self._conn:
+            cursor = self._conn.execute(
+                "INSERT INTO sync_cycles (started_at, finished_at, ipv4, ipv6, success, error, skipped) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (started_at, time.time(), fingerprint.get("ipv4"), fingerprint.get("ipv6"),
+                 counts["success"], counts["error"], counts["skipped"])
+            )
+            cycle_id = cursor.lastrowid
+            if record_ids is not None:
+                self._conn.executemany(
+                    "INSERT INTO sync_results (cycle_id, record_id, domain_name, rr, type, status, "
+                    "old_value, new_value, message) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    [
+                        (cycle_id, record_id, result["domain"], result["rr"], result["type"],
+                         result["status"], result.get("old_ip"), result.get("new_ip"), result.get("message"))
+                        for record_id, result in zip(record_ids, results)
+                    ]
+                )
+            if self.history_limit:
+                self._conn.execute(
+                    "DELETE FROM sync_cycles WHERE id <= ?", (cycle_id - self.history_limit,)
+                )
+        return cycle_id
@@ -0,0 +1,146 @@
+import threading
+
+USER_AGENT = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
+
+
+class Transport:
+    """DNSUpdater 持有的 HTTP 传输层
+
+    IP 检测使用同一个保持长连接的 requests 会话；各账号 AcsClient 自带的会话也在这里
+    统一设置连接池大小，并汇总各会话的连接复用计数。
+    """
+
+    def __init__(self, pool_connections=4, pool_maxsize=16, connect_timeout=3, read_timeout=5):
+        self.pool_connections = pool_connections
+        self.pool_maxsize = pool_maxsize
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self._sessions = {}
+        self._lock = threading.Lock()
+        self._session = None
+
+    @property
+    def session(self):
+        """共享的 requests 会话，首次使用时才导入 requests 并创建"""
+        if self._session is None:
+            with self._lock:
+                if self._session is None:
+                    import requests
+                    from requests.adapters import HTTPAdapter
+
+                    session = requests.Session()
+                    session.headers['User-Agent'] = USER_AGENT
+                    self._mount(session, HTTPAdapter)
+                    self._sessions["http"] = session
+                    self._session = session
+        return self._session
+
+    @staticmethod
+    def _settings_from_config(config):
+        return (
+            config.get("http_pool_connections", 4),
+            config.get("http_pool_maxsize", 16),
+            config.get("http_connect_timeout", 3),
+            config.get("http_read_timeout", 5),
+        )
+
+    @classmethod
+    def from_config(cls, config):
+        """根据配置字典创建传输层"""
+        return cls(*cls._settings_from_config(config))
+
+    @property
+    def settings(self):
+        """当前的连接池大小与超时设置"""
+        return (self.pool_connections, self.pool_maxsize, self.connect_timeout, self.read_timeout)
+
+    def configure(self, config):
+        """按配置更新连接池大小与超时，返回设置是否有变化
+        共享会话立即按新的连接池大小重建；各账号 AcsClient 的超时在创建时确定，
+        由 ClientPool 发现设置变化后重建客户端
+        """
+        settings = self._settings_from_config(config)
+        if settings == self.settings:
+            return False
+        self.pool_connections, self.pool_maxsize, self.connect_timeout, self.read_timeout = settings
+        with self._lock:
+            if self._session is not None:
+                from requests.adapters import HTTPAdapter
+
+                self._mount(self._session, HTTPAdapter)
+        print(f"HTTP 传输设置已更新: {settings}")  # 调试信息
+        return True
+
+    def _mount(self, session, adapter_class, pool_maxsize=None):
+        for prefix in ("http://", "https://"):
+            session.mount(prefix, adapter_class(
+                pool_connections=self.pool_connections,
+                pool_maxsize=pool_maxsize or self.pool_maxsize
+            ))
+
+    def get(self, url, timeout=None, **kwargs):
+        """通过共享会话发起 GET 请求，timeout 为单个数字时同时作为读超时上限"""
+        if timeout is None:
+            timeout = (self.connect_timeout, self.read_timeout)
+        elif not isinstance(timeout, tuple):
+            timeout = (min(self.connect_timeout, timeout), timeout)
+        return self.session.get(url, timeout=timeout, **kwargs)
+
+    def attach_acs_client(self, client, pool_maxsize=None, name="alidns"):
+        """接管 AcsClient 的会话：按配置重建连接池，并以 name 纳入复用统计"""
+        # AcsClient 使用 SDK 内置的 requests，需要用同一来源的 HTTPAdapter
+        from aliyunsdkcore.vendored.requests.adapters import HTTPAdapter as VendoredHTTPAdapter
+
+        self._mount(client.session, VendoredHTTPAdapter, max(pool_maxsize or 0, self.pool_maxsize))
+        with self._lock:
+            self._sessions[name] = client.session
+
+    def detach_session(self, name):
+        """不再统计某个会话（如账号被移除）"""
+        with self._lock:
+            self._sessions.pop(name, None)
+
+    def prewarm(self, urls, session=None):
+        """预先建立到各地址的连接，放入连接池供后续请求复用（后台执行，失败忽略）"""
+        session = session or self.session
+
+        def warm(url):
+            try:
+                session.head(url, timeout=(self.connect_timeout, self.read_timeout), allow_redirects=False)
+            except Exception as e:
+                print(f"预热连接失败 {url}: {str(e)}")  # 调试信息
+
+        for url in urls:
+            threading.Thread(target=warm, args=(url,), daemon=True).start()
+
+    @staticmethod
+    def _session_stats(session):
+        """汇总一个会话下所有连接池的新建连接数与请求数"""
+        connections = 0
+        requests_count = 0
+        for adapter in session.adapters.values():
+            pools = adapter.poolmanager.pools
+            for key in list(pools.keys()):
+                try:
+                    pool = pools[key]
+                except KeyError:
+                    continue
+                connections += pool.num_connections
+                requests_count += pool.num_requests
+        return {
+            "requests": requests_count,
+            "connections": connections,
+            "reused": max(0, requests_count - connections),
+        }
+
+    def get_stats(self):
+        """返回各会话的连接复用计数"""
+        with self._lock:
+            sessions = dict(self._sessions)
+        return {name: self._session_stats(session) for name, session in sessions.items()}
+
+    def close(self):
+        """关闭所有会话"""
+        with self._lock:
+            for session in self._sessions.values():
+                session.close()
@@ -1,10 +1,6 @@
+import argparse
 import sys
 import os
-from PyQt5.QtWidgets import QApplication
-from PyQt5.QtCore import Qt
-from ui.main_window import MainWindow
-from core.config_manager import ConfigManager
-from core.dns_updater import DNSUpdater
 
 def get_resource_path(relative_path):
     """获取资源文件的绝对路径"""
@@ -13,12 +9,31 @@ def get_resource_path(relative_path):
         return os.path.join(sys._MEIPASS, relative_path)
     return os.path.join(os.path.abspath("."), relative_path)
 
-def main():
+def parse_args():
+    """解析命令行参数，未识别的参数留给 Qt"""
+    parser = argparse.ArgumentParser(description="阿里云DDNS客户端")
+    parser.add_argument("--headless", action="store_true",
+                        help="以无界面守护进程方式运行（不加载 PyQt5）")
+    parser.add_argument("-c", "--config", default="config.json",
+                        help="配置文件路径，默认为当前目录下的 config.json")
+    parser.add_argument("--profile-cycles", type=int, default=0, metavar="N",
+                        help="用 cProfile 采集接下来 N 轮同步（同环境变量 DDNS_PROFILE_CYCLES）")
+    parser.add_argument("--profile-output", metavar="FILE",
+                        help="性能采样输出文件，默认为 ddns_profile.prof（同环境变量 DDNS_PROFILE_OUTPUT）")
+    return parser.parse_known_args()
+
+def run_gui(config_file, qt_args):
+    from PyQt5.QtWidgets import QApplication
+    from PyQt5.QtCore import Qt
+    from ui.main_window import MainWindow
+    from core.config_manager import ConfigManager
+    from core.dns_updater import DNSUpdater
+
     # 启用高DPI支持
     QApplication.setAttribute(Qt.AA_EnableHighDpiScaling)
     QApplication.setAttribute(Qt.AA_UseHighDpiPixmaps)
     
-    app = QApplication(sys.argv)
+    app = QApplication([sys.argv[0]] + qt_args)
     
     # 设置应用信息
     app.setApplicationName("AliyunDDNS")
@@ -27,7 +42,7 @@ def main():
     app.setOrganizationDomain("your-domain.com")
     
     # 初始化配置管理器
-    config_manager = ConfigManager()
+    config_manager = ConfigManager(config_file)
     
     # 初始化DNS更新器
     dns_updater = DNSUpdater(config_manager)
@@ -36,7 +51,26 @@ def main():
     window = MainWindow(config_manager, dns_updater)
     window.show()
     
-    sys.exit(app.exec_())
+    return app.exec_()
+
+def main():
+    args, qt_args = parse_args()
+    
+    # 性能采样参数通过环境变量交给 DNSUpdater
+    if args.profile_cycles:
+        os.environ["DDNS_PROFILE_CYCLES"] = str(args.profile_cycles)
+    if args.profile_output:
+        os.environ["DDNS_PROFILE_OUTPUT"] = args.profile_output
+    
+    if args.headless:
+        # 无界面模式不导入任何 Qt 模块
+        from core.daemon import run_daemon
+        # 输出按行刷新，便于 journald / 容器日志实时查看
+        if sys.stdout:
+            sys.stdout.reconfigure(line_buffering=True)
+        sys.exit(run_daemon(args.config))
+        
+    sys.exit(run_gui(args.config, qt_args))
 
 if __name__ == '__main__':
-    main() 
\ No newline at end of file
+    main() 
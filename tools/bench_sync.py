@@ -0,0 +1,569 @@
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from contextlib import contextmanager, redirect_stdout
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qsl
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_ROOT)
+
+from core.config_manager import ConfigManager  # noqa: E402
+from core.dns_updater import DNSUpdater  # noqa: E402
+from core.async_alidns import AsyncAlidnsClient  # noqa: E402
+from core.retry import RetryPolicy, get_error_code  # noqa: E402
+
+# 阿里云接口各分页接口允许的最大 PageSize 与默认值
+PAGE_LIMITS = {"DescribeDomains": (100, 20), "DescribeDomainRecords": (500, 20)}
+
+SCENARIOS = ("catalog", "sync_changed", "sync_unchanged", "short_circuit")
+
+
+class FaultInjector:
+    """按配置给每个请求加上延迟，并按比例返回服务端错误或限流"""
+
+    def __init__(self, latency_ms=0.0, jitter_ms=0.0, error_rate=0.0, throttle_rate=0.0, seed=0):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.throttle_rate = throttle_rate
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def apply(self):
+        """等待注入的延迟，返回 None 或要注入的错误（"error" / "throttle"）"""
+        with self._lock:
+            delay = self.latency_ms + self._random.uniform(0, self.jitter_ms)
+            roll = self._random.random()
+        if delay:
+            time.sleep(delay / 1000)
+        if roll < self.error_rate:
+            return "error"
+        if roll < self.error_rate + self.throttle_rate:
+            return "throttle"
+        return None
+
+
+class FakeAlidnsServer:
+    """本地的阿里云DNS RPC 接口模拟，支持 DescribeDomains / DescribeDomainRecords / UpdateDomainRecord
+
+    分页规则与线上一致：PageSize 超过上限时按上限返回。不校验签名，只统计调用次数。
+    """
+
+    def __init__(self, records, faults):
+        self.records = records
+        self.faults = faults
+        self.calls = Counter()
+        self._lock = threading.Lock()
+        self._index()
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            # 响应头和响应体分两次写出，长连接下需要关闭 Nagle 算法，否则每次请求多等 40ms
+            disable_nagle_algorithm = True
+
+            def do_GET(self):
+                server.handle(self, "")
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length") or 0)
+                server.handle(self, self.rfile.read(length).decode())
+
+            def log_message(self, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.httpd.daemon_threads = True
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+
+    @property
+    def endpoint(self):
+        return f"127.0.0.1:{self.httpd.server_address[1]}"
+
+    def _index(self):
+        self.domains = sorted({record["DomainName"] for record in self.records})
+        self.by_domain = {}
+        self.by_id = {}
+        for record in self.records:
+            self.by_domain.setdefault(record["DomainName"], []).append(record)
+            self.by_id[record["RecordId"]] = record
+
+    def reset_calls(self):
+        with self._lock:
+            calls, self.calls = self.calls, Counter()
+        return calls
+
+    def handle(self, request, body):
+        params = dict(parse_qsl(urlparse(request.path).query, keep_blank_values=True))
+        params.update(parse_qsl(body, keep_blank_values=True))
+        action = params.get("Action", "")
+        with self._lock:
+            self.calls[action] += 1
+
+        fault = self.faults.apply()
+        if fault == "error":
+            return self.send(request, 503, {"Code": "ServiceUnavailable", "Message": "injected error"})
+        if fault == "throttle":
+            return self.send(request, 400, {"Code": "Throttling.User", "Message": "injected throttling"})
+
+        if action == "DescribeDomains":
+            return self.send(request, 200, self.page(
+                action, params, [{"DomainName": domain} for domain in self.domains], "Domains", "Domain"
+            ))
+        if action == "DescribeDomainRecords":
+            records = self.by_domain.get(params.get("DomainName"), [])
+            if "RRKeyWord" in params:
+                records = [
+                    record for record in records
+                    if params["RRKeyWord"] in record["RR"] and record["Type"] == params.get("Type", record["Type"])
+                ]
+            return self.send(request, 200, self.page(action, params, records, "DomainRecords", "Record"))
+        if action == "UpdateDomainRecord":
+            record = self.by_id.get(params.get("RecordId"))
+            if record is None:
+                return self.send(request, 400, {"Code": "DomainRecordNotBelongToUser", "Message": "not found"})
+            if record["Value"] == params.get("Value") and record["RR"] == params.get("RR"):
+                return self.send(request, 400, {"Code": "DomainRecordDuplicate", "Message": "duplicate"})
+            record["Value"] = params.get("Value")
+            return self.send(request, 200, {"RecordId": record["RecordId"]})
+        return self.send(request, 400, {"Code": "InvalidAction", "Message": action})
+
+    @staticmethod
+    def page(action, params, items, outer, inner):
+        limit, default = PAGE_LIMITS[action]
+        size = min(int(params.get("PageSize") or default), limit)
+        number = int(params.get("PageNumber") or 1)
+        return {
+            "TotalCount": len(items),
+            "PageNumber": number,
+            "PageSize": size,
+            outer: {inner: items[(number - 1) * size:number * size]},
+        }
+
+    @staticmethod
+    def send(request, status, payload):
+        payload.setdefault("RequestId", "bench")
+        body = json.dumps(payload).encode()
+        request.send_response(status)
+        request.send_header("Content-Type", "application/json")
+        request.send_header("Content-Length", str(len(body)))
+        request.end_headers()
+        request.wfile.write(body)
+
+    def shutdown(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+class FakeIPEchoServer:
+    """本地公网IP回显服务，返回 ip 属性的当前值"""
+
+    def __init__(self, faults, ip="203.0.113.1"):
+        self.ip = ip
+        self.faults = faults
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            # 响应头和响应体分两次写出，长连接下需要关闭 Nagle 算法，否则每次请求多等 40ms
+            disable_nagle_algorithm = True
+
+            def do_GET(self):
+                fault = server.faults.apply()
+                status, body = (503, b"unavailable") if fault else (200, server.ip.encode())
+                self.send_response(status)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.httpd.daemon_threads = True
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.httpd.server_address[1]}/"
+
+    def shutdown(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+class TimedClient:
+    """包装 AcsClient，记录每次接口调用（包括失败的调用）的耗时"""
+
+    def __init__(self, client):
+        self.client = client
+        self.samples = []
+        self._lock = threading.Lock()
+
+    def do_action_with_exception(self, request):
+        start = time.perf_counter()
+        try:
+            return self.client.do_action_with_exception(request)
+        finally:
+            elapsed = time.perf_counter() - start
+            with self._lock:
+                self.samples.append(elapsed)
+
+    def take_samples(self):
+        with self._lock:
+            samples, self.samples = self.samples, []
+        return samples
+
+
+def make_records(count, per_domain):
+    records = []
+    for index in range(count):
+        domain = f"bench{index // per_domain:04d}.example"
+        records.append({
+            "RecordId": f"{index}",
+            "DomainName": domain,
+            "RR": f"host{index % per_domain}",
+            "Type": "A",
+            "Value": "198.51.100.1",
+            "TTL": 600,
+            "Line": "default",
+            "Status": "ENABLE",
+        })
+    return records
+
+
+def write_config(path, records, alidns, ip_echo, args):
+    config = {
+        "access_key_id": "bench",
+        "access_key_secret": "bench",
+        "sync_records": [
+            {key: record[key] for key in ("RecordId", "DomainName", "RR", "Type")} for record in records
+        ],
+        "alidns_endpoint": alidns.endpoint,
+        "alidns_endpoints": [alidns.endpoint],
+        "endpoint_probe_interval": 0,
+        "ip_providers": {"ipv4": [ip_echo.url], "ipv6": []},
+        "ip_watch": False,
+        "http_prewarm": False,
+        "sync_workers": args.workers,
+        "rate_limit_total": args.rate_limit,
+        "rate_limit_read": args.rate_limit,
+        "rate_limit_write": args.rate_limit,
+        "retry_base_delay": args.retry_base_delay,
+        "retry_throttle_delay": args.retry_base_delay,
+        "circuit_failure_threshold": 1000000,
+        "config_save_delay": 0,
+        "state_store": args.state_store,
+        "history_file": "sync_history.jsonl",
+    }
+    with open(path, "w") as f:
+        json.dump(config, f)
+
+
+def percentile(samples, fraction):
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
+
+
+class Bench:
+    """一组记录数下的各场景测量"""
+
+    def __init__(self, count, args):
+        self.args = args
+        self.count = count
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.records = make_records(count, args.records_per_domain)
+        self.alidns = FakeAlidnsServer(self.records, FaultInjector(
+            args.latency_ms, args.jitter_ms, args.error_rate, args.throttle_rate, args.seed
+        ))
+        self.ip_echo = FakeIPEchoServer(FaultInjector(
+            args.ip_latency_ms, 0, args.ip_error_rate, 0, args.seed + 1
+        ))
+        config_path = os.path.join(self.temp_dir.name, "config.json")
+        write_config(config_path, self.records, self.alidns, self.ip_echo, args)
+        self.config = ConfigManager(config_path)
+        self.updater = DNSUpdater(self.config)
+        account = self.updater.get_account()
+        self.client = TimedClient(account.client)
+        account.client = self.client
+        self._ip_counter = 1
+
+    def next_ip(self):
+        self._ip_counter += 1
+        self.ip_echo.ip = f"203.0.113.{self._ip_counter % 250 + 1}"
+
+    def prepare(self, scenario):
+        """把环境调整到场景要求的状态（不计入测量）"""
+        if scenario == "sync_changed":
+            self.config.config["full_sync_every"] = 1
+            self.next_ip()
+        elif scenario == "sync_unchanged":
+            # IP 不变但每轮都与阿里云核对
+            self.config.config["full_sync_every"] = 1
+        elif scenario == "short_circuit":
+            if not self.config.get_last_ip():
+                # 需要先有一轮完整同步
+                self.config.config["full_sync_every"] = 1
+                self.run_scenario("sync_unchanged")
+            self.config.config["full_sync_every"] = 1000000
+
+    def run_scenario(self, scenario):
+        if scenario == "catalog":
+            return len(self.updater.get_all_domain_records())
+        with self.updater.measure_cycle():
+            results = self.updater.sync_records(self.updater.get_current_ips())
+        return len(results)
+
+    def measure(self, scenario):
+        walls, samples, calls, stages = [], [], Counter(), Counter()
+        for _ in range(self.args.repeat):
+            self.prepare(scenario)
+            self.alidns.reset_calls()
+            self.client.take_samples()
+            start = time.perf_counter()
+            processed = self.run_scenario(scenario)
+            walls.append(time.perf_counter() - start)
+            calls += self.alidns.reset_calls()
+            samples.extend(self.client.take_samples())
+            for name, stage in self.updater.last_cycle_stages.items():
+                stages[name] += stage["seconds"]
+
+        peak = None
+        if self.args.memory:
+            # 单独再运行一次测量内存峰值，tracemalloc 的开销不计入耗时
+            self.prepare(scenario)
+            tracemalloc.start()
+            self.run_scenario(scenario)
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            self.alidns.reset_calls()
+            self.client.take_samples()
+
+        repeat = self.args.repeat
+        return {
+            "records": self.count,
+            "scenario": scenario,
+            "processed": processed,
+            "wall_time": {"median": statistics.median(walls), "min": min(walls), "max": max(walls)},
+            "calls_per_cycle": {action: count / repeat for action, count in sorted(calls.items())},
+            "calls_total": sum(calls.values()) / repeat,
+            "latency_ms": {
+                "p50": _ms(percentile(samples, 0.5)),
+                "p99": _ms(percentile(samples, 0.99)),
+                "max": _ms(max(samples) if samples else None),
+            },
+            "stages_ms": {name: round(seconds / repeat * 1000, 1) for name, seconds in stages.items()}
+            if scenario != "catalog" else {},
+            "peak_memory_kb": round(peak / 1024) if peak is not None else None,
+        }
+
+    def close(self):
+        self.updater.shutdown()
+        self.config.close_state_store()
+        self.alidns.shutdown()
+        self.ip_echo.shutdown()
+        self.temp_dir.cleanup()
+
+
+def _ms(seconds):
+    return None if seconds is None else round(seconds * 1000, 3)
+
+
+def _format_ms(value):
+    return "-" if value is None else f"{value:.2f}ms"
+
+
+@contextmanager
+def quiet(enabled=True):
+    """屏蔽程序的调试输出，避免输出本身成为瓶颈"""
+    if not enabled:
+        yield
+        return
+    with open(os.devnull, "w") as devnull, redirect_stdout(devnull):
+        yield
+
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=PROJECT_ROOT,
+            capture_output=True, text=True, timeout=5
+        ).stdout.strip() or None
+    except Exception:
+        return None
+
+
+async def _check_async_client(alidns, records, args):
+    """返回发现的问题列表"""
+    problems = []
+    # 注入错误时多重试几次，检查结果不受随机错误影响
+    policy = RetryPolicy(max_attempts=10, base_delay=args.retry_base_delay,
+                         throttle_delay=args.retry_base_delay)
+    async with AsyncAlidnsClient("bench", "bench", endpoint=f"http://{alidns.endpoint}",
+                                 retry_policy=policy) as client:
+        domains = await client.get_domains()
+        expected_domains = {record["DomainName"] for record in records}
+        if {domain["DomainName"] for domain in domains} != expected_domains:
+            problems.append(f"get_domains 返回 {len(domains)} 个域名，应为 {len(expected_domains)} 个")
+
+        catalog = await asyncio.gather(*(client.get_domain_records(name) for name in sorted(expected_domains)))
+        catalog = [record for records in catalog for record in records]
+        if sorted(record["RecordId"] for record in catalog) != sorted(record["RecordId"] for record in records):
+            problems.append(f"get_domain_records 共返回 {len(catalog)} 条记录，应为 {len(records)} 条")
+
+        # 并发更新全部记录
+        value = "203.0.113.200"
+        outcomes = await asyncio.gather(
+            *(client.update_record(record["RecordId"], record["RR"], record["Type"], value) for record in records),
+            return_exceptions=True
+        )
+        errors = [outcome for outcome in outcomes if isinstance(outcome, Exception)]
+        if errors:
+            problems.append(f"update_record 有 {len(errors)} 次失败，例如: {str(errors[0])}")
+        if any(alidns.by_id[record["RecordId"]]["Value"] != value for record in records):
+            problems.append("模拟接口中的记录值未全部更新")
+
+        # 目标值与当前值相同时接口返回 DomainRecordDuplicate，错误码应原样交给调用方
+        record = records[0]
+        try:
+            await client.update_record(record["RecordId"], record["RR"], record["Type"], value)
+            problems.append("重复更新未返回 DomainRecordDuplicate")
+        except Exception as e:
+            if get_error_code(e) != "DomainRecordDuplicate":
+                problems.append(f"重复更新的错误码不是 DomainRecordDuplicate: {str(e)}")
+    return problems
+
+
+def check_async_client(args):
+    """用模拟接口检查异步 RPC 客户端 AsyncAlidnsClient：签名、域名与记录分页、并发更新、错误码解析"""
+    try:
+        import aiohttp  # noqa: F401
+    except ImportError:
+        print("异步客户端检查需要安装 aiohttp: pip install aiohttp")
+        return 1
+    # 域名数超过 DescribeDomains 的单页上限，每个域名的记录数超过默认分页大小
+    records = make_records(25 * 110, 25)
+    alidns = FakeAlidnsServer(records, FaultInjector(
+        args.latency_ms, args.jitter_ms, args.error_rate, args.throttle_rate, args.seed
+    ))
+    try:
+        with quiet(not args.verbose):
+            problems = asyncio.run(_check_async_client(alidns, records, args))
+    finally:
+        alidns.shutdown()
+    for message in problems:
+        print(f"异步客户端检查失败: {message}")
+    if not problems:
+        print(f"异步客户端检查通过（{len(records)} 条记录，接口调用 {sum(alidns.calls.values())} 次）")
+    return 1 if problems else 0
+
+
+def compare(result, baseline, max_regression):
+    """与基线结果比较，接口调用次数增加或耗时超过 max_regression 比例视为回退"""
+    previous = {(item["records"], item["scenario"]): item for item in baseline.get("results", [])}
+    regressions = []
+    for item in result["results"]:
+        old = previous.get((item["records"], item["scenario"]))
+        if old is None:
+            continue
+        wall, old_wall = item["wall_time"]["median"], old["wall_time"]["median"]
+        change = (wall - old_wall) / old_wall if old_wall else 0.0
+        print(f"{item['records']:>6} {item['scenario']:<15} 耗时 {old_wall:.3f}s -> {wall:.3f}s ({change:+.0%}) "
+              f"调用 {old['calls_total']:g} -> {item['calls_total']:g}")
+        if item["calls_total"] > old["calls_total"]:
+            regressions.append(f"{item['records']} 条记录 {item['scenario']}: 接口调用次数增加")
+        if change > max_regression:
+            regressions.append(f"{item['records']} 条记录 {item['scenario']}: 耗时增加 {change:.0%}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="同步吞吐基准测试（本地模拟阿里云DNS接口与公网IP服务）")
+    parser.add_argument("--records", type=int, nargs="+", default=[10, 1000, 10000], help="记录数，可指定多个")
+    parser.add_argument("--records-per-domain", type=int, default=100, help="每个域名下的记录数")
+    parser.add_argument("--scenarios", nargs="+", choices=SCENARIOS, default=list(SCENARIOS),
+                        help="catalog: 获取全部记录; sync_changed: IP 变化全部更新; "
+                             "sync_unchanged: IP 未变化但与阿里云核对; short_circuit: IP 未变化跳过接口调用")
+    parser.add_argument("--repeat", type=int, default=1, help="每个场景测量次数，耗时取中位数")
+    parser.add_argument("--latency-ms", type=float, default=0, help="模拟接口每次请求的延迟（毫秒）")
+    parser.add_argument("--jitter-ms", type=float, default=0, help="在延迟上附加的随机抖动上限（毫秒）")
+    parser.add_argument("--error-rate", type=float, default=0, help="模拟接口返回服务端错误的比例")
+    parser.add_argument("--throttle-rate", type=float, default=0, help="模拟接口返回限流错误的比例")
+    parser.add_argument("--ip-latency-ms", type=float, default=0, help="模拟公网IP服务的延迟（毫秒）")
+    parser.add_argument("--ip-error-rate", type=float, default=0, help="模拟公网IP服务出错的比例")
+    parser.add_argument("--workers", type=int, default=8, help="sync_workers")
+    parser.add_argument("--rate-limit", type=float, default=0,
+                        help="接口限速（每秒），默认 0 不限速，只衡量程序本身")
+    parser.add_argument("--retry-base-delay", type=float, default=0.01, help="重试退避的基础等待（秒）")
+    parser.add_argument("--state-store", choices=("json", "sqlite"), default="json", help="同步状态存储方式")
+    parser.add_argument("--no-memory", dest="memory", action="store_false", help="不测量内存峰值")
+    parser.add_argument("--seed", type=int, default=0, help="错误注入的随机种子")
+    parser.add_argument("--output", help="将结果保存为 JSON 文件")
+    parser.add_argument("--baseline", help="与之前保存的 JSON 结果比较")
+    parser.add_argument("--max-regression", type=float, default=0.25, help="允许的耗时增加比例")
+    parser.add_argument("-v", "--verbose", action="store_true", help="显示程序的调试输出")
+    parser.add_argument("--check-async", action="store_true",
+                        help="只检查异步 RPC 客户端 AsyncAlidnsClient 与模拟接口的交互是否正确（需要 aiohttp）")
+    args = parser.parse_args()
+
+    if args.check_async:
+        return check_async_client(args)
+
+    result = {
+        "revision": git_revision(),
+        "time": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "params": {key: value for key, value in vars(args).items()
+                   if key not in ("output", "baseline", "verbose")},
+        "results": [],
+    }
+
+    for count in args.records:
+        with quiet(not args.verbose):
+            bench = Bench(count, args)
+        try:
+            for scenario in args.scenarios:
+                with quiet(not args.verbose):
+                    item = bench.measure(scenario)
+                result["results"].append(item)
+                latency = item["latency_ms"]
+                print(f"{count:>6} 条记录 {scenario:<15} {item['wall_time']['median']:.3f}s  "
+                      f"调用 {item['calls_total']:g}  "
+                      f"p50 {_format_ms(latency['p50'])}  p99 {_format_ms(latency['p99'])}  "
+                      f"内存峰值 {'-' if item['peak_memory_kb'] is None else str(item['peak_memory_kb']) + 'KB'}")
+        finally:
+            with quiet(not args.verbose):
+                bench.close()
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(result, f, indent=4, ensure_ascii=False)
+        print(f"结果已保存到 {args.output}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare(result, baseline, args.max_regression)
+        for message in regressions:
+            print(f"性能回退: {message}")
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,209 @@
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from bench_sync import FakeAlidnsServer, FaultInjector, make_records  # noqa: E402
+
+# 默认耗时预算（秒），超出即视为启动性能回退
+DEFAULT_WINDOW_BUDGET = 1.0
+# 捷径同步：IP 与上次一致且记录均已应用，零接口调用，只衡量程序本身的启动开销
+DEFAULT_SHORT_CIRCUIT_SYNC_BUDGET = 1.5
+# 冷启动同步：没有任何同步状态，向本地模拟的阿里云DNS接口拉取记录并全部更新
+DEFAULT_COLD_SYNC_BUDGET = 2.0
+
+BENCH_IPV4 = "203.0.113.10"
+
+
+def start_ip_echo_server():
+    """启动本地公网IP回显服务，避免基准测试依赖外网"""
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            body = BENCH_IPV4.encode()
+            self.send_response(200)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def write_short_circuit_config(path, ip_echo_url):
+    """写入捷径同步的配置：IP 与上次同步一致，首次同步走零接口调用的捷径，只衡量程序本身的开销"""
+    config = {
+        "access_key_id": "bench",
+        "access_key_secret": "bench",
+        "sync_records": [{
+            "RecordId": "bench-1",
+            "DomainName": "example.com",
+            "RR": "bench",
+            "Type": "A",
+        }],
+        "last_ip": {"ipv4": BENCH_IPV4, "ipv6": None},
+        "applied_values": {"bench-1": BENCH_IPV4},
+        "full_sync_every": 1000000,
+        "ip_providers": {"ipv4": [ip_echo_url], "ipv6": []},
+        "ip_watch": False,
+        "http_prewarm": False,
+    }
+    with open(path, "w") as f:
+        json.dump(config, f, indent=4)
+
+
+def write_cold_config(path, ip_echo_url, alidns, records):
+    """写入冷启动同步的配置：没有上次同步的IP和已应用的值，首次同步需要查询并更新全部记录"""
+    config = {
+        "access_key_id": "bench",
+        "access_key_secret": "bench",
+        "sync_records": [
+            {key: record[key] for key in ("RecordId", "DomainName", "RR", "Type")} for record in records
+        ],
+        "alidns_endpoint": alidns.endpoint,
+        "alidns_endpoints": [alidns.endpoint],
+        "endpoint_probe_interval": 0,
+        # 不限速：默认每秒 10 次的修改限速会让耗时主要取决于记录数，掩盖程序本身的回退
+        "rate_limit_total": 0,
+        "rate_limit_read": 0,
+        "rate_limit_write": 0,
+        "ip_providers": {"ipv4": [ip_echo_url], "ipv6": []},
+        "ip_watch": False,
+        "http_prewarm": False,
+    }
+    with open(path, "w") as f:
+        json.dump(config, f, indent=4)
+
+
+def summarize(samples):
+    return {"median": statistics.median(samples), "min": min(samples), "max": max(samples)}
+
+
+def run_once(command, env, cwd, timeout):
+    """启动一次程序，返回 (time_to_window, time_to_first_sync)，单位秒"""
+    start = time.time()
+    process = subprocess.Popen(
+        command, env=env, cwd=cwd,
+        stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True
+    )
+    marks = {}
+    try:
+        for line in process.stdout:
+            if line.startswith("STARTUP_PROBE "):
+                _, event, timestamp = line.split()
+                marks.setdefault(event, float(timestamp) - start)
+                if "first_sync" in marks:
+                    break
+        process.wait(timeout=timeout)
+    finally:
+        if process.poll() is None:
+            process.kill()
+            process.wait()
+    return marks.get("window_shown"), marks.get("first_sync")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="启动耗时基准测试")
+    parser.add_argument("--exe", help="测试打包后的可执行文件（如 dist/AliyunDDNS.exe），默认测试 python main.py")
+    parser.add_argument("-n", "--runs", type=int, default=5, help="运行次数，取中位数")
+    parser.add_argument("--window-budget", type=float, default=DEFAULT_WINDOW_BUDGET,
+                        help="窗口显示耗时预算（秒）")
+    parser.add_argument("--sync-budget", type=float, default=DEFAULT_SHORT_CIRCUIT_SYNC_BUDGET,
+                        help="捷径同步（零接口调用）时首次同步完成的耗时预算（秒）")
+    parser.add_argument("--cold-sync-budget", type=float, default=DEFAULT_COLD_SYNC_BUDGET,
+                        help="冷启动（无同步状态，需查询并更新全部记录）时首次同步完成的耗时预算（秒）")
+    parser.add_argument("--cold-records", type=int, default=20, help="冷启动同步的记录数")
+    parser.add_argument("--timeout", type=float, default=60, help="单次运行超时（秒）")
+    parser.add_argument("--output", help="将结果保存为 JSON 文件")
+    args = parser.parse_args()
+
+    project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    server = start_ip_echo_server()
+    ip_echo_url = f"http://127.0.0.1:{server.server_address[1]}"
+    alidns = None
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        config_path = os.path.join(temp_dir, "config.json")
+        if args.exe:
+            command = [os.path.abspath(args.exe), "-c", config_path]
+        else:
+            command = [sys.executable, os.path.join(project_root, "main.py"), "-c", config_path]
+
+        env = dict(os.environ, ALIYUN_DDNS_STARTUP_PROBE="exit")
+        env.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+        windows, short_circuit_syncs, cold_syncs = [], [], []
+        for run in range(args.runs):
+            # 每次使用全新的配置，避免上一次运行写回的状态影响结果
+            write_short_circuit_config(config_path, ip_echo_url)
+            window, sync = run_once(command, env, project_root, args.timeout)
+            if window is None or sync is None:
+                print(f"第 {run + 1} 次运行未输出完整的启动探针，请检查程序输出")
+                return 2
+            windows.append(window)
+            short_circuit_syncs.append(sync)
+
+            # 冷启动：模拟接口中的记录值与当前IP不同，首次同步需要拉取记录并逐条更新
+            records = make_records(args.cold_records, 10)
+            alidns = FakeAlidnsServer(records, FaultInjector())
+            try:
+                write_cold_config(config_path, ip_echo_url, alidns, records)
+                _, cold = run_once(command, env, project_root, args.timeout)
+                updates = alidns.calls["UpdateDomainRecord"]
+            finally:
+                alidns.shutdown()
+            if cold is None:
+                print(f"第 {run + 1} 次冷启动运行未输出首次同步探针，请检查程序输出")
+                return 2
+            if updates != len(records):
+                print(f"第 {run + 1} 次冷启动只更新了 {updates}/{len(records)} 条记录，首次同步未正常完成")
+                return 2
+            cold_syncs.append(cold)
+            print(f"第 {run + 1} 次: 窗口显示 {window:.3f}s, 首次同步（捷径）{sync:.3f}s, "
+                  f"首次同步（冷启动 {len(records)} 条）{cold:.3f}s")
+
+    server.shutdown()
+    result = {
+        "command": command[0] if args.exe else "python main.py",
+        "runs": args.runs,
+        "cold_records": args.cold_records,
+        "time_to_window": summarize(windows),
+        "time_to_first_sync_short_circuit": summarize(short_circuit_syncs),
+        "time_to_first_sync_cold": summarize(cold_syncs),
+        "budget": {
+            "time_to_window": args.window_budget,
+            "time_to_first_sync_short_circuit": args.sync_budget,
+            "time_to_first_sync_cold": args.cold_sync_budget,
+        },
+    }
+    print(json.dumps(result, indent=4, ensure_ascii=False))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(result, f, indent=4)
+
+    failed = False
+    labels = {
+        "time_to_window": "窗口显示",
+        "time_to_first_sync_short_circuit": "首次同步（捷径）",
+        "time_to_first_sync_cold": "首次同步（冷启动）",
+    }
+    for key, label in labels.items():
+        median, budget = result[key]["median"], result["budget"][key]
+        if median > budget:
+            print(f"{label}耗时超出预算: {median:.3f}s > {budget}s")
+            failed = True
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
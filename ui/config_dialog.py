@@ -1,9 +1,10 @@
 from PyQt5.QtWidgets import (QDialog, QVBoxLayout, QHBoxLayout, QLabel, 
-                           QLineEdit, QPushButton, QMessageBox, QTableWidget,
-                           QTableWidgetItem, QCheckBox, QHeaderView)
+                           QLineEdit, QPushButton, QMessageBox, QTableView,
+                           QHeaderView)
 from PyQt5.QtCore import Qt
 from PyQt5.QtGui import QScreen, QColor
-from aliyunsdkalidns.request.v20150109.DescribeDomainRecordsRequest import DescribeDomainRecordsRequest
+from core.records import RecordIndex, SyncRecord
+from .record_table_model import RecordTableModel
 
 class ConfigDialog(QDialog):
     def __init__(self, config_manager, dns_updater, parent=None):
@@ -11,6 +12,8 @@ class ConfigDialog(QDialog):
         self.config = config_manager
         self.dns_updater = dns_updater
         self.domain_records = []
+        # 已选择但在完整获取的域名记录中已不存在的记录（如已在控制台删除），保存时移除
+        self.stale_records = []
         
         # 获取缩放因子
         screen = self.screen()
@@ -22,9 +25,8 @@ class ConfigDialog(QDialog):
         
         self.setup_ui()
         
-        # 如果已经配置了AccessKey，直接加载域名记录
-        if (self.config.config.get("access_key_id") and 
-            self.config.config.get("access_key_secret")):
+        # 如果已经配置了AccessKey（或其他账号），直接加载域名记录
+        if self.dns_updater.has_accounts():
             self.load_domain_records()
 
     def setup_ui(self):
@@ -32,7 +34,7 @@ class ConfigDialog(QDialog):
         self.setWindowTitle("账号配置")
         # 设置窗口大小，增加基础宽度
         base_width = 700  # 从600增加到700
-        base_height = 450  # 保持高度不变
+        base_height = 490  # 增加搜索栏的高度
         self.setFixedSize(
             int(base_width * self.scale_factor),
             int(base_height * self.scale_factor)
@@ -79,9 +81,35 @@ class ConfigDialog(QDialog):
         records_label = QLabel("域名记录列表:")
         layout.addWidget(records_label)
         
-        self.records_table = QTableWidget()
-        self.records_table.setColumnCount(5)
-        self.records_table.setHorizontalHeaderLabels(['选择', '完整域名', '主机记录', '记录类型', '记录值'])
+        # 搜索栏：按输入实时过滤，全选/全不选只作用于过滤后显示的记录
+        search_layout = QHBoxLayout()
+        self.search_input = QLineEdit()
+        self.search_input.setPlaceholderText("搜索完整域名、主机记录、记录类型或记录值")
+        self.search_input.setClearButtonEnabled(True)
+        self.search_input.textChanged.connect(self.filter_records)
+        search_layout.addWidget(self.search_input)
+        
+        self.records_count_label = QLabel()
+        search_layout.addWidget(self.records_count_label)
+        
+        select_all_btn = QPushButton("全选")
+        select_none_btn = QPushButton("全不选")
+        select_all_btn.clicked.connect(lambda: self.set_visible_checked(True))
+        select_none_btn.clicked.connect(lambda: self.set_visible_checked(False))
+        search_layout.addWidget(select_all_btn)
+        search_layout.addWidget(select_none_btn)
+        layout.addLayout(search_layout)
+        
+        # 表格只绘制可见行，勾选状态由模型保存
+        self.records_model = RecordTableModel(self)
+        self.records_table = QTableView()
+        self.records_table.setModel(self.records_model)
+        self.records_table.setSelectionBehavior(QTableView.SelectRows)
+        self.records_table.setWordWrap(False)
+        # 固定行高，不需要逐行计算高度
+        vertical_header = self.records_table.verticalHeader()
+        vertical_header.setSectionResizeMode(QHeaderView.Fixed)
+        vertical_header.setDefaultSectionSize(int(28 * self.scale_factor))
         
         # 设置表格样式
         header = self.records_table.horizontalHeader()
@@ -90,6 +118,8 @@ class ConfigDialog(QDialog):
         header.setSectionResizeMode(2, QHeaderView.ResizeToContents)  # 主机记录
         header.setSectionResizeMode(3, QHeaderView.ResizeToContents)  # 记录类型
         header.setSectionResizeMode(4, QHeaderView.Stretch)  # 记录值
+        # 按内容调整列宽时只计算可见行，过滤时不必遍历大量记录
+        header.setResizeContentsPrecision(0)
         
         # 设置列宽
         self.records_table.setColumnWidth(0, int(40 * self.scale_factor))  # 复选框列
@@ -103,6 +133,13 @@ class ConfigDialog(QDialog):
         self.records_table.setMinimumHeight(int(200 * self.scale_factor))
         layout.addWidget(self.records_table)
         
+        # 已选择的记录在阿里云中不存在时提示用户
+        self.stale_label = QLabel()
+        self.stale_label.setWordWrap(True)
+        self.stale_label.setStyleSheet("color: #fa541c;")
+        self.stale_label.hide()
+        layout.addWidget(self.stale_label)
+        
         # 按钮区域
         btn_layout = QHBoxLayout()
         save_btn = QPushButton("保存")
@@ -156,7 +193,7 @@ class ConfigDialog(QDialog):
             QLineEdit:focus {{
                 border-color: #40a9ff;
             }}
-            QTableWidget {{
+            QTableView {{
                 font-size: {scaled_font_size}pt;
                 border: 1px solid #e8e8e8;
                 border-radius: {int(4 * self.scale_factor)}px;
@@ -169,12 +206,9 @@ class ConfigDialog(QDialog):
                 border: none;
                 border-bottom: 1px solid #e8e8e8;
             }}
-            QTableWidget::item {{
+            QTableView::item {{
                 padding: {int(6 * self.scale_factor)}px;
             }}
-            QCheckBox {{
-                font-size: {scaled_font_size}pt;
-            }}
         """)
 
     def load_domain_records(self):
@@ -185,6 +219,7 @@ class ConfigDialog(QDialog):
             self.update_records_table()
         except Exception as e:
             print(f"加载域名记录失败: {str(e)}")  # 调试信息
+            self.set_stale_records([])
             QMessageBox.warning(self, "警告", f"加载域名记录失败: {str(e)}")
 
     def test_connection(self):
@@ -220,77 +255,83 @@ class ConfigDialog(QDialog):
         except Exception as e:
             QMessageBox.critical(self, "错误", f"连接失败: {str(e)}")
             self.domain_records = []
-            self.records_table.setRowCount(0)
+            self.records_model.clear()
+            self.update_records_count()
+            self.set_stale_records([])
 
     def update_records_table(self):
         """更新记录表格显示"""
-        self.records_table.setRowCount(0)
-        print(f"准备显示 {len(self.domain_records)} 条记录")  # 调试信息
-        
-        # 获取已选择的记录列表
-        selected_records = self.config.config.get("sync_records", [])
-        print(f"已选择的记录数: {len(selected_records)}")  # 调试信息
-        
-        # 打印已选择的记录信息用于调试
-        for selected in selected_records:
-            print(f"已选择记录: {selected.get('RR', '')}.{selected.get('DomainName', '')} "
-                  f"(RecordId: {selected.get('RecordId', '')})")
-        
-        for record in self.domain_records:
-            # 显示 A 和 AAAA 记录
-            if record["Type"] not in ["A", "AAAA"]:
-                print(f"跳过非DNS记录: {record['RR']}.{record['DomainName']} ({record['Type']})")  # 调试信息
-                continue
-                
-            row = self.records_table.rowCount()
-            self.records_table.insertRow(row)
-            
-            # 添加复选框
-            checkbox = QCheckBox()
-            # 检查记录是否在已选择列表中
-            is_selected = any(
-                selected["RecordId"] == record["RecordId"] 
-                for selected in selected_records
-            )
-            print(f"记录 {record['RR']}.{record['DomainName']} "
-                  f"(RecordId: {record['RecordId']}) 选中状态: {is_selected}")  # 调试信息
-            checkbox.setChecked(is_selected)
-            self.records_table.setCellWidget(row, 0, checkbox)
-            
-            # 添加记录信息
-            domain_text = f"{record['RR']}.{record['DomainName']}"
-            if record['RR'] == '@':
-                domain_text = record['DomainName']
-                
-            self.records_table.setItem(row, 1, QTableWidgetItem(domain_text))
-            self.records_table.setItem(row, 2, QTableWidgetItem(record["RR"]))
-            self.records_table.setItem(row, 3, QTableWidgetItem(record["Type"]))
-            self.records_table.setItem(row, 4, QTableWidgetItem(record["Value"]))
-            
-            print(f"添加记录到表格: {domain_text}")  # 调试信息
+        # 已选择的记录按 RecordId 索引，整张表一次性重置
+        selected_records = RecordIndex.from_dicts(self.config.get_sync_records())
+        selected_ids = selected_records.record_ids()
+        self.records_model.set_records(self.domain_records, selected_ids)
+        self.update_records_count()
+        self.set_stale_records(self.find_stale_records(selected_records))
+        print(f"显示 {self.records_model.rowCount()} 条记录，已选择 {len(selected_ids)} 条")  # 调试信息
+
+    def find_stale_records(self, selected_records):
+        """已选择但在获取到的域名记录中不存在的记录
+        所属账号的域名列表或所属域名的记录获取失败时无法判断，这些记录保留
+        """
+        loaded_ids = {record["RecordId"] for record in self.domain_records}
+        gaps = self.dns_updater.catalog_gaps
+        return [
+            record for record in selected_records
+            if record.record_id not in loaded_ids
+            and (record.profile, None) not in gaps
+            and (record.profile, record.domain_name) not in gaps
+        ]
+
+    def set_stale_records(self, records):
+        """记录并提示已不存在的同步记录"""
+        self.stale_records = records
+        if not records:
+            self.stale_label.hide()
+            return
+        names = "、".join(record.full_name for record in records[:3])
+        if len(records) > 3:
+            names += " 等"
+        self.stale_label.setText(
+            f"已选择的 {len(records)} 条记录在阿里云中已不存在（{names}），保存时将从同步列表中移除"
+        )
+        self.stale_label.show()
+        print(f"已不存在的同步记录: {records}")  # 调试信息
+
+    def filter_records(self, text):
+        """按搜索框内容过滤显示的记录"""
+        self.records_model.set_filter(text)
+        self.update_records_count()
+
+    def set_visible_checked(self, checked):
+        """勾选或取消勾选当前显示的全部记录"""
+        self.records_model.set_visible_checked(checked)
+
+    def update_records_count(self):
+        """显示过滤后的记录数"""
+        total = self.records_model.total_count()
+        shown = self.records_model.rowCount()
+        self.records_count_label.setText(f"{shown} / {total}" if shown != total else f"共 {total} 条")
 
     def save_config(self):
         """保存配置"""
         # 保存 AccessKey 配置
-        self.config.config["access_key_id"] = self.ak_id_input.text().strip()
-        self.config.config["access_key_secret"] = self.ak_secret_input.text().strip()
-        
-        # 保存选中的记录
-        selected_records = []
-        for row in range(self.records_table.rowCount()):
-            checkbox = self.records_table.cellWidget(row, 0)
-            if checkbox and checkbox.isChecked():
-                record_id = self.domain_records[row]["RecordId"]
-                # 查找完整的记录信息
-                record = next(
-                    (r for r in self.domain_records if r["RecordId"] == record_id),
-                    None
-                )
-                if record:
-                    selected_records.append(record)
-                    print(f"保存选中记录: {record['RR']}.{record['DomainName']}")  # 调试信息
-        
-        self.config.config["sync_records"] = selected_records
+        self.config.set_values({
+            "access_key_id": self.ak_id_input.text().strip(),
+            "access_key_secret": self.ak_secret_input.text().strip()
+        })
+        
+        # 保存选中的记录（只保存同步所需的字段）；已不存在的记录移除，
+        # 因获取失败未能加载显示的记录保持原有选择
+        selected_records = RecordIndex.from_dicts(self.config.get_sync_records())
+        for record in self.stale_records:
+            selected_records.remove(record.record_id)
+        for record in self.records_model.records():
+            if self.records_model.is_checked(record["RecordId"]):
+                selected_records.add(SyncRecord.from_dict(record))
+            else:
+                selected_records.remove(record["RecordId"])
+        
+        self.config.set_sync_records(selected_records.to_dicts())
         print(f"保存的记录数: {len(selected_records)}")  # 调试信息
         
         # 保存配置文件
@@ -122,6 +122,6 @@ class DomainRecordDialog(QDialog):
                     records[i] = record
                     break
                     
-        self.config.config["domain_records"] = records
+        self.config.set_values({"domain_records": records})
         self.config.save_config()
         self.accept() 
\ No newline at end of file
@@ -2,16 +2,32 @@ from PyQt5.QtWidgets import (QMainWindow, QWidget, QVBoxLayout, QHBoxLayout,
                            QPushButton, QLabel, QTableWidget, QTableWidgetItem,
                            QHeaderView, QApplication, QSystemTrayIcon, QMenu,
                            QAction, QStyle)
-from PyQt5.QtCore import QTimer, Qt
+from PyQt5.QtCore import QTimer, Qt, pyqtSignal
 from PyQt5.QtGui import QColor, QIcon, QScreen
-from datetime import datetime, timedelta
+from datetime import datetime
 import os
 import sys
-import winreg
-from .config_dialog import ConfigDialog
+import time
+from core.ip_watcher import AddressChangeWatcher
+from core.profiling import format_stages
+from core.scheduler import SyncScheduler
+from .sync_worker import SyncWorker
 import ctypes
+try:
+    import winreg
+except ImportError:
+    # 非 Windows 系统不支持注册表自启动
+    winreg = None
+
+def startup_probe(event):
+    """启动耗时探针：设置 ALIYUN_DDNS_STARTUP_PROBE 时输出关键时间点，供 tools/startup_bench.py 解析"""
+    if os.environ.get("ALIYUN_DDNS_STARTUP_PROBE"):
+        print(f"STARTUP_PROBE {event} {time.time():.6f}", flush=True)
 
 class MainWindow(QMainWindow):
+    # 网卡地址变化信号（由监听线程发出，在 GUI 线程中处理）
+    address_changed = pyqtSignal()
+
     def __init__(self, config_manager, dns_updater):
         super().__init__()
         self.setWindowIcon(QIcon("resources/icon.png"))
@@ -27,6 +43,12 @@ class MainWindow(QMainWindow):
         self.setup_tray(icon)
         self.setup_ui()
         self.last_update_time = None
+        self.address_watcher = None
+        self.sync_worker = None
+        self.sync_pending = False
+        self.first_sync_pending = False
+        self.scheduler = None
+        self.current_ips = None
         
         # 检查自启动状态
         self.check_autostart()
@@ -35,8 +57,8 @@ class MainWindow(QMainWindow):
         self.setWindowTitle("阿里云DNS解析客户端")
         self.setWindowIcon(icon)
         
-        # 使用定时器延迟初始化
-        QTimer.singleShot(1000, self.delayed_init)
+        # 窗口显示后立即在事件循环中初始化
+        QTimer.singleShot(0, self.delayed_init)
 
     def setup_high_dpi(self):
         """设置高DPI支持"""
@@ -123,20 +145,23 @@ class MainWindow(QMainWindow):
         self.next_update_label.setText("下次更新: 等待首次更新")
         
         # 如果配置了账号，执行首次更新
-        if (self.config.config.get("access_key_id") and 
-            self.config.config.get("access_key_secret")):
+        if self.dns_updater.has_accounts():
             print("检测到已配置账号，准备执行首次更新...")  # 调试信息
-            QTimer.singleShot(2000, self.first_update)
+            QTimer.singleShot(0, self.first_update)
 
     def first_update(self):
         """首次更新"""
         print("执行首次更新...")  # 调试信息
-        try:
-            self.check_and_update()
-            self.status_label.setText("状态: 初始化完成")
-        except Exception as e:
-            self.status_label.setText(f"状态: 初始化失败 - {str(e)}")
-            print(f"首次更新失败: {str(e)}")  # 调试信息
+        self.first_sync_pending = True
+        if not self.check_and_update():
+            self.on_first_sync_done()
+
+    def on_first_sync_done(self):
+        """首次同步结束（成功或失败）"""
+        self.first_sync_pending = False
+        startup_probe("first_sync")
+        if os.environ.get("ALIYUN_DDNS_STARTUP_PROBE") == "exit":
+            QTimer.singleShot(0, self.quit_application)
 
     def setup_tray(self, icon):
         """设置系统托盘"""
@@ -226,9 +251,20 @@ class MainWindow(QMainWindow):
 
     def quit_application(self):
         """退出应用程序"""
-        # 保存配置
+        # 取消正在进行的同步并等待后台线程结束
+        if self.sync_worker is not None:
+            self.sync_worker.cancel()
+            self.sync_worker.wait(10000)
+            
+        # 保存配置（包括尚未写盘的延迟保存）
         self.config.save_config()
-        
+        self.config.close_state_store()
+        self.dns_updater.shutdown()
+            
+        # 停止地址变更监听
+        if self.address_watcher:
+            self.address_watcher.stop()
+            
         # 隐藏托盘图标
         self.tray_icon.hide()
         
@@ -246,6 +282,8 @@ class MainWindow(QMainWindow):
 
     def is_autostart_enabled(self):
         """检查是否启用了自启动"""
+        if winreg is None:
+            return False
         try:
             key = winreg.OpenKey(
                 winreg.HKEY_CURRENT_USER,
@@ -272,6 +310,8 @@ class MainWindow(QMainWindow):
         """切换自启动状态"""
         key = None
         try:
+            if winreg is None:
+                raise Exception("当前系统不支持开机自启动")
             key = winreg.OpenKey(
                 winreg.HKEY_CURRENT_USER,
                 r"Software\Microsoft\Windows\CurrentVersion\Run",
@@ -321,33 +361,66 @@ class MainWindow(QMainWindow):
                 winreg.CloseKey(key)
 
     def setup_timer(self):
-        """设置定时器，每5分钟执行一次更新"""
+        """设置定时器，按调度器计算的时间执行下一轮更新
+        支持网卡地址变更监听时立即响应地址变化，定时轮询仅作为兜底
+        """
         print("设置定时更新...")  # 调试信息
+        interval = None
+        if self.setup_address_watcher():
+            interval = self.config.config.get("watch_fallback_interval", 3600)
+        self.scheduler = SyncScheduler.from_config(self.config.config, interval)
+        
+        # 单次定时器：每轮结束后根据结果重新安排下一轮
         self.update_timer = QTimer(self)
+        self.update_timer.setSingleShot(True)
         self.update_timer.timeout.connect(self.check_and_update)
-        self.update_timer.start(5 * 60 * 1000)  # 5分钟 = 5 * 60 * 1000毫秒
+        self.schedule_next(self.scheduler.schedule(self.scheduler.interval))
         
         # 更新倒计时的定时器
         self.countdown_timer = QTimer(self)
         self.countdown_timer.timeout.connect(self.update_countdown)
         self.countdown_timer.start(1000)  # 每秒更新一次倒计时
 
+    def schedule_next(self, delay):
+        """在 delay 秒后执行下一轮更新"""
+        self.update_timer.start(int(delay * 1000))
+        print(f"下次更新将在{int(delay)}秒后进行")  # 调试信息
+
+    def setup_address_watcher(self):
+        """开启网卡地址变更监听（仅 Linux），成功返回 True"""
+        if not self.config.config.get("ip_watch", True) or not AddressChangeWatcher.is_supported():
+            return False
+            
+        self.address_changed.connect(self.on_address_changed)
+        self.address_watcher = AddressChangeWatcher(
+            self.address_changed.emit,
+            debounce=self.config.config.get("ip_watch_debounce", 2)
+        )
+        return self.address_watcher.start()
+
+    def on_address_changed(self):
+        """网卡地址变化后立即同步，兜底计时在本轮结束后重新开始"""
+        self.status_label.setText("状态: 检测到地址变化，正在更新...")
+        self.check_and_update()
+
     def update_countdown(self):
         """更新倒计时显示"""
-        if not hasattr(self, 'last_update_time') or self.last_update_time is None:
+        if self.sync_worker is not None:
+            self.next_update_label.setText("下次更新: 同步中")
+            return
+            
+        remaining = self.scheduler.seconds_until_next() if self.scheduler else None
+        if remaining is None:
             self.next_update_label.setText("下次更新: 等待首次更新")
             return
             
-        now = datetime.now()
-        next_update = self.last_update_time + timedelta(minutes=5)
-        
-        if now >= next_update:
+        if remaining <= 0:
             self.next_update_label.setText("下次更新: 即将进行")
             return
             
-        remaining = next_update - now
-        minutes = remaining.seconds // 60
-        seconds = remaining.seconds % 60
+        remaining = int(remaining)
+        minutes = remaining // 60
+        seconds = remaining % 60
         self.next_update_label.setText(f"下次更新: {minutes:02d}:{seconds:02d}")
 
     def setup_ui(self):
@@ -387,14 +460,18 @@ class MainWindow(QMainWindow):
         button_layout = QVBoxLayout(button_panel)
         self.config_btn = QPushButton("配置账号")
         self.refresh_btn = QPushButton("立即刷新")
+        self.cancel_btn = QPushButton("取消同步")
+        self.cancel_btn.setEnabled(False)
         
         # 设置按钮固定宽度（考虑缩放）
         button_width = int(100 * scale_factor)
         self.config_btn.setFixedWidth(button_width)
         self.refresh_btn.setFixedWidth(button_width)
+        self.cancel_btn.setFixedWidth(button_width)
         
         button_layout.addWidget(self.config_btn)
         button_layout.addWidget(self.refresh_btn)
+        button_layout.addWidget(self.cancel_btn)
         button_layout.addStretch()
         
         status_layout.addWidget(status_info)
@@ -425,76 +502,151 @@ class MainWindow(QMainWindow):
         # 绑定事件
         self.config_btn.clicked.connect(self.show_config_dialog)
         self.refresh_btn.clicked.connect(self.manual_refresh)
+        self.cancel_btn.clicked.connect(self.cancel_sync)
 
     def show_config_dialog(self):
+        # 配置对话框只在打开时才导入
+        from .config_dialog import ConfigDialog
+        
         dialog = ConfigDialog(self.config, self.dns_updater, self)
         if dialog.exec_():
             self.check_and_update()
 
     def manual_refresh(self):
-        """手动刷新"""
+        """手动刷新，本轮结束后重新开始计时"""
         self.status_label.setText("状态: 手动刷新中...")
-        # 立即更新界面
-        QApplication.processEvents()
-        
-        try:
-            self.check_and_update()
-            # 重置定时器
-            self.reset_timer()
-        except Exception as e:
-            self.status_label.setText(f"状态: 刷新失败 - {str(e)}")
-            return
-            
-        self.status_label.setText("状态: 运行中")
-
-    def reset_timer(self):
-        """重置更新定时器"""
-        if hasattr(self, 'update_timer'):
-            self.update_timer.stop()
-            self.update_timer.start(5 * 60 * 1000)  # 重新开始5分钟计时
-            print("定时器已重置，下次更新将在5分钟后进行")  # 调试信息
-            
-        # 更新下次更新时间显示
-        next_update = datetime.now() + timedelta(minutes=5)
-        self.next_update_label.setText(
-            f"下次更新: {next_update.strftime('%H:%M:%S')}"
-        )
+        self.check_and_update()
 
     def check_and_update(self):
-        """检查并更新DNS记录"""
-        if not self.config.config.get("sync_records"):
+        """检查并更新DNS记录（在后台线程中执行，不阻塞界面）
+        上一轮尚未结束时不会重复启动，而是在其结束后再补跑一轮；返回是否已启动或排队
+        """
+        if not self.config.get_sync_records():
             print("没有需要同步的记录")  # 调试信息
             self.status_label.setText("状态: 未配置同步记录")
-            return
-            
-        print("开始检查和更新DNS记录...")  # 调试信息
-        try:
-            # 获取当前IP地址（只获取一次）
-            current_ips = self.dns_updater.get_current_ips()
-            
-            # 更新IP显示
-            ip_text = []
-            if current_ips["ipv4"]:
-                ip_text.append(f"IPv4: {current_ips['ipv4']}")
-            if current_ips["ipv6"]:
-                ip_text.append(f"IPv6: {current_ips['ipv6']}")
+            if self.scheduler:
+                self.schedule_next(self.scheduler.schedule(self.scheduler.interval))
+            return False
             
-            self.ip_label.setText(" | ".join(ip_text) if ip_text else "未能获取IP地址")
+        if self.sync_worker is not None:
+            print("上一轮同步尚未结束，结束后再执行")  # 调试信息
+            self.sync_pending = True
+            return True
             
-            # 同步记录（传入已获取的IP）
-            results = self.dns_updater.sync_records(current_ips)
-            self.update_sync_status(results)
+        print("开始检查和更新DNS记录...")  # 调试信息
+        self.sync_pending = False
+        self.current_ips = None
+        if self.scheduler:
+            # 同步期间不触发定时更新，结束后再安排下一轮
+            self.update_timer.stop()
+        self.prepare_sync_table()
+        self.sync_worker = SyncWorker(self.dns_updater, self)
+        self.sync_worker.ips_detected.connect(self.on_ips_detected)
+        self.sync_worker.record_synced.connect(self.on_record_synced)
+        self.sync_worker.sync_finished.connect(self.on_sync_finished)
+        self.sync_worker.sync_failed.connect(self.on_sync_failed)
+        self.sync_worker.finished.connect(self.on_worker_finished)
+        self.cancel_btn.setEnabled(True)
+        self.sync_worker.start()
+        return True
+
+    def cancel_sync(self):
+        """取消正在进行的同步"""
+        if self.sync_worker is not None:
+            self.sync_pending = False
+            self.sync_worker.cancel()
+            self.status_label.setText("状态: 正在取消...")
+
+    def prepare_sync_table(self):
+        """按同步记录预先填充表格，各行在记录完成时逐条刷新"""
+        self.records_table.setRowCount(0)
+        for record in self.config.get_sync_records():
+            self.set_result_row(self.records_table.rowCount(), {
+                "domain": record["DomainName"],
+                "rr": record["RR"],
+                "status": "pending",
+                "message": "等待同步..."
+            })
+
+    def on_ips_detected(self, current_ips):
+        """更新IP显示"""
+        self.current_ips = current_ips
+        ip_text = []
+        if current_ips["ipv4"]:
+            ip_text.append(f"IPv4: {current_ips['ipv4']}")
+        if current_ips["ipv6"]:
+            ip_text.append(f"IPv6: {current_ips['ipv6']}")
+        
+        self.ip_label.setText(" | ".join(ip_text) if ip_text else "未能获取IP地址")
+
+    def on_record_synced(self, index, result):
+        """单条记录同步完成"""
+        if index < self.records_table.rowCount():
+            self.set_result_row(index, result)
+        self.status_label.setText(f"状态: 同步中 ({index + 1}/{self.records_table.rowCount()})")
+
+    def on_sync_finished(self, results):
+        """本轮同步完成"""
+        self.update_sync_status(results)
+        
+        # 只有拉取记录失败、熔断或限流才按失败退避，单条记录的错误只在表格中显示
+        if self.scheduler:
+            failure = self.dns_updater.cycle_failure(results)
+            if failure:
+                print(f"本轮同步异常，推迟下一轮: {failure}")  # 调试信息
+                self.scheduler.on_failure()
+            else:
+                self.scheduler.on_success(self.current_ips)
+        
+        # 更新时间
+        self.last_update_time = datetime.now()
+        self.last_update_label.setText(
+            f"上次更新: {self.last_update_time.strftime('%Y-%m-%d %H:%M:%S')}"
+        )
+
+    def on_sync_failed(self, error_msg):
+        """本轮同步失败"""
+        print(f"更新失败: {error_msg}")  # 调试信息
+        self.status_label.setText(f"状态: 更新失败 - {error_msg}")
+        if self.scheduler:
+            if self.sync_worker is not None and self.sync_worker.cancel_event.is_set():
+                # 手动取消不属于故障，按正常间隔安排
+                self.scheduler.schedule(self.scheduler.interval)
+            else:
+                self.scheduler.on_failure()
+
+    def on_worker_finished(self):
+        """后台线程结束，如有排队的同步请求则立即补跑"""
+        self.sync_worker.deleteLater()
+        self.sync_worker = None
+        self.cancel_btn.setEnabled(False)
+        if self.first_sync_pending:
+            self.on_first_sync_done()
+        if self.sync_pending:
+            self.check_and_update()
+        elif self.scheduler:
+            self.schedule_next(self.scheduler.seconds_until_next())
+
+    def set_result_row(self, row, result):
+        """写入（或覆盖）表格中的一行结果"""
+        if row >= self.records_table.rowCount():
+            self.records_table.insertRow(row)
             
-            # 更新时间
-            self.last_update_time = datetime.now()
-            self.last_update_label.setText(
-                f"上次更新: {self.last_update_time.strftime('%Y-%m-%d %H:%M:%S')}"
-            )
+        domain_text = f"{result['rr']}.{result['domain']}"
+        if result['rr'] == '@':
+            domain_text = result['domain']
             
-        except Exception as e:
-            error_msg = str(e)
-            print(f"更新失败: {error_msg}")  # 调试信息
-            self.status_label.setText(f"状态: 更新失败 - {error_msg}")
+        self.records_table.setItem(row, 0, QTableWidgetItem(domain_text))
+        self.records_table.setItem(row, 1, QTableWidgetItem(result['status']))
+        self.records_table.setItem(row, 2, QTableWidgetItem(result['message']))
+        
+        # 设置状态列的颜色
+        if result['status'] == 'success':
+            self.records_table.item(row, 1).setBackground(QColor('#e6f7ff'))
+        elif result['status'] == 'error':
+            self.records_table.item(row, 1).setBackground(QColor('#fff1f0'))
+        elif result['status'] == 'skipped':
+            self.records_table.item(row, 1).setBackground(QColor('#f6ffed'))
 
     def update_sync_status(self, results):
         """更新同步状态到表格"""
@@ -504,26 +656,14 @@ class MainWindow(QMainWindow):
         skipped_count = 0
         
         for result in results:
-            row = self.records_table.rowCount()
-            self.records_table.insertRow(row)
+            self.set_result_row(self.records_table.rowCount(), result)
             
-            domain_text = f"{result['rr']}.{result['domain']}"
-            if result['rr'] == '@':
-                domain_text = result['domain']
-                
-            self.records_table.setItem(row, 0, QTableWidgetItem(domain_text))
-            self.records_table.setItem(row, 1, QTableWidgetItem(result['status']))
-            self.records_table.setItem(row, 2, QTableWidgetItem(result['message']))
-            
-            # 设置状态列的颜色和计数
+            # 结果计数
             if result['status'] == 'success':
-                self.records_table.item(row, 1).setBackground(QColor('#e6f7ff'))
                 success_count += 1
             elif result['status'] == 'error':
-                self.records_table.item(row, 1).setBackground(QColor('#fff1f0'))
                 error_count += 1
             else:  # skipped
-                self.records_table.item(row, 1).setBackground(QColor('#f6ffed'))
                 skipped_count += 1
         
         # 更新状态栏显示结果统计
@@ -535,13 +675,32 @@ class MainWindow(QMainWindow):
         if skipped_count > 0:
             status_text += f"跳过: {skipped_count} "
         status_text += ")"
+        if self.dns_updater.last_cycle_time is not None:
+            status_text += f" 耗时 {self.dns_updater.last_cycle_time:.1f} 秒"
         
         self.status_label.setText(status_text)
+        tooltip = []
+        if self.dns_updater.last_cycle_stages:
+            tooltip.append(format_stages(self.dns_updater.last_cycle_stages, self.dns_updater.last_cycle_time))
+        recent = self.format_recent_cycles()
+        if recent:
+            tooltip.append(recent)
+        self.status_label.setToolTip("\n\n".join(tooltip))
+
+    def format_recent_cycles(self, count=10):
+        """最近几轮同步的汇总，用作状态栏提示"""
+        lines = []
+        for cycle in self.dns_updater.get_recent_cycles(count):
+            counts = cycle["counts"]
+            lines.append(f"{cycle['time'].replace('T', ' ')}  成功: {counts['success']} "
+                         f"失败: {counts['error']} 跳过: {counts['skipped']}  ({cycle['duration_ms']:.0f}ms)")
+        return "\n".join(lines)
 
     def showEvent(self, event):
         """窗口显示事件"""
         super().showEvent(event)
         print("主窗口显示")  # 调试信息
+        startup_probe("window_shown")
         self.status_label.setText("状态: 正在初始化...")
 
     def get_appropriate_icon(self):
@@ -0,0 +1,149 @@
+from PyQt5.QtCore import Qt, QAbstractTableModel, QModelIndex, QVariant
+from core.record_search import RecordSearchIndex
+
+# 账号配置对话框中可以选择同步的记录类型
+SYNC_TYPES = ("A", "AAAA")
+
+
+def record_full_name(record):
+    return record["DomainName"] if record["RR"] == "@" else f"{record['RR']}.{record['DomainName']}"
+
+
+def record_display_name(record):
+    """表格中显示的完整域名；配置了多个账号时标明记录所属账号"""
+    name = record_full_name(record)
+    if record.get("Profile", "default") != "default":
+        name = f"[{record['Profile']}] {name}"
+    return name
+
+
+class RecordTableModel(QAbstractTableModel):
+    """账号配置对话框中的域名记录表格
+
+    每行只保存阿里云返回的记录字典，勾选状态保存在按 RecordId 索引的集合中，
+    单元格内容由视图在绘制可见行时按需读取，不为每行创建控件。
+    设置过滤条件后只显示匹配的行，勾选状态不受过滤影响。
+    """
+
+    HEADERS = ("选择", "完整域名", "主机记录", "记录类型", "记录值")
+    COLUMN_CHECK = 0
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._records = []
+        self._checked = set()
+        # 当前显示的行在 _records 中的序号，None 表示显示全部
+        self._visible = None
+        self._filter_text = ""
+        self._search_index = RecordSearchIndex(())
+
+    def set_records(self, records, checked_ids=()):
+        """一次性替换全部记录（只保留 A 和 AAAA 记录），checked_ids 为已勾选的 RecordId"""
+        self.beginResetModel()
+        self._records = [record for record in records if record["Type"] in SYNC_TYPES]
+        self._checked = set(checked_ids)
+        self._search_index = RecordSearchIndex(
+            (record_full_name(record), record["RR"], record["Type"], record.get("Value", ""))
+            for record in self._records
+        )
+        self._visible = self._search_index.search(self._filter_text)
+        self.endResetModel()
+
+    def set_filter(self, text):
+        """按完整域名、主机记录、记录类型和记录值过滤显示的行"""
+        if text == self._filter_text:
+            return
+        self._filter_text = text
+        self.beginResetModel()
+        self._visible = self._search_index.search(text)
+        self.endResetModel()
+
+    def clear(self):
+        self.set_records([])
+
+    def records(self):
+        return self._records
+
+    def total_count(self):
+        return len(self._records)
+
+    def record_at(self, row):
+        if self._visible is not None:
+            row = self._visible[row]
+        return self._records[row]
+
+    def visible_records(self):
+        if self._visible is None:
+            return self._records
+        return [self._records[row] for row in self._visible]
+
+    def is_checked(self, record_id):
+        return record_id in self._checked
+
+    def checked_ids(self):
+        return set(self._checked)
+
+    def set_visible_checked(self, checked):
+        """勾选或取消勾选当前显示的全部行"""
+        record_ids = [record["RecordId"] for record in self.visible_records()]
+        if checked:
+            self._checked.update(record_ids)
+        else:
+            self._checked.difference_update(record_ids)
+        if record_ids:
+            self.dataChanged.emit(
+                self.index(0, self.COLUMN_CHECK),
+                self.index(len(record_ids) - 1, self.COLUMN_CHECK),
+                [Qt.CheckStateRole]
+            )
+
+    def rowCount(self, parent=QModelIndex()):
+        if parent.isValid():
+            return 0
+        return len(self._records) if self._visible is None else len(self._visible)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.HEADERS)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return QVariant()
+        record = self.record_at(index.row())
+        column = index.column()
+        if column == self.COLUMN_CHECK:
+            if role == Qt.CheckStateRole:
+                return Qt.Checked if record["RecordId"] in self._checked else Qt.Unchecked
+            return QVariant()
+        if role in (Qt.DisplayRole, Qt.ToolTipRole):
+            if column == 1:
+                return record_display_name(record)
+            if column == 2:
+                return record["RR"]
+            if column == 3:
+                return record["Type"]
+            return record.get("Value", "")
+        return QVariant()
+
+    def setData(self, index, value, role=Qt.EditRole):
+        if not index.isValid() or index.column() != self.COLUMN_CHECK or role != Qt.CheckStateRole:
+            return False
+        record_id = self.record_at(index.row())["RecordId"]
+        if value == Qt.Checked:
+            self._checked.add(record_id)
+        else:
+            self._checked.discard(record_id)
+        self.dataChanged.emit(index, index, [Qt.CheckStateRole])
+        return True
+
+    def flags(self, index):
+        if not index.isValid():
+            return Qt.NoItemFlags
+        flags = Qt.ItemIsEnabled | Qt.ItemIsSelectable
+        if index.column() == self.COLUMN_CHECK:
+            flags |= Qt.ItemIsUserCheckable
+        return flags
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if orientation == Qt.Horizontal and role == Qt.DisplayRole:
+            return self.HEADERS[section]
+        return QVariant()
@@ -0,0 +1,45 @@
+import threading
+from PyQt5.QtCore import QThread, pyqtSignal
+
+
+class SyncWorker(QThread):
+    """在后台线程中执行一轮 IP 检测和记录同步，通过信号把进度和结果交回 GUI 线程"""
+
+    # 获取到当前IP
+    ips_detected = pyqtSignal(dict)
+    # 单条记录完成：(在 sync_records 中的序号, 结果)
+    record_synced = pyqtSignal(int, dict)
+    # 本轮完成，携带全部结果
+    sync_finished = pyqtSignal(list)
+    # 本轮失败，携带错误信息
+    sync_failed = pyqtSignal(str)
+
+    def __init__(self, dns_updater, parent=None):
+        super().__init__(parent)
+        self.dns_updater = dns_updater
+        self.cancel_event = threading.Event()
+
+    def cancel(self):
+        """取消本轮同步，已经发出的请求会执行完，尚未开始的记录不再处理"""
+        self.cancel_event.set()
+
+    def run(self):
+        try:
+            # 统计本轮各阶段耗时，结束后再发出完成信号，界面可以读取统计结果
+            with self.dns_updater.measure_cycle():
+                # 获取当前IP地址（只获取一次）
+                current_ips = self.dns_updater.get_current_ips()
+                self.ips_detected.emit(current_ips)
+                if self.cancel_event.is_set():
+                    self.sync_failed.emit("同步已取消")
+                    return
+
+                # 同步记录（传入已获取的IP）
+                results = self.dns_updater.sync_records(
+                    current_ips,
+                    progress_callback=self.record_synced.emit,
+                    cancel_event=self.cancel_event
+                )
+            self.sync_finished.emit(results)
+        except Exception as e:
+            self.sync_failed.emit(str(e))